@@ -0,0 +1,551 @@
+# attendance.py
+"""Attendance helpers shared by the student and employee attendance routes.
+
+Bulk uploads are handled column-wise: admission numbers from the sheet are
+resolved with one query and merged onto the DataFrame, dates and statuses
+are normalised vectorially, rows that fail to match or parse are reported
+with their sheet row numbers, and the remaining rows are written with a
+single ``executemany`` upsert inside one transaction.
+
+Monthly registers load a cohort's month of attendance with one date-range
+query into a student x day ``uint8`` matrix of status codes; per-student and
+per-day totals are reductions over that matrix.
+
+Marking sheets are versioned: every attendance row carries a ``revision``
+stamped by triggers (see ``db.init_db``), so a page holding a sheet version
+can fetch only the rows changed since and send back only the rows it edited.
+
+Employee attendance is marked from one joined sheet query (employees with
+the day's status) and written back with a single ``executemany`` upsert that
+updates rows in place, keeping check-in/out times recorded elsewhere.
+
+Edit-window locks are cached per date with their expiry precomputed, so the
+check made on every save is a comparison against the clock.
+"""
+
+import calendar
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import ATTENDANCE_EDIT_WINDOW_MINUTES, ATTENDANCE_LOCK_CACHE_SECONDS
+
+ATTENDANCE_STATUSES = ('Present', 'Absent', 'Late', 'Leave')
+_STATUS_LOOKUP = {status.lower(): status for status in ATTENDANCE_STATUSES}
+
+# Sheet rows are 1-based and the first one holds the headers
+_FIRST_DATA_ROW = 2
+# Stay well below SQLite's bound-parameter limit when resolving admission numbers
+_LOOKUP_CHUNK_SIZE = 900
+
+UPSERT_ATTENDANCE_SQL = '''
+    INSERT INTO attendance (student_id, attendance_date, status, notes, created_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(student_id, attendance_date) DO UPDATE SET
+        status = excluded.status,
+        notes = excluded.notes
+'''
+
+
+def _text_column(df, name, default=''):
+    """``df[name]`` as stripped strings; blanks/NaN become ``default``."""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    column = df[name]
+    if pd.api.types.is_float_dtype(column):
+        # Numeric admission numbers come back from Excel as floats (123.0)
+        whole = column.notna() & (column % 1 == 0)
+        column = column.astype(object).where(~whole, column[whole].astype('int64').astype(str))
+    text = column.astype(object).where(column.notna(), '').astype(str).str.strip()
+    return text.mask(text == '', default)
+
+
+def _student_ids(conn, admission_numbers):
+    ids = {}
+    unique = list(dict.fromkeys(number for number in admission_numbers if number))
+    for start in range(0, len(unique), _LOOKUP_CHUNK_SIZE):
+        chunk = unique[start:start + _LOOKUP_CHUNK_SIZE]
+        placeholders = ','.join('?' for _ in chunk)
+        ids.update(conn.execute(
+            f'SELECT admission_no, id FROM students WHERE admission_no IN ({placeholders})', chunk
+        ).fetchall())
+    return pd.DataFrame(list(ids.items()), columns=['admission_no', 'student_id'])
+
+
+def prepare_attendance_upload(df, conn, today=None):
+    """Return ``(records, errors)`` for an uploaded attendance sheet.
+
+    ``records`` has student_id/attendance_date/status/notes columns ready to
+    be written; ``errors`` lists ``"Row N: ..."`` messages in sheet order.
+    """
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    df = df.rename(columns=lambda col: str(col).strip().lower())
+    sheet = pd.DataFrame({
+        'row': df.index + _FIRST_DATA_ROW,
+        'admission_no': _text_column(df, 'admission_no'),
+        'status': _text_column(df, 'status', 'Present'),
+        'notes': _text_column(df, 'notes'),
+    }, index=df.index)
+
+    if 'date' in df.columns:
+        dates = pd.to_datetime(df['date'], errors='coerce', format='mixed')
+        sheet['attendance_date'] = dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+        sheet.loc[df['date'].isna(), 'attendance_date'] = today
+    else:
+        sheet['attendance_date'] = today
+    sheet['status'] = sheet['status'].str.lower().map(_STATUS_LOOKUP)
+
+    sheet = sheet.merge(_student_ids(conn, sheet['admission_no']), on='admission_no', how='left')
+
+    problems = pd.Series('', index=sheet.index, dtype=object)
+    invalid_status = sheet['status'].isna()
+    problems[invalid_status] = f"Status must be one of {', '.join(ATTENDANCE_STATUSES)}"
+    invalid_date = sheet['attendance_date'].isna()
+    problems[invalid_date] = 'Invalid date'
+    unmatched = sheet['student_id'].isna()
+    problems[unmatched] = 'Student with admission no ' + sheet.loc[unmatched, 'admission_no'] + ' not found'
+
+    failed = problems != ''
+    errors = [f"Row {row}: {problem}" for row, problem in zip(sheet.loc[failed, 'row'], problems[failed])]
+    records = sheet.loc[~failed, ['student_id', 'attendance_date', 'status', 'notes']].copy()
+    records['student_id'] = records['student_id'].astype('int64')
+    return records, errors
+
+
+def upsert_attendance(conn, records, created_at=None):
+    """Insert or update ``records`` with one executemany; the caller commits."""
+    created_at = created_at or datetime.now().isoformat()
+    conn.executemany(UPSERT_ATTENDANCE_SQL, (
+        (int(student_id), attendance_date, status, notes, created_at)
+        for student_id, attendance_date, status, notes in records.itertuples(index=False, name=None)
+    ))
+    return len(records)
+
+
+# ==================== MONTHLY REGISTER ====================
+
+NOT_MARKED = 0
+# Matrix codes: index + 1 into ATTENDANCE_STATUSES, 0 where nothing was recorded
+STATUS_CODES = {status: code for code, status in enumerate(ATTENDANCE_STATUSES, 1)}
+REGISTER_MARKS = ('', 'P', 'A', 'L', 'LV')
+REGISTER_FILTERS = ('campus', 'board', 'semester', 'technology')
+
+_STATUS_CASE = 'CASE a.status ' + ' '.join(
+    f"WHEN '{status}' THEN {code}" for status, code in STATUS_CODES.items()
+) + f' ELSE {NOT_MARKED} END'
+
+
+class MonthlyRegister:
+    """One month of attendance for a cohort as a student x day status matrix."""
+
+    def __init__(self, year_month, students, matrix):
+        self.year_month = year_month
+        self.students = students
+        self.matrix = matrix
+
+    @property
+    def days(self):
+        return self.matrix.shape[1]
+
+    @property
+    def month_label(self):
+        year, month = map(int, self.year_month.split('-'))
+        return date(year, month, 1).strftime('%B %Y')
+
+    def _counts(self, axis):
+        return {status: (self.matrix == code).sum(axis=axis) for status, code in STATUS_CODES.items()}
+
+    def student_totals(self):
+        """Per-student status counts, marked days and present percentage (arrays)."""
+        totals = self._counts(axis=1)
+        marked = (self.matrix != NOT_MARKED).sum(axis=1)
+        totals['marked'] = marked
+        totals['percentage'] = np.round(
+            np.divide(totals['Present'] * 100.0, marked, out=np.zeros(len(marked)), where=marked > 0), 2
+        )
+        return totals
+
+    def day_totals(self):
+        """Per-day status counts across the cohort (arrays of length ``days``)."""
+        return self._counts(axis=0)
+
+    def marks(self):
+        """Register symbols ('P', 'A', ...) per student and day."""
+        return np.array(REGISTER_MARKS, dtype=object)[self.matrix]
+
+
+def load_monthly_register(conn, year_month, filters, semesters=None):
+    """Build the register for active students matching ``filters``.
+
+    ``semesters`` optionally restricts the cohort (teachers' assigned
+    semesters); an empty list yields an empty register.
+    """
+    year, month = map(int, year_month.split('-'))
+    days = calendar.monthrange(year, month)[1]
+    if semesters is not None and not semesters:
+        return MonthlyRegister(year_month, [], np.zeros((0, days), dtype=np.uint8))
+    first_day = date(year, month, 1).isoformat()
+    next_month = date(year + month // 12, month % 12 + 1, 1).isoformat()
+
+    conditions = ["s.status = 'Active'"]
+    params = []
+    for name in REGISTER_FILTERS:
+        value = filters.get(name)
+        if value:
+            conditions.append(f's.{name} = ?')
+            params.append(value)
+    if semesters:
+        conditions.append(f"s.semester IN ({','.join('?' for _ in semesters)})")
+        params.extend(semesters)
+    where = ' AND '.join(conditions)
+
+    students = [dict(row) for row in conn.execute(
+        f"SELECT s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.campus, s.board "
+        f"FROM students s WHERE {where} ORDER BY s.name, s.id",
+        params
+    )]
+    matrix = np.zeros((len(students), days), dtype=np.uint8)
+    if not students:
+        return MonthlyRegister(year_month, students, matrix)
+
+    marks = np.array(conn.execute(
+        f"""
+        SELECT a.student_id, CAST(substr(a.attendance_date, 9, 2) AS INTEGER), {_STATUS_CASE}
+        FROM attendance a JOIN students s ON s.id = a.student_id
+        WHERE a.attendance_date >= ? AND a.attendance_date < ? AND {where}
+        """,
+        [first_day, next_month, *params]
+    ).fetchall(), dtype=np.int64).reshape(-1, 3)
+
+    # Ignore dates that are not plain ISO days (their day number would be out of range)
+    marks = marks[(marks[:, 1] >= 1) & (marks[:, 1] <= days)]
+    if len(marks):
+        ids = np.array([student['id'] for student in students], dtype=np.int64)
+        order = np.argsort(ids)
+        rows = order[np.searchsorted(ids, marks[:, 0], sorter=order)]
+        matrix[rows, marks[:, 1] - 1] = marks[:, 2]
+    return MonthlyRegister(year_month, students, matrix)
+
+
+def register_payload(register):
+    """JSON body for a register: marks per student plus both sets of totals."""
+    totals = register.student_totals()
+    marks = register.marks()
+    day_totals = register.day_totals()
+    students = []
+    for index, student in enumerate(register.students):
+        students.append({
+            **student,
+            'marks': marks[index].tolist(),
+            'present': int(totals['Present'][index]),
+            'absent': int(totals['Absent'][index]),
+            'late': int(totals['Late'][index]),
+            'leave': int(totals['Leave'][index]),
+            'marked_days': int(totals['marked'][index]),
+            'present_percentage': float(totals['percentage'][index]),
+        })
+    return {
+        'status': 'success',
+        'month': register.year_month,
+        'month_label': register.month_label,
+        'days': list(range(1, register.days + 1)),
+        'students': students,
+        'day_totals': {status: counts.tolist() for status, counts in day_totals.items()},
+    }
+
+
+def register_headers(register):
+    return (["S.NO", "Admission No", "Name"] + [str(day) for day in range(1, register.days + 1)]
+            + ["P", "A", "L", "LV", "%"])
+
+
+def register_rows(register, day_totals_row=True):
+    """Sheet/PDF rows: one per student, then a present-per-day totals row."""
+    totals = register.student_totals()
+    marks = register.marks()
+    for index, student in enumerate(register.students):
+        yield ([index + 1, student['admission_no'], student['name']] + marks[index].tolist() + [
+            int(totals['Present'][index]), int(totals['Absent'][index]),
+            int(totals['Late'][index]), int(totals['Leave'][index]),
+            f"{totals['percentage'][index]:g}%",
+        ])
+    if day_totals_row and register.students:
+        present = register.day_totals()['Present']
+        yield ['', '', 'Present per day'] + present.tolist() + [int(present.sum()), '', '', '', '']
+
+
+# ==================== EDIT WINDOW LOCKS ====================
+
+class LockWindow:
+    """A date's lock row: when it was locked and when editing closes."""
+
+    __slots__ = ('locked_at', 'expires_at')
+
+    def __init__(self, locked_at):
+        self.locked_at = locked_at
+        self.expires_at = datetime.fromisoformat(locked_at) + timedelta(minutes=ATTENDANCE_EDIT_WINDOW_MINUTES)
+
+    def is_closed(self, now=None):
+        return (now or datetime.now()) >= self.expires_at
+
+
+class AttendanceLockCache:
+    """In-process cache of ``<table>`` lock rows keyed by attendance date.
+
+    Entries (including "no lock yet") are reused for ATTENDANCE_LOCK_CACHE_SECONDS
+    so locks written by other processes are still noticed; writes made through
+    ``lock`` update the cache immediately.
+    """
+
+    # Only a few dates are ever edited at once; drop everything past this size
+    MAX_ENTRIES = 64
+
+    def __init__(self, table, ttl_seconds=ATTENDANCE_LOCK_CACHE_SECONDS):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _store(self, attendance_date, window):
+        with self._lock:
+            if len(self._entries) >= self.MAX_ENTRIES:
+                self._entries.clear()
+            self._entries[attendance_date] = (window, time.monotonic() + self.ttl_seconds)
+
+    def get(self, conn, attendance_date):
+        """Return the date's LockWindow, or None when nothing has locked it yet."""
+        cached = self._entries.get(attendance_date)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        row = conn.execute(
+            f'SELECT locked_at FROM {self.table} WHERE attendance_date = ?', (attendance_date,)
+        ).fetchone()
+        window = LockWindow(row['locked_at']) if row else None
+        self._store(attendance_date, window)
+        return window
+
+    def is_closed(self, conn, attendance_date, now=None):
+        window = self.get(conn, attendance_date)
+        return window is not None and window.is_closed(now)
+
+    def lock(self, conn, attendance_date, teacher_id, replace=False):
+        """Write the date's lock row (the caller commits) and return its LockWindow.
+
+        Without ``replace`` an existing lock is kept, so concurrent first saves
+        agree on the earliest one; with it the window restarts now.
+        """
+        locked_at = datetime.now().isoformat()
+        on_conflict = (
+            'DO UPDATE SET locked_at = excluded.locked_at, locked_by_teacher_id = excluded.locked_by_teacher_id'
+            if replace else 'DO NOTHING'
+        )
+        cursor = conn.execute(
+            f'INSERT INTO {self.table} (attendance_date, locked_at, locked_by_teacher_id) VALUES (?, ?, ?) '
+            f'ON CONFLICT(attendance_date) {on_conflict}',
+            (attendance_date, locked_at, teacher_id)
+        )
+        if cursor.rowcount:
+            window = LockWindow(locked_at)
+            self._store(attendance_date, window)
+            return window
+        self.invalidate(attendance_date)
+        return self.get(conn, attendance_date)
+
+    def invalidate(self, attendance_date=None):
+        with self._lock:
+            if attendance_date is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(attendance_date, None)
+
+
+student_attendance_locks = AttendanceLockCache('attendance_lock')
+employee_attendance_locks = AttendanceLockCache('employee_attendance_lock')
+
+
+# ==================== MARKING SHEETS ====================
+
+SHEET_FILTERS = ('technology', 'semester', 'board', 'campus')
+DEFAULT_SHEET_STATUS = 'Present'
+
+
+def sheet_version(conn):
+    """Token for the current state of every sheet: newest attendance revision and students version.
+
+    Read it before the rows so a write landing in between is sent again on
+    the next poll rather than missed.
+    """
+    revision = conn.execute('SELECT COALESCE(MAX(revision), 0) FROM attendance').fetchone()[0]
+    students = conn.execute("SELECT version FROM data_versions WHERE table_name = 'students'").fetchone()
+    return f"{revision}.{students[0] if students else 0}"
+
+
+def parse_sheet_version(token):
+    """Return ``(revision, students_version)`` for a token or raise ValueError."""
+    revision, students_version = (int(part) for part in str(token).split('.'))
+    return revision, students_version
+
+
+def _sheet_where(filters, semesters):
+    conditions = ["s.status = 'Active'"]
+    params = []
+    search = (filters.get('search') or '').strip()
+    if search:
+        conditions.append('(s.admission_no LIKE ? OR s.name LIKE ? OR s.father_name LIKE ?)')
+        params.extend([f'%{search}%'] * 3)
+    for name in SHEET_FILTERS:
+        value = filters.get(name)
+        if value:
+            conditions.append(f's.{name} = ?')
+            params.append(value)
+    if semesters:
+        conditions.append(f"s.semester IN ({','.join('?' for _ in semesters)})")
+        params.extend(semesters)
+    return ' AND '.join(conditions), params
+
+
+def load_attendance_sheet(conn, attendance_date, filters, semesters=None, since=None):
+    """The marking sheet for ``attendance_date`` as ``{date, version, reset, rows}``.
+
+    ``semesters`` restricts the roster as in ``load_monthly_register``. With
+    ``since`` (a version from an earlier load) only rows whose mark changed
+    after it are returned; when the roster may have changed (students were
+    written) or the token is from the future, the full sheet is returned
+    with ``reset`` set instead.
+    """
+    version = sheet_version(conn)
+    sheet = {'date': attendance_date, 'version': version, 'reset': since is None, 'rows': []}
+    if semesters is not None and not semesters:
+        return sheet
+
+    where, params = _sheet_where(filters, semesters)
+    query = f"""
+        SELECT s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.board, s.campus,
+               COALESCE(a.status, '{DEFAULT_SHEET_STATUS}') AS attendance_status, a.notes,
+               a.id IS NOT NULL AS marked
+        FROM students s
+    """
+    if since is not None:
+        since_revision, since_students = parse_sheet_version(since)
+        revision, students_version = parse_sheet_version(version)
+        if since_students == students_version and since_revision <= revision:
+            # Only recently written rows qualify, so idx_attendance_revision drives this
+            rows = conn.execute(
+                query + f"""
+                JOIN attendance a ON a.student_id = s.id
+                WHERE a.revision > ? AND a.attendance_date = ? AND {where}
+                ORDER BY s.name
+                """,
+                [since_revision, attendance_date, *params]
+            ).fetchall()
+            sheet['rows'] = [dict(row) for row in rows]
+            return sheet
+        sheet['reset'] = True
+
+    rows = conn.execute(
+        query + f"""
+        LEFT JOIN attendance a ON a.student_id = s.id AND a.attendance_date = ?
+        WHERE {where}
+        ORDER BY s.name
+        """,
+        [attendance_date, *params]
+    ).fetchall()
+    sheet['rows'] = [dict(row) for row in rows]
+    return sheet
+
+
+def prepare_sheet_changes(conn, changes, semesters=None):
+    """Validate edited sheet rows and return ``[(student_id, status, notes), ...]``.
+
+    Raises ValueError for malformed rows or unknown/inactive students and
+    PermissionError for students outside ``semesters`` when it is given.
+    """
+    prepared = {}
+    for change in changes:
+        try:
+            student_id = int(change['student_id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Each change needs a numeric student_id')
+        status = _STATUS_LOOKUP.get(str(change.get('status') or DEFAULT_SHEET_STATUS).strip().lower())
+        if status is None:
+            raise ValueError(f"Invalid status for student {student_id}; use one of {', '.join(ATTENDANCE_STATUSES)}")
+        # A row edited twice in one batch keeps its last value
+        prepared[student_id] = (student_id, status, change.get('notes') or '')
+
+    ids = list(prepared)
+    known = {}
+    for start in range(0, len(ids), _LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + _LOOKUP_CHUNK_SIZE]
+        known.update(conn.execute(
+            f"SELECT id, semester FROM students WHERE status = 'Active' AND id IN ({','.join('?' for _ in chunk)})",
+            chunk
+        ).fetchall())
+    missing = [student_id for student_id in ids if student_id not in known]
+    if missing:
+        raise ValueError(f"Unknown or inactive students: {', '.join(map(str, missing[:10]))}")
+    if semesters is not None:
+        outside = [student_id for student_id in ids if known[student_id] not in semesters]
+        if outside:
+            raise PermissionError(f"Not authorized to mark attendance for students: {', '.join(map(str, outside[:10]))}")
+    return list(prepared.values())
+
+
+def apply_sheet_changes(conn, attendance_date, changes, created_at=None):
+    """Upsert prepared sheet rows with one executemany; the caller commits."""
+    created_at = created_at or datetime.now().isoformat()
+    conn.executemany(UPSERT_ATTENDANCE_SQL, (
+        (student_id, attendance_date, status, notes, created_at)
+        for student_id, status, notes in changes
+    ))
+    return len(changes)
+
+
+# ==================== EMPLOYEE ATTENDANCE ====================
+
+UPSERT_EMPLOYEE_ATTENDANCE_SQL = '''
+    INSERT INTO employee_attendance (employee_id, attendance_date, status, marked_at, marked_by)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(employee_id, attendance_date) DO UPDATE SET
+        status = excluded.status,
+        marked_at = excluded.marked_at,
+        marked_by = excluded.marked_by
+'''
+
+
+def load_employee_attendance_sheet(conn, attendance_date, campus=None, department_id=None):
+    """Active employees with their status for ``attendance_date`` (None where unmarked), by name."""
+    conditions = ["e.status = 'Active'"]
+    params = [attendance_date]
+    if campus:
+        conditions.append('e.campus = ?')
+        params.append(campus)
+    if department_id:
+        conditions.append('e.department_id = ?')
+        params.append(department_id)
+    return [dict(row) for row in conn.execute(
+        f'''
+        SELECT e.id, e.name, e.campus, d.name AS department_name, des.name AS designation_name,
+               ea.status, ea.check_in_time, ea.check_out_time, ea.marked_at
+        FROM employees e
+        LEFT JOIN departments d ON e.department_id = d.id
+        LEFT JOIN designations des ON e.designation_id = des.id
+        LEFT JOIN employee_attendance ea ON ea.employee_id = e.id AND ea.attendance_date = ?
+        WHERE {' AND '.join(conditions)}
+        ORDER BY e.name
+        ''',
+        params
+    )]
+
+
+def upsert_employee_attendance(conn, records, marked_by, marked_at=None):
+    """Write ``records`` (dicts with employee_id, attendance_date, status) with one executemany; the caller commits."""
+    marked_at = marked_at or datetime.now().isoformat()
+    rows = [
+        (record.get('employee_id'), record.get('attendance_date'), record.get('status'), marked_at, marked_by)
+        for record in records
+    ]
+    conn.executemany(UPSERT_EMPLOYEE_ATTENDANCE_SQL, rows)
+    return len(rows)
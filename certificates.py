@@ -0,0 +1,213 @@
+# certificates.py
+"""Bonafide and course completion certificates.
+
+Single certificates are rendered on request. Batches (a whole class picked by
+campus/board/technology/semester/status) run as background export jobs:
+
+* a merged PDF is laid out as one document with a page break between
+  certificates, which shares fonts and styles instead of merging files;
+* a ZIP holds one PDF per student; chunks of ``CERTIFICATE_BATCH_CHUNK_SIZE``
+  students are rendered in a pool of ``CERTIFICATE_BATCH_WORKERS`` processes
+  and written into the archive as they complete.
+
+Paragraph styles come from ``pdf_toolkit`` and are built once per process.
+"""
+
+import io
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.platypus import PageBreak, Paragraph, Spacer
+
+from config import CERTIFICATE_BATCH_CHUNK_SIZE, CERTIFICATE_BATCH_WORKERS
+from exporters import iter_query
+from export_jobs import attach_progress
+from pdf_toolkit import CERTIFICATE_TITLE, SAMPLE_STYLES, report_document
+from reports import EqualsFilter, StatusFilter
+
+CERTIFICATE_TYPES = {
+    'bonafide': "BONAFIDE CERTIFICATE",
+    'course_completion': "COURSE COMPLETION CERTIFICATE",
+}
+CERTIFICATE_FIELDS = ('id', 'admission_no', 'name', 'father_name', 'technology', 'semester')
+CERTIFICATE_FILTERS = (
+    EqualsFilter('campus'),
+    EqualsFilter('board'),
+    EqualsFilter('technology'),
+    EqualsFilter('semester'),
+    StatusFilter(),
+)
+
+ZIP_MIMETYPE = 'application/zip'
+
+
+def _body_text(certificate_type, student):
+    technology = student.get('technology', 'N/A') or 'N/A'
+    if certificate_type == 'bonafide':
+        semester = student.get('semester', 'N/A') or 'N/A'
+        return f"""
+    This is to certify that <b>{student['name']}</b>, son/daughter of <b>{student['father_name']}</b>,
+    is a bonafide student of our institution.
+    <br/><br/>
+    His/Her admission number is <b>{student['admission_no']}</b> and he/she is currently studying in
+    <b>{technology}</b>, semester <b>{semester}</b>.
+    <br/><br/>
+    We wish him/her all the best for his/her future endeavors.
+    """
+    return f"""
+    This is to certify that <b>{student['name']}</b>, son/daughter of <b>{student['father_name']}</b>,
+    with admission number <b>{student['admission_no']}</b>, has successfully completed the
+    <b>{technology}</b> program.
+    <br/><br/>
+    We congratulate him/her on this achievement and wish him/her success in all future endeavors.
+    """
+
+
+def certificate_elements(certificate_type, student, reference_number='', issued_on=None):
+    """Flowables for one certificate page; ``student`` is a mapping."""
+    styles = SAMPLE_STYLES
+    date_text = f"Date: {(issued_on or datetime.now()).strftime('%d-%m-%Y')}"
+    if reference_number:
+        date_text += f"<br/>Ref: {reference_number}"
+    return [
+        Paragraph(CERTIFICATE_TYPES[certificate_type], CERTIFICATE_TITLE),
+        Spacer(1, 0.3*inch),
+        Paragraph(date_text, styles['Normal']),
+        Spacer(1, 0.3*inch),
+        Paragraph(_body_text(certificate_type, student), styles['Normal']),
+    ]
+
+
+def _certificate_document(target):
+    return report_document(target, pagesize=A4, rightMargin=0.75*inch, leftMargin=0.75*inch)
+
+
+def render_certificate(certificate_type, student, reference_number='', issued_on=None):
+    """Render one certificate and return a rewound BytesIO."""
+    buffer = io.BytesIO()
+    _certificate_document(buffer).build(
+        certificate_elements(certificate_type, dict(student), reference_number, issued_on)
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def certificate_filename(certificate_type, student):
+    return f"{certificate_type}_{student['admission_no']}.pdf"
+
+
+# ==================== BATCHES ====================
+
+def batch_students(params):
+    """Students matching the batch filters, as plain dicts ordered by admission."""
+    clauses = []
+    values = []
+    for batch_filter in CERTIFICATE_FILTERS:
+        clause, filter_values = batch_filter.compile(params.get(batch_filter.arg))
+        if clause:
+            clauses.append(clause)
+            values.extend(filter_values)
+    query = f"SELECT {', '.join(CERTIFICATE_FIELDS)} FROM students"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY admission_no"
+    return [dict(row) for row in iter_query(query, values)]
+
+
+def _reference(params, student):
+    prefix = params.get('reference_prefix')
+    return f"{prefix}/{student['admission_no']}" if prefix else ''
+
+
+def _render_chunk(certificate_type, students, references, issued_on):
+    """Process pool task: ``[(filename, pdf_bytes), ...]`` for a chunk of students."""
+    return [
+        (
+            certificate_filename(certificate_type, student),
+            render_certificate(certificate_type, student, reference, issued_on).getvalue(),
+        )
+        for student, reference in zip(students, references)
+    ]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the web process is multi-threaded, so forking it is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=CERTIFICATE_BATCH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def _batch_name(certificate_type, params):
+    scope = [params.get(key) for key in ('campus', 'board', 'technology', 'semester')]
+    parts = [certificate_type] + [part.replace(' ', '_') for part in scope if part and part != 'All']
+    return '_'.join(parts) + '_certificates'
+
+
+def build_certificate_batch_pdf(params, target, progress=None):
+    """Export job renderer: every matching certificate in one merged PDF."""
+    certificate_type = params['certificate_type']
+    students = batch_students(params)
+    if not students:
+        raise ValueError('No students match the selected filters')
+    issued_on = datetime.now()
+    elements = []
+    for index, student in enumerate(students):
+        if index:
+            elements.append(PageBreak())
+        elements.extend(certificate_elements(certificate_type, student, _reference(params, student), issued_on))
+    doc = _certificate_document(target)
+    attach_progress(doc, progress)
+    doc.build(elements)
+    return f"{_batch_name(certificate_type, params)}.pdf"
+
+
+def build_certificate_batch_zip(params, target, progress=None):
+    """Export job renderer: one PDF per matching student, zipped."""
+    certificate_type = params['certificate_type']
+    students = batch_students(params)
+    if not students:
+        raise ValueError('No students match the selected filters')
+    issued_on = datetime.now()
+    references = [_reference(params, student) for student in students]
+    done = 0
+
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        def write(files):
+            nonlocal done
+            for filename, data in files:
+                archive.writestr(filename, data)
+            done += len(files)
+            if progress:
+                progress(fraction=done / len(students), pages=done)
+
+        if len(students) <= CERTIFICATE_BATCH_CHUNK_SIZE:
+            write(_render_chunk(certificate_type, students, references, issued_on))
+        else:
+            pool = _process_pool()
+            futures = [
+                pool.submit(_render_chunk, certificate_type, chunk,
+                            references[start:start + len(chunk)], issued_on)
+                for start, chunk in _chunks(students, CERTIFICATE_BATCH_CHUNK_SIZE)
+            ]
+            for future in as_completed(futures):
+                write(future.result())
+    return f"{_batch_name(certificate_type, params)}.zip"
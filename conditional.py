@@ -0,0 +1,102 @@
+# conditional.py
+"""Conditional GET support for read endpoints.
+
+Read endpoints declare the tables they read with ``@versioned(...)``. Their
+ETag is derived from the endpoint, the query string and the tables'
+``data_versions`` counters (bumped by the triggers created in
+``db.init_db``), so a client that re-sends ``If-None-Match`` gets a 304 for
+as long as none of those tables has been written to.
+
+The counters themselves are cached per process for
+``DATA_VERSION_CACHE_SECONDS``; a revalidation inside that window is
+answered without opening a database connection. Mutating requests handled
+by this process drop the cache immediately, so only writes made by other
+processes can take up to that window to show up.
+"""
+
+import functools
+import hashlib
+import threading
+import time
+
+from flask import make_response, request
+
+from config import DATA_VERSION_CACHE_SECONDS
+from db import get_connection, get_data_version
+
+MUTATING_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+
+class DataVersionCache:
+    """Process-local cache of ``get_data_version`` tokens keyed by table set."""
+
+    def __init__(self, ttl_seconds=DATA_VERSION_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def token(self, tables):
+        key = tuple(sorted(tables))
+        now = time.monotonic()
+        cached = self._tokens.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        conn = get_connection()
+        try:
+            token = get_data_version(conn, key)
+        finally:
+            conn.close()
+        with self._lock:
+            self._tokens[key] = (token, now + self.ttl_seconds)
+        return token
+
+    def invalidate(self):
+        with self._lock:
+            self._tokens = {}
+
+
+data_versions = DataVersionCache()
+
+
+def etag_for(tables, *parts):
+    """Return the ETag value for ``tables`` plus any extra identifying ``parts``."""
+    signature = '|'.join([data_versions.token(tables), *map(str, parts)])
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+def versioned(*tables):
+    """Answer a GET endpoint with 304 while ``tables`` are unchanged.
+
+    Successful responses carry a weak ETag and ``Cache-Control: no-cache`` so
+    browsers revalidate instead of re-downloading; error responses are passed
+    through untouched.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped_view(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            etag = etag_for(tables, request.endpoint, request.full_path)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapped_view
+    return decorator
+
+
+def _invalidate_after_write(response):
+    if request.method in MUTATING_METHODS:
+        data_versions.invalidate()
+    return response
+
+
+def init_app(app):
+    """Drop cached data versions whenever this process handles a write."""
+    app.after_request(_invalidate_after_write)
@@ -5,3 +5,139 @@ DB_NAME = 'students.db'
 
 # Directory for storing student-related files
 FILES_DIR = 'student_files'
+
+# Session storage backend: 'sqlite' (web_sessions table), 'memory' or 'cookie'
+SESSION_BACKEND = 'sqlite'
+
+# Pickle file used to persist the in-memory session backend across restarts
+SESSION_MEMORY_PERSIST_PATH = 'sessions.pickle'
+
+# Only refresh session['last_activity'] when it is older than this many seconds
+SESSION_ACTIVITY_GRANULARITY_SECONDS = 60
+
+# Password hashing policy (see credentials.py): 'bcrypt', 'pbkdf2' or 'scrypt'
+PASSWORD_HASH_ALGORITHM = 'bcrypt'
+
+# Work factors per algorithm; stored hashes with a different cost are rehashed on login
+PASSWORD_BCRYPT_ROUNDS = 12
+PASSWORD_PBKDF2_ITERATIONS = 600000
+PASSWORD_SCRYPT_N = 32768
+
+# Credential endpoint throttling (see rate_limit.py): token buckets per client IP and per account
+LOGIN_RATE_LIMIT_IP_CAPACITY = 20
+LOGIN_RATE_LIMIT_IP_REFILL_PER_MINUTE = 10
+LOGIN_RATE_LIMIT_ACCOUNT_CAPACITY = 5
+LOGIN_RATE_LIMIT_ACCOUNT_REFILL_PER_MINUTE = 2
+
+# Consecutive failures before an account is locked out, and for how long
+LOGIN_LOCKOUT_THRESHOLD = 5
+LOGIN_LOCKOUT_MINUTES = 15
+
+# How often queued users.login_attempts/suspended_until updates are written
+LOGIN_ATTEMPT_FLUSH_SECONDS = 30
+
+# Per-endpoint latency/SQL metrics (see metrics.py); hooks are not installed when False
+METRICS_ENABLED = True
+
+# Optional bearer token that lets a Prometheus scraper read /metrics without a session
+METRICS_SCRAPE_TOKEN = None
+
+# Spreadsheet exports larger than this are spooled to a temporary file instead of memory
+EXPORT_SPOOL_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Background export jobs (see export_jobs.py): output folder, worker threads,
+# and how long a finished file is reused for identical requests
+EXPORT_JOB_DIR = 'generated_exports'
+EXPORT_JOB_WORKERS = 2
+EXPORT_JOB_TTL_SECONDS = 60 * 60
+
+# Student list PDFs with at least this many rows are drawn directly on the
+# canvas (pdf_toolkit.draw_grid_pdf) instead of being laid out as tables
+PDF_FAST_PATH_MIN_ROWS = 3000
+
+# ETag revalidation (see conditional.py) reuses data_versions counters read
+# within this many seconds; writes handled by the same process reset it
+DATA_VERSION_CACHE_SECONDS = 2
+
+# Batch certificates (see certificates.py): worker processes, and students
+# rendered per task; batches up to one chunk are rendered in-process
+CERTIFICATE_BATCH_WORKERS = 2
+CERTIFICATE_BATCH_CHUNK_SIZE = 50
+
+# ID cards (see id_cards.py): cached photo thumbnails, threads preparing
+# thumbnails, and pages per batch handed to each thread
+ID_CARD_THUMBNAIL_DIR = 'card_thumbnails'
+ID_CARD_RENDER_WORKERS = 4
+ID_CARD_BATCH_PAGES = 10
+
+# Attendance can be edited for this long after the day's first submission
+ATTENDANCE_EDIT_WINDOW_MINUTES = 30
+
+# Lock windows are cached in-process (see attendance.AttendanceLockCache) and
+# re-read after this many seconds to pick up locks written by other processes
+ATTENDANCE_LOCK_CACHE_SECONDS = 30
+
+# Low-attendance roster (see low_attendance.py): present percentage below
+# which a student is listed, and the local hour the nightly refresh runs at
+LOW_ATTENDANCE_THRESHOLD = 70
+LOW_ATTENDANCE_ROSTER_HOUR = 1
+
+# Marked days a student needs in the month before they can be listed, so one
+# early absence does not put them (and an SMS to their parent) at 0%
+LOW_ATTENDANCE_MIN_DAYS = 5
+
+# Queue a parent SMS for each newly listed student when the roster is refreshed
+LOW_ATTENDANCE_SMS_ENABLED = False
+LOW_ATTENDANCE_SMS_TEMPLATE = (
+    "Dear Parent, the attendance of {name} ({admission_no}) for {month} is "
+    "{present_percentage}% which is below the required {threshold}%. Please contact the institute."
+)
+
+# Local hour of the nightly job that snapshots the month that just ended for
+# the monthly meeting report (see meeting_reports.py)
+MEETING_REPORT_SNAPSHOT_HOUR = 0
+
+# Run the nightly jobs and the SMS dispatcher in the process serving requests
+# (see start_background_jobs in main.py); turn off for web workers when a
+# separate process runs them
+BACKGROUND_JOBS_ENABLED = True
+
+# Semester rollover (see promotions.py): where each semester moves at the end
+# of a term. Semesters not listed (final ones) stay where they are.
+SEMESTER_ROLLOVER = {
+    '1st Semester': '2nd Semester',
+    '2nd Semester': '3rd Semester',
+    '3rd Semester': '4th Semester',
+    '4th Semester': '5th Semester',
+    '5th Semester': '6th Semester',
+    '6th Semester': '7th Semester',
+    '7th Semester': '8th Semester',
+    '8th Semester': '9th Semester',
+    '9th Semester': '10th Semester',
+    '1st year': '2nd year',
+}
+
+# SMS dispatch (see sms.py): 'file' appends each message to SMS_GATEWAY_FILE
+# (local testing); 'http' POSTs batches as JSON to SMS_GATEWAY_URL
+SMS_GATEWAY = 'file'
+SMS_GATEWAY_FILE = 'sms_sent.jsonl'
+SMS_GATEWAY_URL = None
+SMS_GATEWAY_TOKEN = None
+SMS_GATEWAY_TIMEOUT_SECONDS = 10
+
+# Messages per gateway call, sustained send rate, and how often the
+# dispatcher looks at the outbox when nothing wakes it
+SMS_BATCH_SIZE = 50
+SMS_RATE_PER_MINUTE = 120
+SMS_DISPATCH_INTERVAL_SECONDS = 15
+
+# Failed sends are retried with exponential backoff from SMS_RETRY_BASE_SECONDS
+# until SMS_MAX_ATTEMPTS; a batch not finished within SMS_SEND_LEASE_SECONDS
+# (e.g. the process died) is picked up again
+SMS_MAX_ATTEMPTS = 5
+SMS_RETRY_BASE_SECONDS = 30
+SMS_SEND_LEASE_SECONDS = 300
+
+# Teacher dashboard statistics are cached per teacher for this long (see
+# teacher_dashboard.py); attendance saved for a teacher's semesters clears it
+TEACHER_DASHBOARD_CACHE_SECONDS = 60
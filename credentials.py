@@ -0,0 +1,210 @@
+# credentials.py
+"""Credential lookup and password hashing shared by every login path.
+
+Login identifiers are matched case-insensitively through the
+``username COLLATE NOCASE`` indexes created in ``db.init_db``, so every
+lookup is a single index probe instead of a table scan.
+
+Passwords are hashed according to the policy in ``config.py``. Hashes made
+with another algorithm or work factor still verify, and
+``verify_and_upgrade`` returns a replacement hash so callers can bring
+stored credentials in line with the policy on the next successful login.
+"""
+
+import argparse
+import os
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from config import (
+    PASSWORD_HASH_ALGORITHM,
+    PASSWORD_BCRYPT_ROUNDS,
+    PASSWORD_PBKDF2_ITERATIONS,
+    PASSWORD_SCRYPT_N,
+)
+
+try:
+    import bcrypt
+except ImportError:  # pragma: no cover - optional dependency
+    bcrypt = None
+
+LOGIN_REALMS = ('user', 'teacher', 'student')
+
+_LOOKUP_QUERIES = {
+    'user': '''
+        SELECT u.*, r.name AS role_name
+        FROM users u
+        JOIN user_roles r ON u.role_id = r.id
+        WHERE u.username = ? COLLATE NOCASE
+        LIMIT 1
+    ''',
+    'teacher': 'SELECT * FROM teachers WHERE username = ? COLLATE NOCASE LIMIT 1',
+    'student': 'SELECT * FROM students WHERE username = ? COLLATE NOCASE LIMIT 1',
+}
+
+UPDATE_HASH_QUERIES = {
+    'user': 'UPDATE users SET password_hash = ? WHERE id = ?',
+    'teacher': 'UPDATE teachers SET password_hash = ? WHERE id = ?',
+    'student': 'UPDATE students SET password_hash = ? WHERE id = ?',
+}
+
+
+def normalize_login(username):
+    """Return the login identifier as it is matched against the indexes."""
+    return (username or '').strip()
+
+
+def lookup_account(conn, realm, username):
+    """Return the account row for ``username`` in one realm, or None."""
+    if realm not in _LOOKUP_QUERIES:
+        raise ValueError(f"Unknown login realm: {realm}")
+    username = normalize_login(username)
+    if not username:
+        return None
+    return conn.execute(_LOOKUP_QUERIES[realm], (username,)).fetchone()
+
+
+def find_login_account(conn, username, realms=LOGIN_REALMS):
+    """Search realms in order and return ``(realm, row)`` for the first match.
+
+    Returns ``(None, None)`` when no realm has the username.
+    """
+    for realm in realms:
+        row = lookup_account(conn, realm, username)
+        if row is not None:
+            return realm, row
+    return None, None
+
+
+# ==================== PASSWORD HASHING POLICY ====================
+
+def hash_policy():
+    """Return the active ``(algorithm, cost)`` hashing policy."""
+    algorithm = (PASSWORD_HASH_ALGORITHM or 'bcrypt').lower()
+    if algorithm == 'bcrypt' and not bcrypt:
+        algorithm = 'pbkdf2'
+    if algorithm == 'bcrypt':
+        return algorithm, int(PASSWORD_BCRYPT_ROUNDS)
+    if algorithm == 'pbkdf2':
+        return algorithm, int(PASSWORD_PBKDF2_ITERATIONS)
+    if algorithm == 'scrypt':
+        return algorithm, int(PASSWORD_SCRYPT_N)
+    raise ValueError(f"Unsupported password hash algorithm: {PASSWORD_HASH_ALGORITHM}")
+
+
+def hash_parameters(hashed):
+    """Return ``(algorithm, cost)`` for a stored hash, or ``(None, None)``."""
+    if not hashed:
+        return None, None
+    if hashed.startswith(('$2a$', '$2b$', '$2y$')):
+        try:
+            return 'bcrypt', int(hashed.split('$')[2])
+        except (IndexError, ValueError):
+            return 'bcrypt', None
+    method = hashed.split('$', 1)[0]
+    parts = method.split(':')
+    try:
+        if parts[0] == 'pbkdf2':
+            # pbkdf2:sha256:600000 (iterations are optional in old hashes)
+            return 'pbkdf2', int(parts[2]) if len(parts) > 2 else None
+        if parts[0] == 'scrypt':
+            # scrypt:32768:8:1
+            return 'scrypt', int(parts[1]) if len(parts) > 1 else None
+    except ValueError:
+        return parts[0], None
+    return None, None
+
+
+def hash_password(password):
+    """Hash a plain-text password according to the configured policy."""
+    if not password:
+        raise ValueError("Password cannot be empty")
+    algorithm, cost = hash_policy()
+    if algorithm == 'bcrypt':
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=cost)).decode('utf-8')
+    if algorithm == 'pbkdf2':
+        return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+    return generate_password_hash(password, method=f'scrypt:{cost}:8:1')
+
+
+def verify_password(password, hashed):
+    """Check a password against a bcrypt, PBKDF2 or scrypt hash."""
+    if not password or not hashed:
+        return False
+    algorithm, _ = hash_parameters(hashed)
+    if algorithm == 'bcrypt':
+        if not bcrypt:
+            return False
+        try:
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        except (ValueError, TypeError):
+            return False
+    try:
+        return check_password_hash(hashed, password)
+    except (ValueError, TypeError):
+        return False
+
+
+def needs_rehash(hashed):
+    """Return True when a stored hash does not match the active policy."""
+    return hash_parameters(hashed) != hash_policy()
+
+
+def verify_and_upgrade(password, hashed):
+    """Verify a password and return ``(ok, new_hash)``.
+
+    ``new_hash`` is set only when the password matched and the stored hash
+    is weaker or stronger than the current policy.
+    """
+    if not verify_password(password, hashed):
+        return False, None
+    if needs_rehash(hashed):
+        return True, hash_password(password)
+    return True, None
+
+
+def upgrade_stored_hash(conn, realm, account_id, new_hash):
+    """Persist a rehashed password produced by ``verify_and_upgrade``."""
+    if not new_hash:
+        return
+    conn.execute(UPDATE_HASH_QUERIES[realm], (new_hash, account_id))
+
+
+def benchmark(seconds=2.0):
+    """Measure single-core verifications per second for the active policy."""
+    algorithm, cost = hash_policy()
+    sample = hash_password('benchmark-password')
+    count = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds or count == 0:
+        verify_password('benchmark-password', sample)
+        count += 1
+        elapsed = time.perf_counter() - started
+    per_core = count / elapsed
+    cores = os.cpu_count() or 1
+    return {
+        'algorithm': algorithm,
+        'cost': cost,
+        'verifications': count,
+        'seconds': round(elapsed, 3),
+        'per_core_per_second': round(per_core, 2),
+        'cores': cores,
+        'estimated_total_per_second': round(per_core * cores, 2),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Credential utilities.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    bench_parser = subparsers.add_parser('benchmark', help='Report password verifications per second per core.')
+    bench_parser.add_argument('--seconds', type=float, default=2.0, help='How long to run the benchmark.')
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        result = benchmark(args.seconds)
+        print(f"Policy: {result['algorithm']} (cost {result['cost']})")
+        print(f"Verifications: {result['verifications']} in {result['seconds']}s")
+        print(f"Per core: {result['per_core_per_second']} verifications/second")
+        print(f"Estimated with {result['cores']} cores: {result['estimated_total_per_second']} verifications/second")
@@ -0,0 +1,157 @@
+# dashboard.py
+"""Student count cube behind the admin dashboard widgets.
+
+Every dashboard widget is a count of ``students`` sliced by some mix of
+board, semester, technology, status and student type. Instead of scanning
+the table once per widget, a single ``GROUP BY`` over all five dimensions
+produces a small cube (one row per distinct combination) that is kept until
+the ``students`` data version changes. Widgets are then answered by summing
+cube cells in Python.
+"""
+
+import threading
+from collections import defaultdict
+
+from conditional import data_versions
+from db import get_connection
+
+CUBE_DIMENSIONS = ('board', 'semester', 'technology', 'status', 'student_type')
+CUBE_TABLES = ('students',)
+
+DASHBOARD_BOARDS = ('KPK Medical Faculty', 'KMU', 'PNC Board', 'Pharmacy Council')
+# Boards whose dashboard label differs from the stored value
+BOARD_DISPLAY_NAMES = {'PNC Board': 'PNC'}
+
+
+def _sort_key(value):
+    # SQLite's ORDER BY puts NULLs first; mirror that so None never meets a str
+    return (value is not None, value)
+
+
+class CountCube:
+    """Student counts keyed by ``CUBE_DIMENSIONS`` tuples."""
+
+    def __init__(self, cells, version):
+        self.cells = cells
+        self.version = version
+
+    @classmethod
+    def load(cls, conn, version):
+        columns = ', '.join(CUBE_DIMENSIONS)
+        rows = conn.execute(
+            f"SELECT {columns}, COUNT(*) FROM students GROUP BY {columns}"
+        ).fetchall()
+        return cls({tuple(row[:-1]): row[-1] for row in rows}, version)
+
+    def _matching(self, filters):
+        positions = [(CUBE_DIMENSIONS.index(name), value) for name, value in filters.items()]
+        for key, count in self.cells.items():
+            if all(key[index] == value for index, value in positions):
+                yield key, count
+
+    def count(self, **filters):
+        """Total count of the cells matching ``filters`` (dimension=value)."""
+        return sum(count for _, count in self._matching(filters))
+
+    def group(self, *dimensions, **filters):
+        """Counts grouped by ``dimensions``, sorted by key like ``ORDER BY``.
+
+        One dimension gives ``{value: count}``; several give ``{(v1, v2): count}``.
+        """
+        indexes = [CUBE_DIMENSIONS.index(name) for name in dimensions]
+        totals = defaultdict(int)
+        for key, count in self._matching(filters):
+            group_key = tuple(key[index] for index in indexes)
+            totals[group_key[0] if len(indexes) == 1 else group_key] += count
+        if len(indexes) == 1:
+            return dict(sorted(totals.items(), key=lambda item: _sort_key(item[0])))
+        return dict(sorted(totals.items(), key=lambda item: tuple(map(_sort_key, item[0]))))
+
+    def as_rows(self):
+        return [
+            dict(zip(CUBE_DIMENSIONS, key), count=count)
+            for key, count in sorted(self.cells.items(), key=lambda item: tuple(map(_sort_key, item[0])))
+        ]
+
+
+class CountCubeCache:
+    """Rebuilds the cube only when the ``students`` data version moves."""
+
+    def __init__(self):
+        self._cube = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = data_versions.token(CUBE_TABLES)
+        cube = self._cube
+        if cube is not None and cube.version == version:
+            return cube
+        with self._lock:
+            cube = self._cube
+            if cube is None or cube.version != version:
+                conn = get_connection()
+                try:
+                    cube = self._cube = CountCube.load(conn, version)
+                finally:
+                    conn.close()
+        return cube
+
+
+student_cube = CountCubeCache()
+
+
+# ==================== WIDGET SLICES ====================
+
+def active_by_board(cube):
+    """Active students per dashboard board, keyed by display name."""
+    return {
+        BOARD_DISPLAY_NAMES.get(board, board): cube.count(board=board, status='Active')
+        for board in DASHBOARD_BOARDS
+    }
+
+
+def by_organization_semester(cube):
+    """Total students and latest semester for each dashboard board present."""
+    data = {}
+    for board in sorted(DASHBOARD_BOARDS):
+        semesters = cube.group('semester', board=board)
+        if not semesters:
+            continue
+        named = [semester for semester in semesters if semester is not None]
+        data[board] = {
+            'total_students': sum(semesters.values()),
+            'latest_semester': max(named) if named else None,
+        }
+    return data
+
+
+def board_semester_detail(cube, board):
+    return [
+        {'semester': semester, 'count': count}
+        for semester, count in cube.group('semester', board=board).items()
+    ]
+
+
+def by_technology_semester(cube):
+    data = {}
+    for (technology, semester), count in cube.group('technology', 'semester').items():
+        entry = data.setdefault(technology, {'total': 0, 'semesters': {}})
+        entry['total'] += count
+        entry['semesters'][semester] = count
+    return data
+
+
+def summary(cube):
+    """Every dashboard widget in one payload, plus the cube it was sliced from."""
+    return {
+        'version': cube.version,
+        'total_students': cube.count(),
+        'active_students': cube.count(status='Active'),
+        'by_board': active_by_board(cube),
+        'by_semester': cube.group('semester'),
+        'by_organization_semester': by_organization_semester(cube),
+        'by_technology_semester': by_technology_semester(cube),
+        'by_status': cube.group('status'),
+        'by_student_type': cube.group('student_type'),
+        'cube': cube.as_rows(),
+    }
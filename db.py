@@ -2,31 +2,55 @@ import sqlite3
 import json
 from datetime import datetime
 from config import DB_NAME # Import DB_NAME from config
-from werkzeug.security import generate_password_hash, check_password_hash
 from rbac_constants import DEFAULT_MODULES, DEFAULT_ROLE_PERMISSIONS
-
-try:
-    import bcrypt
-except ImportError:  # pragma: no cover - optional dependency
-    bcrypt = None
-    print("Warning: bcrypt module not found. Falling back to Werkzeug PBKDF2 hashing.")
+from credentials import hash_password
+import metrics
+from teacher_assignments import backfill_assignments
 
 
 def bcrypt_hash(password: str) -> str:
-    """Hash a plain-text password using bcrypt when available."""
+    """Hash a plain-text password using the configured hashing policy."""
     if not password:
         raise ValueError("Password is required")
-    if bcrypt:
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    return generate_password_hash(password)
+    return hash_password(password)
+
+# Tables whose writes bump ``data_versions`` (see get_data_version)
+DATA_VERSION_TABLES = (
+    'students',
+    'attendance',
+    'employees',
+    'departments',
+    'designations',
+    'payroll',
+    'employee_deductions',
+    'midterm_exams',
+    'midterm_results',
+)
+
 
 def get_connection():
     """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME)
+    if metrics.METRICS_ENABLED:
+        # Statement counts and execute time feed the per-request metrics
+        conn = metrics.instrument_connection(
+            sqlite3.connect(DB_NAME, factory=metrics.InstrumentedConnection)
+        )
+    else:
+        conn = sqlite3.connect(DB_NAME)
     # Using Row factory makes it possible to access columns by name
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_data_version(conn, tables):
+    """Return a token that changes whenever any of ``tables`` is written to."""
+    placeholders = ', '.join('?' for _ in tables)
+    rows = conn.execute(
+        f'SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})',
+        tuple(tables)
+    ).fetchall()
+    versions = {row['table_name']: row['version'] for row in rows}
+    return ','.join(f"{table}:{versions.get(table, 0)}" for table in sorted(tables))
+
 def init_db():
     """
     Initializes the database by creating tables if they don't exist and
@@ -831,17 +855,192 @@ CREATE TABLE IF NOT EXISTS attendance_lock (
 )
 ''')
 
+    # Case-insensitive login identifiers (see credentials.py). Unique where the
+    # existing data allows it, otherwise a plain index still serves lookups.
+    login_indexes = {
+        'users': 'idx_users_username_nocase',
+        'teachers': 'idx_teachers_username_nocase',
+        'students': 'idx_students_username_nocase',
+    }
+    for table_name, index_name in login_indexes.items():
+        try:
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table_name}(username COLLATE NOCASE)")
+        except sqlite3.IntegrityError as e:
+            print(f"Duplicate usernames in {table_name}, creating non-unique login index: {e}")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}(username COLLATE NOCASE)")
+
+    # Server-side session payloads (see session_store.py)
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS web_sessions (
+    sid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at TEXT
+)
+''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_web_sessions_expires_at ON web_sessions(expires_at)')
+
+    # Month-end student strength per board/semester/type (see meeting_reports.py),
+    # so historical meeting reports do not depend on students' current status
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS student_strength_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    board TEXT,
+    semester TEXT,
+    student_type TEXT,
+    student_count INTEGER NOT NULL,
+    captured_at TEXT NOT NULL
+)
+''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_student_strength_snapshots_month ON student_strength_snapshots(month)')
+    # Covers the grouped strength query: filter on status/created_at, group by board/semester/type
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_students_status_created_board ON students(status, created_at, board, semester, student_type)')
+
+    # Per-row change counter for attendance sheets: every insert or edit of a
+    # mark stamps the row with the next revision, so clients holding a sheet
+    # version can fetch just the rows changed since (see attendance.load_attendance_sheet)
+    add_column_if_missing('attendance', 'revision', 'INTEGER NOT NULL DEFAULT 0')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_attendance_revision ON attendance(revision)')
+    for event in ('INSERT', 'UPDATE OF student_id, attendance_date, status, notes'):
+        try:
+            cur.execute(f'''
+CREATE TRIGGER IF NOT EXISTS trg_attendance_{event.split()[0].lower()}_revision
+AFTER {event} ON attendance
+BEGIN
+    UPDATE attendance SET revision = (SELECT COALESCE(MAX(revision), 0) + 1 FROM attendance) WHERE id = NEW.id;
+END
+''')
+        except sqlite3.OperationalError as e:
+            print(f"Error creating attendance revision trigger: {e}")
+
+    # Nightly month-to-date low-attendance roster (see low_attendance.py)
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS low_attendance_roster (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    as_of TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    present INTEGER NOT NULL,
+    absent INTEGER NOT NULL,
+    late INTEGER NOT NULL,
+    leave INTEGER NOT NULL,
+    total_days INTEGER NOT NULL,
+    present_percentage REAL NOT NULL,
+    computed_at TEXT NOT NULL,
+    FOREIGN KEY (student_id) REFERENCES students(id),
+    UNIQUE(month, student_id)
+)
+''')
+    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_low_attendance_roster_month_rank ON low_attendance_roster(month, rank)')
+    # Month-to-date roster scans a date range of attendance
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(attendance_date)')
+
+    # Outgoing SMS queue (see sms.py); dedupe_key keeps re-run jobs from queueing twice
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS sms_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    message TEXT NOT NULL,
+    student_id INTEGER,
+    dedupe_key TEXT UNIQUE,
+    source TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT,
+    FOREIGN KEY (student_id) REFERENCES students(id)
+)
+''')
+    add_column_if_missing('sms_outbox', 'next_attempt_at', 'TEXT')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_sms_outbox_status ON sms_outbox(status, id)')
+
+    # One row per student per promotion/demotion/rollover (see promotions.py)
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS student_semester_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    from_semester TEXT,
+    to_semester TEXT,
+    from_status TEXT,
+    to_status TEXT,
+    action TEXT NOT NULL,
+    term TEXT,
+    changed_by INTEGER,
+    changed_by_realm TEXT,
+    changed_at TEXT NOT NULL,
+    FOREIGN KEY (student_id) REFERENCES students(id)
+)
+''')
+    # 'user' (users.id) or 'teacher' (teachers.id), see promotions.py
+    add_column_if_missing('student_semester_history', 'changed_by_realm', 'TEXT')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_student_semester_history_student ON student_semester_history(student_id, changed_at)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_student_semester_history_from ON student_semester_history(from_semester, term, changed_at)')
+
+    # One row per teacher assignment, replacing the JSON text columns on
+    # teachers for lookups (see teacher_assignments.py)
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS teacher_semesters (
+    teacher_id INTEGER NOT NULL,
+    semester TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (teacher_id, semester),
+    FOREIGN KEY (teacher_id) REFERENCES teachers(id) ON DELETE CASCADE
+)
+''')
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS teacher_technologies (
+    teacher_id INTEGER NOT NULL,
+    technology TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (teacher_id, technology),
+    FOREIGN KEY (teacher_id) REFERENCES teachers(id) ON DELETE CASCADE
+)
+''')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_teacher_semesters_semester ON teacher_semesters(semester, teacher_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_teacher_technologies_technology ON teacher_technologies(technology, teacher_id)')
+
+    # Per-table change counters, bumped by triggers on every write. Cached
+    # exports are keyed on these so they are reused until the data changes.
+    cur.execute('''
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+)
+''')
+    for table_name in DATA_VERSION_TABLES:
+        cur.execute('INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)', (table_name,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            try:
+                cur.execute(f'''
+CREATE TRIGGER IF NOT EXISTS trg_{table_name}_{event.lower()}_version
+AFTER {event} ON {table_name}
+BEGIN
+    UPDATE data_versions SET version = version + 1 WHERE table_name = '{table_name}';
+END
+''')
+            except sqlite3.OperationalError as e:
+                print(f"Error creating data version trigger on {table_name}: {e}")
+
     # Add a default admin user if no teachers exist
     cur.execute("SELECT COUNT(*) FROM teachers")
     if cur.fetchone()[0] == 0:
         print("Adding default admin user...")
-        admin_password_hash = generate_password_hash('admin') # Default password 'admin'
+        admin_password_hash = hash_password('admin') # Default password 'admin'
         cur.execute(
             'INSERT INTO teachers (username, password_hash, name, role, assigned_semesters, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
             ('admin', admin_password_hash, 'Admin User', 'admin', json.dumps([]), datetime.now().isoformat(), datetime.now().isoformat())
         )
         print("Default admin user added: username='admin', password='admin'")
 
+    # Teachers saved before the assignment tables existed
+    backfilled = backfill_assignments(conn)
+    if backfilled:
+        print(f"Copied semester/technology assignments of {backfilled} teachers")
+
     # List of tables for dropdowns and their default values
     list_tables = {
         'campuses': ['Main Campus', 'Girl Campus', 'BS Campus', 'Nursing Campus'],
@@ -0,0 +1,249 @@
+# export_jobs.py
+"""Background rendering for slow exports.
+
+Submitting an export returns a job id immediately; a small thread pool
+renders the file into ``EXPORT_JOB_DIR`` while the client polls the job's
+status. The job id is derived from the export kind, its parameters and the
+``data_versions`` counters of the tables it reads, so an identical request
+made before the underlying data changes is answered with the file that is
+already on disk (or joins the job that is still rendering it).
+
+Finished jobs leave a small ``<id>.json`` sidecar next to the file, which lets
+any worker process serve a job that another process rendered.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_connection, get_data_version
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+PURGE_INTERVAL_SECONDS = 60
+_JOB_ID_LENGTH = 32
+
+
+class ExportKind:
+    """A registered export: ``render(params, target, progress)`` returns the download name."""
+
+    __slots__ = ('name', 'render', 'tables', 'mimetype', 'extension')
+
+    def __init__(self, name, render, tables, mimetype, extension):
+        self.name = name
+        self.render = render
+        self.tables = tuple(tables)
+        self.mimetype = mimetype
+        self.extension = extension
+
+
+class ExportJob:
+    __slots__ = ('id', 'kind', 'params', 'status', 'progress', 'pages', 'filename',
+                 'mimetype', 'error', 'created_at', 'finished_at')
+
+    def __init__(self, job_id, kind, params, mimetype):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0
+        self.pages = 0
+        self.filename = None
+        self.mimetype = mimetype
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def as_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': round(self.progress, 1),
+            'pages': self.pages,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+def attach_progress(doc, progress):
+    """Forward a ReportLab document's build progress to a job ``progress`` callback."""
+    if progress is None:
+        return
+    state = {'total': 0}
+
+    def on_progress(event, value):
+        if event == 'SIZE_EST':
+            state['total'] = value
+        elif event == 'PROGRESS' and state['total']:
+            progress(fraction=min(value / state['total'], 1.0))
+        elif event == 'PAGE':
+            progress(pages=value)
+
+    doc.setProgressCallBack(on_progress)
+
+
+class ExportJobQueue:
+    """Registry of export kinds plus the pool that renders them."""
+
+    def __init__(self, output_dir, max_workers=2, ttl_seconds=3600):
+        self.output_dir = output_dir
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(output_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export-job')
+        self._kinds = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def register(self, name, render, tables, mimetype='application/pdf', extension='pdf'):
+        self._kinds[name] = ExportKind(name, render, tables, mimetype, extension)
+
+    def kind(self, name):
+        return self._kinds.get(name)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.output_dir, f'{job_id}.{suffix}')
+
+    def file_path(self, job):
+        return self._path(job.id, self._kinds[job.kind].extension)
+
+    def _job_id(self, kind, params, data_version):
+        signature = json.dumps([kind.name, params, data_version], sort_keys=True, default=str)
+        return hashlib.sha256(signature.encode('utf-8')).hexdigest()[:_JOB_ID_LENGTH]
+
+    def _is_fresh(self, job):
+        return (
+            job.status == DONE
+            and job.finished_at is not None
+            and time.time() - job.finished_at < self.ttl_seconds
+            and os.path.exists(self.file_path(job))
+        )
+
+    def submit(self, name, params):
+        """Queue an export and return ``(job, cached)``.
+
+        ``cached`` is True when a finished file for the same parameters and
+        data version is already available.
+        """
+        kind = self._kinds[name]
+        conn = get_connection()
+        try:
+            data_version = get_data_version(conn, kind.tables)
+        finally:
+            conn.close()
+        job_id = self._job_id(kind, params, data_version)
+        self._maybe_purge()
+
+        with self._lock:
+            job = self._jobs.get(job_id) or self._load_finished(job_id)
+            if job is not None:
+                if job.status in (QUEUED, RUNNING):
+                    return job, False
+                if self._is_fresh(job):
+                    self._jobs[job_id] = job
+                    return job, True
+            job = self._jobs[job_id] = ExportJob(job_id, name, params, kind.mimetype)
+        self._executor.submit(self._run, job, kind)
+        return job, False
+
+    def get(self, job_id):
+        """Return a job by id, including jobs finished by another process."""
+        if not job_id or len(job_id) != _JOB_ID_LENGTH or any(c not in '0123456789abcdef' for c in job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load_finished(job_id)
+        if job is not None and job.status == DONE and not self._is_fresh(job):
+            return None
+        return job
+
+    def _load_finished(self, job_id):
+        meta_path = self._path(job_id, 'json')
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if meta.get('kind') not in self._kinds:
+            return None
+        job = ExportJob(job_id, meta['kind'], meta.get('params') or {}, meta.get('mimetype'))
+        job.status = DONE
+        job.progress = 100.0
+        job.pages = meta.get('pages') or 0
+        job.filename = meta.get('filename')
+        job.created_at = meta.get('created_at') or meta.get('finished_at')
+        job.finished_at = meta.get('finished_at')
+        return job
+
+    def _run(self, job, kind):
+        job.status = RUNNING
+        job.progress = 5.0
+        final_path = self.file_path(job)
+        part_path = f'{final_path}.part'
+
+        def progress(fraction=None, pages=None):
+            if fraction is not None:
+                # Reserve the first/last few percent for querying and saving
+                job.progress = max(job.progress, 10.0 + 85.0 * fraction)
+            if pages is not None:
+                job.pages = pages
+
+        try:
+            with open(part_path, 'wb') as target:
+                filename = kind.render(job.params, target, progress)
+            os.replace(part_path, final_path)
+            job.filename = filename or f'{kind.name}.{kind.extension}'
+            job.finished_at = time.time()
+            with open(self._path(job.id, 'json'), 'w', encoding='utf-8') as handle:
+                json.dump({
+                    'kind': job.kind,
+                    'params': job.params,
+                    'mimetype': job.mimetype,
+                    'filename': job.filename,
+                    'pages': job.pages,
+                    'created_at': job.created_at,
+                    'finished_at': job.finished_at,
+                }, handle)
+            job.progress = 100.0
+            job.status = DONE
+        except Exception as exc:
+            print(f"Export job {job.id} ({job.kind}) failed: {exc}")
+            job.error = str(exc)
+            job.status = FAILED
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        self.purge_expired()
+
+    def purge_expired(self):
+        """Forget finished jobs past their TTL and delete their files."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.status in (DONE, FAILED) and (job.finished_at or job.created_at) < cutoff]:
+                del self._jobs[job_id]
+        try:
+            entries = list(os.scandir(self.output_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError as exc:
+                print(f"Export job purge error: {exc}")
@@ -0,0 +1,147 @@
+# exporters.py
+"""Streaming report exports.
+
+Rows are pulled from a database cursor in batches and appended to an
+openpyxl write-only workbook, which keeps only the current row in memory.
+The finished file is written into a spooled temporary file (in memory for
+small exports, on disk above ``EXPORT_SPOOL_THRESHOLD_BYTES``) and sent to
+the client in chunks, so peak memory stays flat regardless of row count.
+
+CSV and NDJSON variants need no container format, so they are generated
+row by row while the response is being sent.
+"""
+
+import csv
+import io
+import json
+import tempfile
+
+from flask import Response, request, stream_with_context
+from openpyxl import Workbook
+
+from config import EXPORT_SPOOL_THRESHOLD_BYTES
+from db import get_connection
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+STREAM_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+FETCH_BATCH_SIZE = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def iter_query(query, params=(), batch_size=FETCH_BATCH_SIZE):
+    """Yield rows for ``query`` with fetchmany, owning the connection."""
+    conn = get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def numbered(rows, start=1):
+    """Prefix each row (a sequence) with a running S.NO column."""
+    for index, row in enumerate(rows, start):
+        yield [index, *row]
+
+
+def _iter_file(handle, chunk_size=STREAM_CHUNK_SIZE):
+    try:
+        while True:
+            chunk = handle.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+def spooled_file_response(handle, mimetype, download_name):
+    """Stream an open, rewound file object as an attachment and close it afterwards."""
+    handle.seek(0, 2)
+    size = handle.tell()
+    handle.seek(0)
+    response = Response(_iter_file(handle), mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['Content-Length'] = str(size)
+    return response
+
+
+def write_xlsx(rows, headers, sheet_title, target):
+    """Write ``headers`` and ``rows`` to ``target`` using a write-only workbook."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    ws.append(headers)
+    for row in rows:
+        ws.append(list(row))
+    wb.save(target)
+
+
+def stream_xlsx(rows, headers, sheet_title, download_name):
+    """Build an .xlsx export from a row iterator and return a streamed response."""
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_THRESHOLD_BYTES)
+    try:
+        write_xlsx(rows, headers, sheet_title, spool)
+    except Exception:
+        spool.close()
+        raise
+    return spooled_file_response(spool, XLSX_MIMETYPE, download_name)
+
+
+def requested_stream_format():
+    """Return 'csv' or 'ndjson' when the request asks for a streamed format."""
+    fmt = (request.args.get('format') or '').strip().lower()
+    return fmt if fmt in STREAM_FORMATS else None
+
+
+def _csv_chunks(rows, fieldnames=None, batch_size=FETCH_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = None
+    if fieldnames:
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+    pending = 0
+    for row in rows:
+        record = dict(row)
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(record.keys()), extrasaction='ignore')
+            writer.writeheader()
+        writer.writerow(record)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows, batch_size=FETCH_BATCH_SIZE):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(row), default=str, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_rows(rows, fmt, download_name, fieldnames=None):
+    """Return a generator response that writes ``rows`` (mappings) as CSV or NDJSON."""
+    if fmt == 'csv':
+        chunks = _csv_chunks(rows, fieldnames)
+        filename = f'{download_name}.csv'
+    else:
+        chunks = _ndjson_chunks(rows)
+        filename = f'{download_name}.ndjson'
+    response = Response(stream_with_context(chunks), mimetype=STREAM_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
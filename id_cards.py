@@ -0,0 +1,224 @@
+# id_cards.py
+"""Student and employee ID cards.
+
+Cards are CR80 sized (85.6 x 54 mm) and drawn straight onto the canvas in a
+fixed 2 x 5 grid per A4 page. Photos are never embedded at upload size: each
+one is scaled once to a small JPEG thumbnail stored in
+``ID_CARD_THUMBNAIL_DIR`` under the SHA-1 of the source file, so every later
+print (and every card sharing the same file) reuses it.
+
+Large selections are split into batches of ``ID_CARD_BATCH_PAGES`` pages.
+A thread pool prepares the thumbnails of upcoming batches (image decoding
+and resizing release the GIL) while the canvas draws the current one.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from config import ID_CARD_BATCH_PAGES, ID_CARD_RENDER_WORKERS
+from pdf_toolkit import BRAND_GREEN, INSTITUTE_NAME, fit_text
+
+CARD_WIDTH = 85.6 * mm
+CARD_HEIGHT = 54 * mm
+CARD_COLUMNS = 2
+CARD_ROWS = 5
+CARDS_PER_PAGE = CARD_COLUMNS * CARD_ROWS
+CARD_GAP_X = 8 * mm
+CARD_GAP_Y = 3 * mm
+
+HEADER_HEIGHT = 10 * mm
+FOOTER_HEIGHT = 5 * mm
+PHOTO_WIDTH = 21 * mm
+PHOTO_HEIGHT = 26 * mm
+# 300 dpi at the printed photo size
+THUMBNAIL_SIZE = (248, 307)
+
+CARD_TITLES = {
+    'students': "STUDENT IDENTITY CARD",
+    'employees': "EMPLOYEE IDENTITY CARD",
+}
+# (label, record key) pairs printed beside the photo
+CARD_FIELDS = {
+    'students': (
+        ("Name", 'name'),
+        ("Father", 'father_name'),
+        ("Adm. No", 'admission_no'),
+        ("Program", 'technology'),
+        ("Semester", 'semester'),
+        ("Campus", 'campus'),
+    ),
+    'employees': (
+        ("Name", 'name'),
+        ("Father", 'father_name'),
+        ("Designation", 'designation_name'),
+        ("Department", 'department_name'),
+        ("CNIC", 'cnic'),
+        ("Contact", 'contact'),
+    ),
+}
+CARD_FOOTER_KEYS = {
+    'students': 'board',
+    'employees': 'campus',
+}
+
+
+class ThumbnailCache:
+    """Card-sized JPEG thumbnails keyed by the SHA-1 of the source photo."""
+
+    def __init__(self, root_dir, cache_dir, size=THUMBNAIL_SIZE, quality=85):
+        self.root_dir = root_dir
+        self.cache_dir = cache_dir
+        self.size = size
+        self.quality = quality
+        os.makedirs(cache_dir, exist_ok=True)
+        # (path, size, mtime) -> digest, so unchanged files are hashed once per process
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def source_path(self, photo_path):
+        if not photo_path:
+            return None
+        path = os.path.normpath(os.path.join(self.root_dir, photo_path))
+        return path if os.path.isfile(path) else None
+
+    def _digest(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            sha1 = hashlib.sha1()
+            with open(path, 'rb') as handle:
+                for block in iter(lambda: handle.read(1024 * 1024), b''):
+                    sha1.update(block)
+            digest = sha1.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def thumbnail(self, photo_path):
+        """Return the thumbnail file for ``photo_path``, creating it if needed; None if unusable."""
+        source = self.source_path(photo_path)
+        if source is None:
+            return None
+        try:
+            digest = self._digest(source)
+            target = os.path.join(self.cache_dir, f'{digest}_{self.size[0]}x{self.size[1]}.jpg')
+            if not os.path.exists(target):
+                with Image.open(source) as image:
+                    image.draft('RGB', (self.size[0] * 2, self.size[1] * 2))
+                    image = ImageOps.exif_transpose(image).convert('RGB')
+                    image = ImageOps.fit(image, self.size, Image.LANCZOS)
+                # Write under a per-thread name so concurrent prints never read a partial file
+                part_path = f'{target}.{threading.get_ident()}.part'
+                image.save(part_path, 'JPEG', quality=self.quality, optimize=True)
+                os.replace(part_path, target)
+            return target
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"Card photo skipped for {photo_path}: {e}")
+            return None
+
+
+# ==================== DRAWING ====================
+
+def _card_origin(index, page_width, page_height):
+    left = (page_width - CARD_COLUMNS * CARD_WIDTH - (CARD_COLUMNS - 1) * CARD_GAP_X) / 2
+    top = (page_height + CARD_ROWS * CARD_HEIGHT + (CARD_ROWS - 1) * CARD_GAP_Y) / 2
+    row, column = divmod(index, CARD_COLUMNS)
+    return (
+        left + column * (CARD_WIDTH + CARD_GAP_X),
+        top - (row + 1) * CARD_HEIGHT - row * CARD_GAP_Y,
+    )
+
+
+def _draw_card(c, x, y, card_type, record, photo):
+    c.setStrokeColor(BRAND_GREEN)
+    c.setLineWidth(0.8)
+    c.roundRect(x, y, CARD_WIDTH, CARD_HEIGHT, 3 * mm, stroke=1, fill=0)
+
+    # Header band
+    c.setFillColor(BRAND_GREEN)
+    c.rect(x, y + CARD_HEIGHT - HEADER_HEIGHT, CARD_WIDTH, HEADER_HEIGHT, stroke=0, fill=1)
+    c.setFillColor(colors.white)
+    c.setFont('Helvetica-Bold', 7)
+    c.drawCentredString(x + CARD_WIDTH / 2, y + CARD_HEIGHT - 4.2 * mm,
+                        fit_text(INSTITUTE_NAME, 'Helvetica-Bold', 7, CARD_WIDTH - 4 * mm))
+    c.setFont('Helvetica', 5.5)
+    c.drawCentredString(x + CARD_WIDTH / 2, y + CARD_HEIGHT - 8 * mm, CARD_TITLES[card_type])
+
+    # Photo, or an empty frame when there is none
+    photo_x = x + 3 * mm
+    photo_y = y + FOOTER_HEIGHT + (CARD_HEIGHT - HEADER_HEIGHT - FOOTER_HEIGHT - PHOTO_HEIGHT) / 2
+    if photo:
+        c.drawImage(photo, photo_x, photo_y, PHOTO_WIDTH, PHOTO_HEIGHT)
+    else:
+        c.setFillColor(colors.HexColor('#f1f1f1'))
+        c.rect(photo_x, photo_y, PHOTO_WIDTH, PHOTO_HEIGHT, stroke=0, fill=1)
+        c.setFillColor(colors.HexColor('#999999'))
+        c.setFont('Helvetica', 6)
+        c.drawCentredString(photo_x + PHOTO_WIDTH / 2, photo_y + PHOTO_HEIGHT / 2, "PHOTO")
+    c.setStrokeColor(colors.HexColor('#cccccc'))
+    c.setLineWidth(0.5)
+    c.rect(photo_x, photo_y, PHOTO_WIDTH, PHOTO_HEIGHT, stroke=1, fill=0)
+
+    # Fields beside the photo
+    label_x = photo_x + PHOTO_WIDTH + 3 * mm
+    value_x = label_x + 15 * mm
+    value_width = x + CARD_WIDTH - 2.5 * mm - value_x
+    line_y = y + CARD_HEIGHT - HEADER_HEIGHT - 5 * mm
+    text = c.beginText()
+    text.setFillColor(colors.black)
+    for label, key in CARD_FIELDS[card_type]:
+        value = str(record.get(key) or '-')
+        text.setTextOrigin(label_x, line_y)
+        text.setFont('Helvetica-Bold', 6.5)
+        text.textOut(f"{label}:")
+        text.setTextOrigin(value_x, line_y)
+        text.setFont('Helvetica', 6.5)
+        text.textOut(fit_text(value, 'Helvetica', 6.5, value_width))
+        line_y -= 4.6 * mm
+    c.drawText(text)
+
+    # Footer band
+    c.setFillColor(BRAND_GREEN)
+    c.rect(x, y, CARD_WIDTH, FOOTER_HEIGHT, stroke=0, fill=1)
+    c.setFillColor(colors.white)
+    c.setFont('Helvetica-Bold', 6)
+    footer = str(record.get(CARD_FOOTER_KEYS[card_type]) or '')
+    c.drawCentredString(x + CARD_WIDTH / 2, y + 1.7 * mm, fit_text(footer, 'Helvetica-Bold', 6, CARD_WIDTH - 6 * mm))
+
+
+def _prepare_batch(thumbnails, pages):
+    return [[thumbnails.thumbnail(record.get('photo_path')) for record in page] for page in pages]
+
+
+def render_cards_pdf(records, card_type, target, thumbnails, progress=None):
+    """Draw ``records`` as ID cards into ``target`` and return the page count."""
+    page_width, page_height = A4
+    pages = [records[start:start + CARDS_PER_PAGE] for start in range(0, len(records), CARDS_PER_PAGE)]
+    batches = [pages[start:start + ID_CARD_BATCH_PAGES] for start in range(0, len(pages), ID_CARD_BATCH_PAGES)]
+
+    c = canvas.Canvas(target, pagesize=A4)
+    c.setTitle(f"{CARD_TITLES[card_type].title()}s")
+    page_number = 0
+    with ThreadPoolExecutor(max_workers=ID_CARD_RENDER_WORKERS, thread_name_prefix='id-card') as pool:
+        # Batches are queued up front; the canvas consumes them in order as they finish
+        futures = [pool.submit(_prepare_batch, thumbnails, batch) for batch in batches]
+        for batch, future in zip(batches, futures):
+            for page, photos in zip(batch, future.result()):
+                for index, (record, photo) in enumerate(zip(page, photos)):
+                    x, y = _card_origin(index, page_width, page_height)
+                    _draw_card(c, x, y, card_type, record, photo)
+                c.showPage()
+                page_number += 1
+                if progress:
+                    progress(fraction=page_number / len(pages), pages=page_number)
+    c.save()
+    return page_number
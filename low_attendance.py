@@ -0,0 +1,147 @@
+# low_attendance.py
+"""Precomputed low-attendance roster.
+
+Once a night the month-to-date present percentage of every active student
+is computed with one grouped query over that month's attendance, and the
+students below ``LOW_ATTENDANCE_THRESHOLD`` are stored, ranked worst first,
+in ``low_attendance_roster``. The principal's institution-wide list is then
+a read of one month's rows by ``(month, rank)``.
+
+Students with fewer than ``LOW_ATTENDANCE_MIN_DAYS`` marks this month are
+not listed: early in the month one absence would read as 0%, and an empty
+record means attendance has not been taken, not that the student stayed away.
+
+When ``LOW_ATTENDANCE_SMS_ENABLED`` is set (or a refresh asks for it), each
+listed student's parent gets one SMS per month through the outbox in
+``sms.py``.
+"""
+
+from datetime import date, datetime, timedelta
+
+from config import (
+    LOW_ATTENDANCE_THRESHOLD, LOW_ATTENDANCE_ROSTER_HOUR, LOW_ATTENDANCE_MIN_DAYS,
+    LOW_ATTENDANCE_SMS_ENABLED, LOW_ATTENDANCE_SMS_TEMPLATE
+)
+from db import get_connection
+from scheduler import NightlyScheduler
+from sms import enqueue_messages, student_phone_sql
+
+SMS_SOURCE = 'low_attendance'
+ROSTER_FILTERS = ('campus', 'board', 'technology', 'semester')
+
+_REFRESH_ROSTER_SQL = '''
+    INSERT INTO low_attendance_roster
+        (month, as_of, rank, student_id, present, absent, late, leave, total_days, present_percentage, computed_at)
+    SELECT ?, ?, ROW_NUMBER() OVER (ORDER BY present_percentage, total_days DESC, student_id),
+           student_id, present, absent, late, leave, total_days, present_percentage, ?
+    FROM (
+        SELECT a.student_id,
+               SUM(a.status = 'Present') AS present,
+               SUM(a.status = 'Absent') AS absent,
+               SUM(a.status = 'Late') AS late,
+               SUM(a.status = 'Leave') AS leave,
+               COUNT(*) AS total_days,
+               ROUND(100.0 * SUM(a.status = 'Present') / COUNT(*), 2) AS present_percentage
+        FROM attendance a
+        JOIN students s ON s.id = a.student_id
+        WHERE s.status = 'Active' AND a.attendance_date >= ? AND a.attendance_date < ?
+        GROUP BY a.student_id
+        HAVING COUNT(*) >= ?
+    )
+    WHERE present_percentage < ?
+'''
+
+
+def refresh_roster(conn, as_of=None, threshold=LOW_ATTENDANCE_THRESHOLD, min_days=LOW_ATTENDANCE_MIN_DAYS):
+    """Replace the roster of ``as_of``'s month with its month-to-date figures (caller commits).
+
+    Returns ``(month, listed_count, computed_at)``.
+    """
+    as_of = as_of or date.today()
+    month = as_of.strftime('%Y-%m')
+    computed_at = datetime.now().isoformat(timespec='seconds')
+    conn.execute('DELETE FROM low_attendance_roster WHERE month = ?', (month,))
+    cursor = conn.execute(_REFRESH_ROSTER_SQL, (
+        month, as_of.isoformat(), computed_at,
+        as_of.replace(day=1).isoformat(), (as_of + timedelta(days=1)).isoformat(),
+        min_days, threshold
+    ))
+    return month, cursor.rowcount, computed_at
+
+
+def load_roster(conn, month, filters=None, semesters=None):
+    """Listed students of ``month`` in rank order, optionally narrowed like the other attendance reports."""
+    conditions = ['r.month = ?']
+    params = [month]
+    filters = filters or {}
+    for name in ROSTER_FILTERS:
+        value = filters.get(name)
+        if value:
+            conditions.append(f's.{name} = ?')
+            params.append(value)
+    if semesters is not None:
+        if not semesters:
+            return []
+        conditions.append(f"s.semester IN ({','.join('?' for _ in semesters)})")
+        params.extend(semesters)
+    return [dict(row) for row in conn.execute(
+        f'''
+        SELECT r.rank, s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.board, s.campus,
+               r.present, r.absent, r.late, r.leave, r.total_days, r.present_percentage, r.as_of, r.computed_at
+        FROM low_attendance_roster r
+        JOIN students s ON s.id = r.student_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY r.rank
+        ''',
+        params
+    )]
+
+
+def enqueue_parent_sms(conn, month, threshold=LOW_ATTENDANCE_THRESHOLD):
+    """Queue one SMS per listed student with a phone number; returns how many were new (caller commits)."""
+    month_label = datetime.strptime(month, '%Y-%m').strftime('%B %Y')
+    rows = conn.execute(
+        f'''
+        SELECT s.id, s.name, s.admission_no, r.present_percentage, {student_phone_sql('s')} AS recipient
+        FROM low_attendance_roster r
+        JOIN students s ON s.id = r.student_id
+        WHERE r.month = ? AND {student_phone_sql('s')} IS NOT NULL
+        ORDER BY r.rank
+        ''',
+        (month,)
+    ).fetchall()
+    return enqueue_messages(conn, (
+        (
+            row['recipient'],
+            LOW_ATTENDANCE_SMS_TEMPLATE.format(
+                name=row['name'], admission_no=row['admission_no'], month=month_label,
+                present_percentage=row['present_percentage'], threshold=threshold
+            ),
+            row['id'],
+            f"{SMS_SOURCE}:{month}:{row['id']}",
+        )
+        for row in rows
+    ), SMS_SOURCE)
+
+
+def run_nightly_refresh(as_of=None, send_sms=LOW_ATTENDANCE_SMS_ENABLED):
+    """Refresh the roster in one transaction and optionally queue parent SMS; returns a summary dict."""
+    conn = get_connection()
+    try:
+        with conn:
+            month, listed, computed_at = refresh_roster(conn, as_of)
+            queued = enqueue_parent_sms(conn, month) if send_sms else 0
+    finally:
+        conn.close()
+    return {'month': month, 'listed': listed, 'sms_queued': queued, 'computed_at': computed_at}
+
+
+def _nightly_task():
+    # Runs after midnight, so it closes out the day that just ended (and, on
+    # the 1st, the whole previous month)
+    summary = run_nightly_refresh(as_of=date.today() - timedelta(days=1))
+    print(f"Low-attendance roster for {summary['month']}: {summary['listed']} listed, "
+          f"{summary['sms_queued']} SMS queued")
+
+
+nightly_refresh = NightlyScheduler('low-attendance-roster', LOW_ATTENDANCE_ROSTER_HOUR, _nightly_task)
@@ -9,23 +9,66 @@ from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import db
 import io
-from openpyxl import Workbook
 from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 import pandas as pd # For reading excel file in Flask
 from db import get_connection # Ensure get_connection is imported
 from config import DB_NAME # Ensure DB_NAME is imported
-from werkzeug.security import generate_password_hash, check_password_hash
+from config import SESSION_BACKEND, SESSION_MEMORY_PERSIST_PATH, SESSION_ACTIVITY_GRANULARITY_SECONDS
+from session_store import build_session_interface
+from exporters import iter_query, stream_xlsx, requested_stream_format, stream_rows
+from reports import REPORT1, REPORT2, REPORT3, render_report, build_pdf as build_report_pdf
+from export_jobs import ExportJobQueue, attach_progress, DONE as EXPORT_JOB_DONE
+from pdf_toolkit import (
+    SAMPLE_STYLES, INSTITUTE_NAME, PAYROLL_TITLE, ATTENDANCE_TITLE, ATTENDANCE_SUBTITLE,
+    FILTER_INFO, SECTION_TITLE, WARNING_TITLE, EXAM_TITLE, EXAM_SUBTITLE, EXAM_META, EXAM_FILTERS,
+    DAILY_ATTENDANCE_TABLE, MONTHLY_ATTENDANCE_TABLE, LOW_ATTENDANCE_TABLE, DEDUCTIONS_TABLE,
+    EXAM_SUMMARY_TABLE, EXAM_RESULTS_TABLE,
+    ATTENDANCE_BLUE, report_document, institute_header, total_records_footer, chunked_table, draw_grid_pdf
+)
+import metrics
+from conditional import versioned
+import conditional
+import dashboard as dashboard_counts
+import meeting_reports
+import low_attendance
+import promotions
+import sms
+from teacher_dashboard import TeacherScope, semesters_of_students, teacher_dashboards
+from teacher_assignments import (
+    parse_multi_value, serialize_multi_value, set_assignments, delete_assignments,
+    load_assignments, teacher_assignments, covers_sql
+)
+from attendance import (
+    REGISTER_FILTERS, prepare_attendance_upload, upsert_attendance, load_monthly_register,
+    register_payload, register_headers, register_rows,
+    student_attendance_locks, employee_attendance_locks,
+    load_attendance_sheet, parse_sheet_version, prepare_sheet_changes, apply_sheet_changes,
+    load_employee_attendance_sheet, upsert_employee_attendance
+)
+from id_cards import CARD_TITLES, ThumbnailCache, render_cards_pdf
+from certificates import (
+    CERTIFICATE_TYPES, ZIP_MIMETYPE, render_certificate, build_certificate_batch_pdf, build_certificate_batch_zip
+)
+from rate_limit import CredentialRateLimiter
+from config import (
+    LOGIN_RATE_LIMIT_IP_CAPACITY, LOGIN_RATE_LIMIT_IP_REFILL_PER_MINUTE,
+    LOGIN_RATE_LIMIT_ACCOUNT_CAPACITY, LOGIN_RATE_LIMIT_ACCOUNT_REFILL_PER_MINUTE,
+    LOGIN_LOCKOUT_THRESHOLD, LOGIN_LOCKOUT_MINUTES, LOGIN_ATTEMPT_FLUSH_SECONDS,
+    METRICS_SCRAPE_TOKEN,
+    EXPORT_JOB_DIR, EXPORT_JOB_WORKERS, EXPORT_JOB_TTL_SECONDS,
+    ID_CARD_THUMBNAIL_DIR, LOW_ATTENDANCE_THRESHOLD, LOW_ATTENDANCE_SMS_ENABLED,
+    BACKGROUND_JOBS_ENABLED
+)
+from credentials import (
+    find_login_account, lookup_account, hash_password, verify_password,
+    verify_and_upgrade, upgrade_stored_hash
+)
 import functools
 import json
-try:
-    import bcrypt
-except ImportError:  # pragma: no cover - optional dependency
-    bcrypt = None
-    print("Warning: bcrypt module not found. Falling back to Werkzeug PBKDF2 hashing.")
+import threading
 from rbac_constants import DEFAULT_MODULES, ROUTE_PERMISSION_RULES
 
 app = Flask(__name__, template_folder='templates')
@@ -39,6 +82,19 @@ app.permanent_session_lifetime = timedelta(minutes=SESSION_TIMEOUT_MINUTES)
 with app.app_context():
     db.init_db()
 
+_session_interface = build_session_interface(
+    SESSION_BACKEND,
+    persist_path=SESSION_MEMORY_PERSIST_PATH,
+    idle_grace_seconds=SESSION_ACTIVITY_GRANULARITY_SECONDS
+)
+if _session_interface is not None:
+    app.session_interface = _session_interface
+    # Idle expiry is tracked server-side, so the cookie is only re-sent when the session changes
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+
+metrics.init_app(app)
+conditional.init_app(app)
+
 # Decorator to check if user is logged in
 def login_required(view):
     @functools.wraps(view)
@@ -67,23 +123,30 @@ def admin_required(view):
 
 @app.before_request
 def enforce_session_timeout():
-    """Logout inactive sessions after the configured idle window."""
+    """Logout inactive sessions after the configured idle window.
+
+    ``last_activity`` is only rewritten once it is older than
+    SESSION_ACTIVITY_GRANULARITY_SECONDS, so most requests leave the session
+    untouched and nothing has to be stored or re-sent.
+    """
     if not session.get('logged_in'):
         return
     now = datetime.utcnow()
     last_activity = session.get('last_activity')
+    last_active = None
     if last_activity:
         try:
             last_active = datetime.fromisoformat(last_activity)
         except ValueError:
-            last_active = now
-        if now - last_active > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
+            last_active = None
+        if last_active and now - last_active > timedelta(minutes=SESSION_TIMEOUT_MINUTES):
             logout_current_user(reason='Session expired', silent=True)
             if request.path.startswith('/api/'):
                 return jsonify({'status': 'error', 'message': 'Session expired. Please login again.'}), 401
             flash('Session expired due to inactivity. Please login again.', 'warning')
             return redirect(url_for('login'))
-    session['last_activity'] = now.isoformat()
+    if last_active is None or (now - last_active).total_seconds() >= SESSION_ACTIVITY_GRANULARITY_SECONDS:
+        session['last_activity'] = now.isoformat()
 
 
 @app.before_request
@@ -137,7 +200,9 @@ EXPORT_ENDPOINT_LOGS = {
     'export_monthly_attendance_pdf': ('attendance', 'Exported monthly attendance report (PDF)'),
     'export_monthly_attendance_excel': ('attendance', 'Exported monthly attendance report (Excel)'),
     'export_cards_to_pdf': ('documents', 'Generated student cards PDF'),
-    'export_exam_results_pdf': ('dmc', 'Exported exam results PDF')
+    'export_exam_results_pdf': ('dmc', 'Exported exam results PDF'),
+    'certificates_pdf': ('documents', 'Generated batch certificates (PDF)'),
+    'certificates_zip': ('documents', 'Generated batch certificates (ZIP)')
 }
 
 
@@ -170,34 +235,6 @@ def can_view_student_dmc(student_id):
         return True
     return False
 
-def parse_multi_value(value):
-    """Convert stored JSON/comma string into a clean list."""
-    if not value:
-        return []
-    if isinstance(value, list):
-        return [str(item).strip() for item in value if str(item).strip()]
-    if isinstance(value, str):
-        value = value.strip()
-        if not value:
-            return []
-        try:
-            parsed = json.loads(value)
-            if isinstance(parsed, list):
-                return [str(item).strip() for item in parsed if str(item).strip()]
-        except json.JSONDecodeError:
-            pass
-        if ',' in value:
-            return [item.strip() for item in value.split(',') if item.strip()]
-        return [value]
-    return []
-
-def serialize_multi_value(values):
-    """Serialize a multi-select list to JSON."""
-    if not values:
-        return json.dumps([])
-    cleaned = [str(item).strip() for item in values if str(item).strip()]
-    return json.dumps(cleaned)
-
 def join_display(values):
     """Return a human-friendly comma-separated string."""
     return ', '.join(values or [])
@@ -392,27 +429,30 @@ INVENTORY_FULL_ACCESS_ROLES = {'admin', 'store_incharge'}
 INVENTORY_REPORT_ROLES = INVENTORY_FULL_ACCESS_ROLES | {'principal'}
 
 
-def hash_password(password):
-    """Hash plaintext password using bcrypt."""
-    if not password:
-        raise ValueError("Password cannot be empty")
-    if bcrypt:
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    return generate_password_hash(password)
+credential_rate_limiter = CredentialRateLimiter(
+    ip_capacity=LOGIN_RATE_LIMIT_IP_CAPACITY,
+    ip_refill_per_minute=LOGIN_RATE_LIMIT_IP_REFILL_PER_MINUTE,
+    account_capacity=LOGIN_RATE_LIMIT_ACCOUNT_CAPACITY,
+    account_refill_per_minute=LOGIN_RATE_LIMIT_ACCOUNT_REFILL_PER_MINUTE,
+    lockout_threshold=LOGIN_LOCKOUT_THRESHOLD,
+    lockout_minutes=LOGIN_LOCKOUT_MINUTES,
+    flush_seconds=LOGIN_ATTEMPT_FLUSH_SECONDS,
+    connection_factory=get_connection
+)
 
 
-def verify_password(password, hashed):
-    """Safely verify a bcrypt hashed password."""
-    if not password or not hashed:
-        return False
-    if hashed.startswith('pbkdf2:'):
-        return check_password_hash(hashed, password)
-    if not bcrypt:
-        return check_password_hash(hashed, password)
-    try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    except (ValueError, TypeError):
-        return False
+def throttle_credential_attempt(realm, identifier):
+    """Charge a password attempt before hashing.
+
+    Returns ``(account_key, error_message)``; the message is None when the
+    attempt may proceed.
+    """
+    account_key = CredentialRateLimiter.account_key(realm, identifier)
+    wait_seconds = credential_rate_limiter.check(request.remote_addr, account_key)
+    if wait_seconds is None:
+        return account_key, None
+    minutes = max(1, int(wait_seconds // 60) + (1 if wait_seconds % 60 else 0))
+    return account_key, f'Too many attempts. Please try again in {minutes} minute(s).'
 
 
 def canonical_role_key(role_name):
@@ -464,6 +504,15 @@ def current_user_id():
     return session.get('user_id')
 
 
+def current_actor():
+    """``(id, realm)`` of the logged-in RBAC user or legacy teacher, for audit columns."""
+    if session.get('auth_system') == 'rbac' and session.get('user_id'):
+        return session['user_id'], promotions.USER_REALM
+    if session.get('teacher_id'):
+        return session['teacher_id'], promotions.TEACHER_REALM
+    return None, None
+
+
 def user_is_admin():
     """Return True if the logged-in user has admin privileges."""
     if session.get('auth_system') == 'rbac':
@@ -700,11 +749,9 @@ def upsert_employee_payroll(cur, employee_row, month, year):
             (employee_id, month, year, basic_salary, allowances, total_deductions, net_salary, now)
         )
 
-def fetch_deductions_data(employee_id=None, employee_name=None, father_name=None,
-                          month=None, year=None, campus=None):
-    """Shared helper to retrieve employee deduction records."""
-    conn = get_connection()
-    cur = conn.cursor()
+def iter_deductions_data(employee_id=None, employee_name=None, father_name=None,
+                         month=None, year=None, campus=None):
+    """Yield formatted employee deduction records straight from the cursor."""
     query = '''
         SELECT ed.id, ed.employee_id, e.name as employee_name, e.father_name,
                e.campus, e.basic_salary AS employee_basic_salary,
@@ -745,12 +792,9 @@ def fetch_deductions_data(employee_id=None, employee_name=None, father_name=None
         params.append(campus)
 
     query += ' ORDER BY e.name, ed.year DESC, ed.month DESC'
-    cur.execute(query, params)
-    rows = [dict(row) for row in cur.fetchall()]
-    conn.close()
-    
-    formatted_rows = []
-    for row in rows:
+
+    for row in iter_query(query, params):
+        row = dict(row)
         base_salary = row.get('payroll_basic_salary')
         if base_salary is None:
             base_salary = row.get('employee_basic_salary') or 0.0
@@ -767,8 +811,13 @@ def fetch_deductions_data(employee_id=None, employee_name=None, father_name=None
         row['salary_after'] = round(max(salary_after, 0.0), 2)
         row['deduction_type'] = row.get('deduction_type') or 'Other'
         row['entry_date'] = row.get('created_at')
-        formatted_rows.append(row)
-    return formatted_rows
+        yield row
+
+
+def fetch_deductions_data(employee_id=None, employee_name=None, father_name=None,
+                          month=None, year=None, campus=None):
+    """Shared helper to retrieve employee deduction records."""
+    return list(iter_deductions_data(employee_id, employee_name, father_name, month, year, campus))
 
 def fetch_exam_results_rows(cursor, exam_id, campus=None, technology=None):
     """Reusable helper to grab exam results with optional student filters."""
@@ -797,18 +846,15 @@ def login():
         username = (request.form['username'] or '').strip()
         password = request.form['password']
 
+        account_key, throttle_error = throttle_credential_attempt('login', username)
+        if throttle_error:
+            return render_template('login.html', error=throttle_error), 429
+
         conn = get_connection()
         try:
-            user = conn.execute(
-                '''
-                    SELECT u.*, r.name AS role_name
-                    FROM users u
-                    JOIN user_roles r ON u.role_id = r.id
-                    WHERE LOWER(u.username) = LOWER(?)
-                    LIMIT 1
-                ''',
-                (username,)
-            ).fetchone()
+            realm, account = find_login_account(conn, username, realms=('user', 'teacher'))
+            user = account if realm == 'user' else None
+            teacher = account if realm == 'teacher' else None
 
             if user:
                 now = datetime.utcnow()
@@ -827,27 +873,30 @@ def login():
                         except ValueError:
                             pass
                 if not error:
-                    if verify_password(password, user['password_hash']):
+                    password_ok, upgraded_hash = verify_and_upgrade(password, user['password_hash'])
+                    if password_ok:
                         conn.execute(
                             'UPDATE users SET login_attempts = 0, last_login_at = ?, last_login_ip = ? WHERE id = ?',
                             (now_iso, request.remote_addr, user['id'])
                         )
+                        upgrade_stored_hash(conn, 'user', user['id'], upgraded_hash)
                         conn.commit()
+                        credential_rate_limiter.record_success(account_key, user_id=user['id'], ip=request.remote_addr)
                         modules = fetch_role_modules(conn, user['role_id'])
                         build_user_session(dict(user), modules)
                         log_user_action('login', description='Successful login')
                         flash('Logged in successfully!', 'success')
                         return redirect(url_for('index'))
                     else:
-                        conn.execute(
-                            'UPDATE users SET login_attempts = login_attempts + 1, last_failed_login_at = ? WHERE id = ?',
-                            (now_iso, user['id'])
-                        )
-                        conn.commit()
+                        credential_rate_limiter.record_failure(account_key, user_id=user['id'])
                         error = 'Invalid username or password. Please try again.'
             else:
-                teacher = conn.execute('SELECT * FROM teachers WHERE username = ? AND status = ?', (username, 'Active')).fetchone()
-                if teacher and check_password_hash(teacher['password_hash'], password):
+                if teacher and teacher['status'] != 'Active':
+                    teacher = None
+                password_ok, upgraded_hash = verify_and_upgrade(password, teacher['password_hash']) if teacher else (False, None)
+                if password_ok:
+                    upgrade_stored_hash(conn, 'teacher', teacher['id'], upgraded_hash)
+                    credential_rate_limiter.record_success(account_key, ip=request.remote_addr)
                     permissions = conn.execute(
                         'SELECT permission_name FROM teacher_permissions WHERE teacher_id = ? AND granted = 1',
                         (teacher['id'],)
@@ -855,8 +904,7 @@ def login():
                     permission_list = [p['permission_name'] for p in permissions]
                     
                     teacher_dict = dict(teacher)
-                    assigned_semesters = parse_multi_value(teacher_dict.get('assigned_semesters'))
-                    technology_assignments = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+                    assigned_semesters, technology_assignments = teacher_assignments(conn, teacher['id'])
                     teacher_dict['assigned_semesters'] = assigned_semesters
                     teacher_dict['technology_assignments'] = technology_assignments
                     teacher_dict['technology'] = join_display(technology_assignments)
@@ -883,6 +931,7 @@ def login():
                     flash('Logged in successfully!', 'success')
                     return redirect(url_for('index'))
                 else:
+                    credential_rate_limiter.record_failure(account_key)
                     error = 'Invalid Credentials or Account Deactivated. Please try again.'
         finally:
             conn.close()
@@ -896,12 +945,20 @@ def teacher_login():
         username = request.form['username']
         password = request.form['password']
 
+        account_key, throttle_error = throttle_credential_attempt('login', username)
+        if throttle_error:
+            return render_template('teacher_login.html', error=throttle_error), 429
+
         conn = get_connection()
         try:
-            teacher = conn.execute('SELECT * FROM teachers WHERE username = ? AND status = ? AND role = ?', 
-                                  (username, 'Active', 'teacher')).fetchone()
+            teacher = lookup_account(conn, 'teacher', username)
+            if teacher and (teacher['status'] != 'Active' or teacher['role'] != 'teacher'):
+                teacher = None
             
-            if teacher and check_password_hash(teacher['password_hash'], password):
+            password_ok, upgraded_hash = verify_and_upgrade(password, teacher['password_hash']) if teacher else (False, None)
+            if password_ok:
+                upgrade_stored_hash(conn, 'teacher', teacher['id'], upgraded_hash)
+                credential_rate_limiter.record_success(account_key, ip=request.remote_addr)
                 permissions = conn.execute(
                     'SELECT permission_name FROM teacher_permissions WHERE teacher_id = ? AND granted = 1',
                     (teacher['id'],)
@@ -909,8 +966,7 @@ def teacher_login():
                 permission_list = [p['permission_name'] for p in permissions]
                 
                 teacher_dict = dict(teacher)
-                assigned_semesters = parse_multi_value(teacher_dict.get('assigned_semesters'))
-                technology_assignments = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+                assigned_semesters, technology_assignments = teacher_assignments(conn, teacher['id'])
                 teacher_dict['assigned_semesters'] = assigned_semesters
                 teacher_dict['technology_assignments'] = technology_assignments
                 teacher_dict['technology'] = join_display(technology_assignments)
@@ -938,6 +994,7 @@ def teacher_login():
                 flash('Logged in successfully!', 'success')
                 return redirect(url_for('teacher_dashboard'))
             else:
+                credential_rate_limiter.record_failure(account_key)
                 error = 'Invalid Credentials or Account Deactivated. Please contact administrator.'
         finally:
             conn.close()
@@ -996,11 +1053,19 @@ def change_password():
             flash('All fields are required.', 'danger')
             return redirect(url_for('index'))
 
+        account_key, throttle_error = throttle_credential_attempt('login', session.get('username'))
+        if throttle_error:
+            if request.is_json:
+                return jsonify({'status': 'error', 'message': throttle_error}), 429
+            flash(throttle_error, 'danger')
+            return redirect(url_for('index'))
+
         if session.get('auth_system') == 'rbac' and session.get('user_id'):
             conn = get_connection()
             try:
                 user = conn.execute('SELECT password_hash FROM users WHERE id = ?', (session['user_id'],)).fetchone()
                 if not user or not verify_password(current_password, user['password_hash']):
+                    credential_rate_limiter.record_failure(account_key)
                     raise ValueError('Incorrect current password.')
                 if new_password != confirm_password:
                     raise ValueError('New passwords do not match.')
@@ -1023,7 +1088,8 @@ def change_password():
             finally:
                 conn.close()
 
-            if not teacher or not check_password_hash(teacher['password_hash'], current_password):
+            if not teacher or not verify_password(current_password, teacher['password_hash']):
+                credential_rate_limiter.record_failure(account_key)
                 if request.is_json:
                     return jsonify({'status': 'error', 'message': 'Incorrect current password'}), 400
                 flash('Incorrect current password.', 'danger')
@@ -1041,7 +1107,7 @@ def change_password():
 
             conn = get_connection()
             conn.execute('UPDATE teachers SET password_hash = ?, updated_at = ? WHERE id = ?',
-                         (generate_password_hash(new_password), datetime.now().isoformat(), teacher_id))
+                         (hash_password(new_password), datetime.now().isoformat(), teacher_id))
             conn.commit()
             conn.close()
 
@@ -1100,7 +1166,7 @@ def reset_password():
             flash('User not found.', 'danger')
             return redirect(url_for('index'))
 
-        new_password_hash = generate_password_hash(new_password)
+        new_password_hash = hash_password(new_password)
         conn.execute('UPDATE teachers SET password_hash = ?, updated_at = ? WHERE username = ?',
                      (new_password_hash, datetime.now().isoformat(), username))
         conn.commit()
@@ -1239,7 +1305,7 @@ def admin_create_user():
 
     conn = get_connection()
     try:
-        existing = conn.execute('SELECT id FROM users WHERE LOWER(username) = LOWER(?)', (username,)).fetchone()
+        existing = conn.execute('SELECT id FROM users WHERE username = ? COLLATE NOCASE', (username,)).fetchone()
         if existing:
             return admin_error('Username already exists.', 'admin_users')
         now = datetime.utcnow().isoformat()
@@ -1283,7 +1349,7 @@ def admin_update_user(user_id):
     conn = get_connection()
     try:
         existing = conn.execute(
-            'SELECT id FROM users WHERE LOWER(username) = LOWER(?) AND id != ?',
+            'SELECT id FROM users WHERE username = ? COLLATE NOCASE AND id != ?',
             (username, user_id)
         ).fetchone()
         if existing:
@@ -1557,6 +1623,42 @@ def admin_activity_log():
     )
 
 
+@app.route('/api/admin/metrics', methods=['GET'])
+@login_required
+@admin_required
+def api_admin_metrics():
+    """Per-endpoint latency percentiles, SQL statement counts and response sizes."""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({'status': 'error', 'message': 'Metrics collection is disabled.'}), 404
+    snapshot = metrics.registry.snapshot(sort_by=request.args.get('sort', 'p95'))
+    return jsonify({'status': 'success', 'data': snapshot})
+
+
+@app.route('/api/admin/metrics/reset', methods=['POST'])
+@login_required
+@admin_required
+def api_reset_admin_metrics():
+    """Clear the collected request metrics."""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({'status': 'error', 'message': 'Metrics collection is disabled.'}), 404
+    metrics.registry.reset()
+    return jsonify({'status': 'success', 'message': 'Metrics reset.'})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of the request metrics."""
+    if not metrics.METRICS_ENABLED:
+        abort(404)
+    authorized = session.get('logged_in') and user_is_admin()
+    if not authorized and METRICS_SCRAPE_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        authorized = secrets.compare_digest(supplied, f'Bearer {METRICS_SCRAPE_TOKEN}')
+    if not authorized:
+        abort(403)
+    return app.response_class(metrics.registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/activity-log', methods=['GET'])
 @login_required
 @admin_required
@@ -1626,27 +1728,23 @@ def admin_teachers():
     semesters = [row['name'] for row in conn.execute('SELECT name FROM semesters').fetchall()]
     departments = [row['name'] for row in conn.execute('SELECT name FROM departments').fetchall()]
     
+    # Assignments and permissions of every teacher, one query each
+    assignments = load_assignments(conn, [teacher['id'] for teacher in teachers])
+    permissions_map = {}
+    for row in conn.execute('SELECT teacher_id, permission_name FROM teacher_permissions WHERE granted = 1'):
+        permissions_map.setdefault(row['teacher_id'], []).append(row['permission_name'])
+    
     conn.close()
     
-    # Convert teachers to dicts with permissions
     teachers_list = []
     for teacher in teachers:
         teacher_dict = dict(teacher)
-        teacher_dict['assigned_semesters'] = parse_multi_value(teacher_dict.get('assigned_semesters'))
+        teacher_dict['assigned_semesters'] = assignments[teacher['id']]['semesters']
         teacher_dict['assigned_semesters_str'] = join_display(teacher_dict['assigned_semesters'])
-        technology_list = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+        technology_list = assignments[teacher['id']]['technologies']
         teacher_dict['technology_assignments'] = technology_list
         teacher_dict['technology'] = join_display(technology_list)
-        
-        # Get permissions for this teacher
-        conn = get_connection()
-        permissions = conn.execute(
-            'SELECT permission_name FROM teacher_permissions WHERE teacher_id = ? AND granted = 1',
-            (teacher['id'],)
-        ).fetchall()
-        teacher_dict['permissions'] = [p['permission_name'] for p in permissions]
-        conn.close()
-        
+        teacher_dict['permissions'] = permissions_map.get(teacher['id'], [])
         teachers_list.append(teacher_dict)
     
     total_teachers = len(teachers_list)
@@ -1714,7 +1812,7 @@ def add_teacher():
                                  employees=employees,
                                  teacher=None)
 
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         assigned_semesters_json = serialize_multi_value(assigned_semesters)
         technology_assignments_json = serialize_multi_value(technology_list)
         technology_display = join_display(technology_list)
@@ -1732,12 +1830,13 @@ def add_teacher():
             cursor.execute(
                 '''INSERT INTO teachers (username, password_hash, name, role, assigned_semesters, 
                    employee_id, subject, technology, technology_assignments, status, email, phone, cnic, created_at, updated_at) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                 (username, password_hash, name, role, assigned_semesters_json, employee_id, 
                  subject, technology_display, technology_assignments_json, 'Active', email or None,
                  phone or None, cnic or None, datetime.now().isoformat(), datetime.now().isoformat())
             )
             teacher_id = cursor.lastrowid
+            set_assignments(conn, teacher_id, assigned_semesters, technology_list)
             
             # Save permissions
             for permission in permissions:
@@ -1782,6 +1881,7 @@ def edit_teacher(teacher_id):
         (teacher_id,)
     ).fetchall()
     current_permission_list = [p['permission_name'] for p in current_permissions]
+    current_semesters, current_technologies = teacher_assignments(conn, teacher_id)
     
     conn.close()
 
@@ -1790,8 +1890,8 @@ def edit_teacher(teacher_id):
         return redirect(url_for('admin_teachers'))
 
     teacher_dict = dict(teacher)
-    teacher_dict['assigned_semesters'] = parse_multi_value(teacher_dict.get('assigned_semesters'))
-    teacher_dict['technology_assignments'] = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+    teacher_dict['assigned_semesters'] = current_semesters
+    teacher_dict['technology_assignments'] = current_technologies
     teacher_dict['technology'] = join_display(teacher_dict['technology_assignments'])
     teacher_dict['permissions'] = current_permission_list
 
@@ -1843,7 +1943,7 @@ def edit_teacher(teacher_id):
                         status, email or None, phone or None, cnic or None, datetime.now().isoformat()]
 
         if password:
-            password_hash = generate_password_hash(password)
+            password_hash = hash_password(password)
             update_fields.append('password_hash = ?')
             update_params.append(password_hash)
         
@@ -1862,6 +1962,7 @@ def edit_teacher(teacher_id):
                 f"UPDATE teachers SET {', '.join(update_fields)} WHERE id = ?",
                 update_params
             )
+            set_assignments(conn, teacher_id, assigned_semesters, technology_list)
             
             # Update permissions - delete all and re-insert
             conn.execute('DELETE FROM teacher_permissions WHERE teacher_id = ?', (teacher_id,))
@@ -1898,6 +1999,7 @@ def delete_teacher(teacher_id):
         conn.execute('DELETE FROM teacher_permissions WHERE teacher_id = ?', (teacher_id,))
         # Delete activity logs
         conn.execute('DELETE FROM teacher_activity_log WHERE teacher_id = ?', (teacher_id,))
+        delete_assignments(conn, teacher_id)
         # Delete teacher
         conn.execute('DELETE FROM teachers WHERE id = ?', (teacher_id,))
         conn.commit()
@@ -1926,7 +2028,7 @@ def reset_teacher_password(teacher_id):
     conn = get_connection()
     try:
         new_password = request.form.get('new_password', 'password123')  # Default password
-        password_hash = generate_password_hash(new_password)
+        password_hash = hash_password(new_password)
         conn.execute('UPDATE teachers SET password_hash = ?, updated_at = ? WHERE id = ?', 
                     (password_hash, datetime.now().isoformat(), teacher_id))
         conn.commit()
@@ -1978,12 +2080,11 @@ def api_get_teachers():
         params = []
         
         if technology:
-            query += ' AND (IFNULL(t.technology, \'\') LIKE ? OR IFNULL(t.technology_assignments, \'\') LIKE ?)'
-            like_value = f'%{technology}%'
-            params.extend([like_value, like_value])
+            query += f" AND {covers_sql('technologies')}"
+            params.append(technology)
         if semester:
-            query += ' AND t.assigned_semesters LIKE ?'
-            params.append(f'%{semester}%')
+            query += f" AND {covers_sql('semesters')}"
+            params.append(semester)
         if department:
             query += ' AND d.name = ?'
             params.append(department)
@@ -2000,6 +2101,7 @@ def api_get_teachers():
         teachers = conn.execute(query, params).fetchall()
         
         teacher_ids = [teacher['id'] for teacher in teachers]
+        assignments = load_assignments(conn, teacher_ids)
         permissions_map = {}
         if teacher_ids:
             placeholders = ','.join(['?'] * len(teacher_ids))
@@ -2014,8 +2116,8 @@ def api_get_teachers():
         teachers_list = []
         for teacher in teachers:
             teacher_dict = dict(teacher)
-            teacher_dict['assigned_semesters'] = parse_multi_value(teacher_dict.get('assigned_semesters'))
-            technology_list = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+            teacher_dict['assigned_semesters'] = assignments[teacher['id']]['semesters']
+            technology_list = assignments[teacher['id']]['technologies']
             teacher_dict['technology_assignments'] = technology_list
             teacher_dict['technology'] = join_display(technology_list)
             teacher_dict['permissions'] = permissions_map.get(teacher_dict['id'], [])
@@ -2046,8 +2148,7 @@ def api_get_teacher(teacher_id):
             return jsonify({'status': 'error', 'message': 'Teacher not found'}), 404
         
         teacher_dict = dict(teacher)
-        teacher_dict['assigned_semesters'] = parse_multi_value(teacher_dict.get('assigned_semesters'))
-        technology_list = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
+        teacher_dict['assigned_semesters'], technology_list = teacher_assignments(conn, teacher_id)
         teacher_dict['technology_assignments'] = technology_list
         teacher_dict['technology'] = join_display(technology_list)
         
@@ -2150,13 +2251,13 @@ def api_create_teacher():
     
     conn = get_connection()
     try:
-        existing = conn.execute('SELECT id FROM teachers WHERE username = ?', (username,)).fetchone()
+        existing = conn.execute('SELECT id FROM teachers WHERE username = ? COLLATE NOCASE', (username,)).fetchone()
         if existing:
             return jsonify({'status': 'error', 'message': 'Username already exists.'}), 400
         if teacher_email_exists(conn, email):
             return jsonify({'status': 'error', 'message': 'This teacher already exists in the system.'}), 400
         
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         assigned_semesters_json = serialize_multi_value(assigned_semesters)
         technology_assignments_json = serialize_multi_value(technology_list)
         technology_display = join_display(technology_list)
@@ -2166,7 +2267,7 @@ def api_create_teacher():
         cursor.execute(
             '''INSERT INTO teachers (username, password_hash, name, role, assigned_semesters, 
                employee_id, subject, technology, technology_assignments, status, email, phone, cnic, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
             (
                 username, password_hash, name, role, assigned_semesters_json,
                 employee_id if employee_id else None, subject, technology_display,
@@ -2175,6 +2276,7 @@ def api_create_teacher():
             )
         )
         teacher_id = cursor.lastrowid
+        set_assignments(conn, teacher_id, assigned_semesters, technology_list)
         
         if valid_permissions:
             cursor.executemany(
@@ -2238,7 +2340,7 @@ def api_update_teacher(teacher_id):
     
     conn = get_connection()
     try:
-        existing = conn.execute('SELECT id FROM teachers WHERE username = ? AND id != ?', (username, teacher_id)).fetchone()
+        existing = conn.execute('SELECT id FROM teachers WHERE username = ? COLLATE NOCASE AND id != ?', (username, teacher_id)).fetchone()
         if existing:
             return jsonify({'status': 'error', 'message': 'Username already exists.'}), 400
         if teacher_email_exists(conn, email, exclude_id=teacher_id):
@@ -2261,10 +2363,11 @@ def api_update_teacher(teacher_id):
         
         if new_password:
             update_fields.insert(2, 'password_hash = ?')
-            params.insert(2, generate_password_hash(new_password))
+            params.insert(2, hash_password(new_password))
         
         params.append(teacher_id)
         conn.execute(f'UPDATE teachers SET {", ".join(update_fields)} WHERE id = ?', params)
+        set_assignments(conn, teacher_id, assigned_semesters, technology_list)
         
         conn.execute('DELETE FROM teacher_permissions WHERE teacher_id = ?', (teacher_id,))
         if valid_permissions:
@@ -2296,6 +2399,7 @@ def api_delete_teacher(teacher_id):
         
         conn.execute('DELETE FROM teacher_permissions WHERE teacher_id = ?', (teacher_id,))
         conn.execute('DELETE FROM teacher_activity_log WHERE teacher_id = ?', (teacher_id,))
+        delete_assignments(conn, teacher_id)
         conn.execute('DELETE FROM teachers WHERE id = ?', (teacher_id,))
         conn.commit()
         return jsonify({'status': 'success', 'message': 'Teacher deleted successfully'})
@@ -2341,7 +2445,7 @@ def api_reset_teacher_password(teacher_id):
     try:
         updated = conn.execute(
             'UPDATE teachers SET password_hash = ?, updated_at = ? WHERE id = ?',
-            (generate_password_hash(new_password), datetime.now().isoformat(), teacher_id)
+            (hash_password(new_password), datetime.now().isoformat(), teacher_id)
         )
         conn.commit()
         if updated.rowcount == 0:
@@ -2853,10 +2957,7 @@ def api_teacher_dashboard():
             return jsonify({'status': 'error', 'message': 'Teacher not found'}), 404
         
         teacher_dict = dict(teacher)
-        assigned_semesters = parse_multi_value(teacher_dict.get('assigned_semesters'))
-        technology_assignments = parse_multi_value(teacher_dict.get('technology_assignments') or teacher_dict.get('technology'))
-        subject = teacher_dict.get('subject', '')
-        technology = join_display(technology_assignments)
+        scope = TeacherScope(*teacher_assignments(conn, teacher_id), teacher_dict.get('subject', ''))
         
         # Get permissions
         permissions = conn.execute(
@@ -2865,126 +2966,13 @@ def api_teacher_dashboard():
         ).fetchall()
         permission_list = [p['permission_name'] for p in permissions]
         
-        # Get assigned subjects (can be multiple if teacher has multiple subjects)
-        assigned_subjects = []
-        if subject:
-            # Get students for each subject/semester combination
-            for sem in assigned_semesters:
-                student_count = conn.execute(
-                    'SELECT COUNT(*) as count FROM students WHERE status = "Active" AND semester = ? AND technology = ?',
-                    (sem, technology)
-                ).fetchone()['count']
-                assigned_subjects.append({
-                    'subject': subject,
-                    'technology': technology,
-                    'semester': sem,
-                    'student_count': student_count
-                })
-        else:
-            # If no subject assigned, show all semesters
-            for sem in assigned_semesters:
-                student_count = conn.execute(
-                    'SELECT COUNT(*) as count FROM students WHERE status = "Active" AND semester = ?',
-                    (sem,)
-                ).fetchone()['count']
-                assigned_subjects.append({
-                    'subject': 'All Subjects',
-                    'technology': technology or 'All',
-                    'semester': sem,
-                    'student_count': student_count
-                })
-        
-        # Get total students for this teacher
-        student_query = 'SELECT COUNT(*) as count FROM students WHERE status = "Active"'
-        student_params = []
-        if assigned_semesters:
-            semester_placeholders = ','.join(['?'] * len(assigned_semesters))
-            student_query += f' AND semester IN ({semester_placeholders})'
-            student_params.extend(assigned_semesters)
-        if technology:
-            student_query += ' AND technology = ?'
-            student_params.append(technology)
-        
-        total_students = conn.execute(student_query, student_params).fetchone()['count']
-        
-        # Get upcoming exams
-        exam_query = '''
-            SELECT exam_id, title, subject, exam_date, start_time, status
-            FROM midterm_exams
-            WHERE status IN ('Scheduled', 'Active')
-        '''
-        exam_params = []
-        if subject:
-            exam_query += ' AND subject = ?'
-            exam_params.append(subject)
-        if technology:
-            exam_query += ' AND technology = ?'
-            exam_params.append(technology)
-        if assigned_semesters:
-            semester_placeholders = ','.join(['?'] * len(assigned_semesters))
-            exam_query += f' AND semester IN ({semester_placeholders})'
-            exam_params.extend(assigned_semesters)
-        
-        exam_query += ' ORDER BY exam_date ASC LIMIT 5'
-        upcoming_exams = conn.execute(exam_query, exam_params).fetchall()
-        
-        # Get attendance summary by subject
-        current_month = datetime.now().strftime('%Y-%m')
-        attendance_summary = {}
-        
-        if assigned_semesters:
-            # Get student IDs for assigned semesters
-            student_ids_query = 'SELECT id FROM students WHERE status = "Active"'
-            student_ids_params = []
-            if assigned_semesters:
-                semester_placeholders = ','.join(['?'] * len(assigned_semesters))
-                student_ids_query += f' AND semester IN ({semester_placeholders})'
-                student_ids_params.extend(assigned_semesters)
-            if technology:
-                student_ids_query += ' AND technology = ?'
-                student_ids_params.append(technology)
-            
-            student_ids = [row['id'] for row in conn.execute(student_ids_query, student_ids_params).fetchall()]
-            if student_ids:
-                student_id_placeholders = ','.join(['?'] * len(student_ids))
-                attendance_query = f'''
-                    SELECT COUNT(DISTINCT student_id) as total,
-                           SUM(CASE WHEN status = 'Present' THEN 1 ELSE 0 END) as present,
-                           SUM(CASE WHEN status = 'Absent' THEN 1 ELSE 0 END) as absent
-                    FROM attendance
-                    WHERE strftime('%Y-%m', attendance_date) = ?
-                    AND student_id IN ({student_id_placeholders})
-                '''
-                attendance_params = [current_month] + student_ids
-                summary = conn.execute(attendance_query, attendance_params).fetchone()
-                if summary:
-                    attendance_summary[subject or 'All Subjects'] = {
-                        'total': summary['total'] or 0,
-                        'present': summary['present'] or 0,
-                        'absent': summary['absent'] or 0
-                    }
-        
-        # Calculate average attendance percentage
-        attendance_percentage = 0
-        if attendance_summary:
-            total_present = sum(s['present'] for s in attendance_summary.values())
-            total_records = sum(s['total'] for s in attendance_summary.values())
-            if total_records > 0:
-                attendance_percentage = round((total_present / total_records) * 100, 1)
-        
+        # Counts, exams and the month's attendance, cached per teacher
+        stats = teacher_dashboards.get(conn, teacher_id, scope)
         conn.close()
         
         return jsonify({
             'teacher_name': teacher_dict['name'],
-            'assigned_subjects': assigned_subjects,
-            'total_students': total_students,
-            'upcoming_exams': [{
-                'name': e.get('title', 'N/A'),
-                'subject': e.get('subject', 'N/A'),
-                'date': e.get('exam_date', '')
-            } for e in upcoming_exams],
-            'attendance_summary': attendance_summary,
-            'attendance_percentage': attendance_percentage,
+            **stats,
             'permissions': permission_list
         })
     except Exception as e:
@@ -3511,7 +3499,7 @@ def add_student():
             
             # Generate username (admission number) and password (technology name)
             username = admission_no
-            password_hash = generate_password_hash(technology)
+            password_hash = hash_password(technology)
             
             try:
                 conn.execute('''
@@ -3655,963 +3643,192 @@ def delete_student(student_id):
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route("/api/report1")
+@versioned('students')
 def report1():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    semester = request.args.get('semester')
-    technology = request.args.get('technology')
-    gender = request.args.get('gender')
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    # Include 'technology' and 'admission_no' in the SELECT statement
-    query = "SELECT admission_no, name, father_name, phone, technology, gender, student_type, status FROM students"
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if semester and semester != 'All':
-        conditions.append("semester = ?")
-        params.append(semester)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-    if gender:
-        conditions.append("gender = ?")
-        params.append(gender)
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-        
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in students])
+    return render_report(REPORT1)
 
 @app.route("/api/report1/export_excel", methods=['GET'])
 def export_report1_excel():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    semester = request.args.get('semester')
-    technology = request.args.get('technology')
-    gender = request.args.get('gender')
-    status = request.args.get('status')
+    return render_report(REPORT1, 'xlsx')
 
-    conn = db.get_connection()
-    # Include 'admission_no' and 'technology' in the SELECT statement for Excel export
-    query = "SELECT admission_no, name, father_name, phone, technology, gender, student_type, status FROM students"
-    params = []
-    conditions = []
+@app.route("/api/report1/export_pdf", methods=['GET'])
+def export_report1_pdf():
+    return render_report(REPORT1, 'pdf')
 
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
+@app.route("/api/report2")
+@versioned('students')
+def report2():
+    return render_report(REPORT2)
 
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if semester and semester != 'All':
-        conditions.append("semester = ?")
-        params.append(semester)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-    if gender:
-        conditions.append("gender = ?")
-        params.append(gender)
+@app.route("/api/report2/export_excel", methods=['GET'])
+def export_report2_excel():
+    return render_report(REPORT2, 'xlsx')
 
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-        
-    students = conn.execute(query, params).fetchall()
-    conn.close()
+@app.route("/api/report2/export_pdf", methods=['GET'])
+def export_report2_pdf():
+    return render_report(REPORT2, 'pdf')
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Report 1 Students"
-    # Add "Technology" and "Admission No" to Excel headers
-    ws.append(["S.NO", "Admission No", "Name", "Father Name", "Phone #", "Technology", "Gender", "Student Type", "Status"])
-    for index, student in enumerate(students):
-        # Add student['technology'] and student['admission_no'] to the row data
-        ws.append([index + 1, student['admission_no'], student['name'], student['father_name'], student['phone'], student['technology'], student['gender'], student['student_type'], student['status']])
+@app.route("/api/report3")
+@versioned('students')
+def report3():
+    return render_report(REPORT3)
 
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
+@app.route("/api/report3/export_excel", methods=['GET'])
+def export_report3_excel():
+    return render_report(REPORT3, 'xlsx')
 
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='report1_students.xlsx'
-    )
+@app.route("/api/report3/export_pdf", methods=['GET'])
+def export_report3_pdf():
+    return render_report(REPORT3, 'pdf')
 
-@app.route("/api/report1/export_pdf", methods=['GET'])
-def export_report1_pdf():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    semester = request.args.get('semester')
-    technology = request.args.get('technology')
-    gender = request.args.get('gender')
-    status = request.args.get('status')
+@app.route("/api/promote", methods=['POST'])
+def promote_students():
+    data = request.get_json()
+    campus = data['campus']
+    board = data['board']
+    semester = data['semester']
+    next_semester = data['next_semester']
 
+    actor_id, actor_realm = current_actor()
     conn = db.get_connection()
-    # Include 'admission_no' and 'technology' in the SELECT statement for PDF export
-    query = "SELECT admission_no, name, father_name, phone, technology, gender, student_type, status FROM students"
-    params = []
-    conditions = []
+    try:
+        with conn:
+            promotions.apply_move(
+                conn, promotions.section_selection(campus, board, semester),
+                promotions.Move(promotions.PROMOTE, semester=next_semester),
+                changed_by=actor_id, changed_by_realm=actor_realm
+            )
+    finally:
+        conn.close()
+    return jsonify({'status': 'success'})
 
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
+@app.route("/api/send_sms", methods=['POST'])
+def send_sms():
+    data = request.get_json()
+    numbers = data.get('numbers')  # Phone numbers from frontend
+    student_ids = data.get('student_ids')  # Student IDs (alternative)
+    message = data.get('message')
 
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if semester and semester != 'All':
-        conditions.append("semester = ?")
-        params.append(semester)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-    if gender:
-        conditions.append("gender = ?")
-        params.append(gender)
+    if not message:
+        return jsonify({'status': 'error', 'message': 'Message is required.'}), 400
 
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-        
-    students = conn.execute(query, params).fetchall()
-    conn.close()
+    if not numbers and not student_ids:
+        return jsonify({'status': 'error', 'message': 'No phone numbers or student IDs provided.'}), 400
 
-    buffer = io.BytesIO()
-    # Use landscape orientation for better table layout
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-
-    # Create custom styles matching on-screen design
-    institute_title_style = ParagraphStyle(
-        'InstituteTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#00721c'),  # Green color matching on-screen
-        spaceAfter=10,
-        alignment=1,  # Center alignment
-        fontName='Helvetica-Bold',
-        leading=24
-    )
+    # Queue only; the background dispatcher sends in batches
+    conn = db.get_connection()
+    try:
+        missing = []
+        if numbers:
+            outgoing = [(str(phone).strip(), message, None, None) for phone in numbers if phone and str(phone).strip()]
+        else:
+            # One query for every student's number instead of a SELECT per id
+            recipients = sms.student_recipients(conn, student_ids)
+            found = {row['id'] for row in recipients}
+            missing = [row['id'] for row in recipients if not row['recipient']]
+            missing += [student_id for student_id in map(int, student_ids) if student_id not in found]
+            outgoing = [(row['recipient'], message, row['id'], None) for row in recipients if row['recipient']]
+        with conn:
+            sent_count = sms.enqueue_messages(conn, outgoing, 'send_sms')
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'Invalid student IDs provided.'}), 400
+    finally:
+        conn.close()
+    sms_dispatcher.wake()
 
-    report_title_style = ParagraphStyle(
-        'ReportTitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=15,
-        alignment=1,  # Center alignment
-        fontName='Helvetica',
-        leading=18
-    )
+    return jsonify({
+        'status': 'success',
+        'message': f'{sent_count} SMS messages queued for sending.',
+        'queued': sent_count,
+        'missing_phone': missing
+    })
 
-    elements = []
+@app.route("/api/sms/outbox", methods=['GET'])
+@admin_required
+def sms_outbox():
+    """Queued/sent/failed message counts and recent messages, optionally of one status"""
+    conn = db.get_connection()
+    try:
+        return jsonify({'status': 'success', **sms.outbox_summary(conn, request.args.get('status'))})
+    finally:
+        conn.close()
 
-    # Add institute title - matching on-screen design
-    semester_text = semester if semester and semester != 'All' else 'All'
-    technology_text = technology if technology and technology != 'All' else 'All'
-    report_title_text = f"{semester_text} {technology_text} Students List"
-    if status:
-        report_title_text += f" ({status})"
-    
-    elements.append(Paragraph("GHAZALI INSTITUTE OF MEDICAL SCIENCES", institute_title_style))
-    elements.append(Paragraph(report_title_text, report_title_style))
-    elements.append(Spacer(1, 0.15*inch))
+@app.route("/api/dashboard/summary", methods=['GET'])
+@versioned('students')
+def get_dashboard_summary():
+    """All admin dashboard counts, sliced from one cached GROUP BY over students."""
+    try:
+        return jsonify({'status': 'success', 'data': dashboard_counts.summary(dashboard_counts.student_cube.get())})
+    except Exception as e:
+        print(f"Error building dashboard summary: {e}")
+        return jsonify({'status': 'error', 'message': str(e), 'data': {}}), 500
 
-    # Add table data - headers in uppercase to match on-screen
-    data = [["S.NO", "ADMISSION NO", "NAME", "FATHER NAME", "PHONE #", "GENDER", "TECHNOLOGY", "STUDENT TYPE", "STATUS"]]
-    for index, student in enumerate(students):
-        data.append([
-            str(index + 1),
-            student['admission_no'] or '',
-            student['name'] or '',
-            student['father_name'] or '',
-            student['phone'] or '',
-            student['gender'] or '',
-            student['technology'] or '',
-            student['student_type'] or '',
-            student['status'] or ''
-        ])
+@app.route("/api/student_count")
+@versioned('students')
+def get_student_count():
+    return jsonify({'count': dashboard_counts.student_cube.get().count()})
 
-    # Calculate column widths for landscape A4 (11.69 inches width - margins = ~10.69 inches usable)
-    # Distribute columns proportionally for better spacing
-    col_widths = [
-        0.5 * inch,   # S.NO
-        0.9 * inch,   # Admission No
-        1.25 * inch,  # Name
-        1.25 * inch,  # Father Name
-        1.3 * inch,   # Phone #
-        0.75 * inch,  # Gender
-        1.2 * inch,   # Technology
-        1.1 * inch,   # Student Type
-        1.15 * inch   # Status
-    ]
-    
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        # Header row - green gradient background matching on-screen
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00721c')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),  # Left align for better readability
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('LEFTPADDING', (0, 0), (-1, 0), 8),
-        ('RIGHTPADDING', (0, 0), (-1, 0), 8),
-        # Data rows - alternate row shading
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('LEFTPADDING', (0, 1), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 1), (-1, -1), 8),
-        # Borders - soft borders matching on-screen
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#005a15')),  # Darker green border below header
-    ]))
-    elements.append(table)
-
-    # Add footer with record count
-    elements.append(Spacer(1, 0.2*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#999999'),
-        alignment=2  # Right alignment
-    )
-    elements.append(Paragraph(f"Total Records: {len(students)}", footer_style))
+@app.route("/api/active_student_count")
+@versioned('students')
+def get_active_student_count():
+    """Get count of active students"""
+    try:
+        return jsonify({'count': dashboard_counts.student_cube.get().count(status='Active')})
+    except Exception as e:
+        return jsonify({'count': 0, 'error': str(e)}), 500
 
-    doc.build(elements)
-    buffer.seek(0)
+@app.route("/api/students_by_board")
+@versioned('students')
+def get_students_by_board():
+    """Get active student counts grouped by board ('PNC Board' is shown as 'PNC')"""
+    try:
+        return jsonify({'status': 'success', 'data': dashboard_counts.active_by_board(dashboard_counts.student_cube.get())})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e), 'data': {}}), 500
 
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        download_name='report1_students.pdf',
-        as_attachment=False
-    )
+# New API endpoint for semester-wise student counts
+@app.route("/api/students_by_semester", methods=['GET'])
+@versioned('students')
+def get_students_by_semester():
+    try:
+        return jsonify(dashboard_counts.student_cube.get().group('semester'))
+    except Exception as e:
+        print(f"Error fetching students by semester: {e}")
+        return jsonify({"error": "Could not retrieve semester counts"}), 500
 
-@app.route("/api/report2")
-def report2():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    technology = request.args.get('technology')
-    status = request.args.get('status')
+# New API endpoint for organization (board) and semester-wise student counts for dashboard cards
+@app.route("/api/students_by_organization_semester", methods=['GET'])
+@versioned('students')
+def get_students_by_organization_semester():
+    try:
+        # 'latest_semester' is the lexicographic maximum, as MAX(semester) was
+        return jsonify(dashboard_counts.by_organization_semester(dashboard_counts.student_cube.get()))
+    except Exception as e:
+        print(f"Error fetching students by organization and semester: {e}")
+        return jsonify({"error": "Could not retrieve organization and semester counts"}), 500
 
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in students])
-
-@app.route("/api/report2/export_excel", methods=['GET'])
-def export_report2_excel():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    technology = request.args.get('technology')
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Report 2 Students"
-    ws.append(["S.NO", "Admission No", "Name", "Father Name", "Phone #", "Technology", "Status"])
-    for index, student in enumerate(students):
-        ws.append([index + 1, student['admission_no'], student['name'], student['father_name'], student['phone'], student['technology'], student['status']])
-
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
-
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='report2_students.xlsx'
-    )
-
-@app.route("/api/report2/export_pdf", methods=['GET'])
-def export_report2_pdf():
-    campus = request.args.get('campus')
-    board = request.args.get('board')
-    technology = request.args.get('technology')
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-
-    if campus and campus != 'All':
-        conditions.append("campus = ?")
-        params.append(campus)
-    if board and board != 'All':
-        conditions.append("board = ?")
-        params.append(board)
-    if technology and technology != 'All':
-        conditions.append("technology = ?")
-        params.append(technology)
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-
-    buffer = io.BytesIO()
-    # Use landscape orientation for better table layout
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-
-    # Create custom styles matching on-screen design
-    institute_title_style = ParagraphStyle(
-        'InstituteTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#00721c'),  # Green color matching on-screen
-        spaceAfter=10,
-        alignment=1,  # Center alignment
-        fontName='Helvetica-Bold',
-        leading=24
-    )
-
-    report_title_style = ParagraphStyle(
-        'ReportTitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=15,
-        alignment=1,  # Center alignment
-        fontName='Helvetica',
-        leading=18
-    )
-
-    elements = []
-
-    # Add institute title - matching on-screen design
-    campus_text = campus if campus and campus != 'All' else 'All'
-    board_text = board if board and board != 'All' else 'All'
-    technology_text = technology if technology and technology != 'All' else 'All'
-    report_title_text = f"{campus_text} - {board_text} - {technology_text} Students List"
-    if status:
-        report_title_text += f" ({status})"
-    
-    elements.append(Paragraph("GHAZALI INSTITUTE OF MEDICAL SCIENCES", institute_title_style))
-    elements.append(Paragraph(report_title_text, report_title_style))
-    elements.append(Spacer(1, 0.15*inch))
-
-    # Add table data - headers in uppercase
-    data = [["S.NO", "ADMISSION NO", "NAME", "FATHER NAME", "PHONE #", "TECHNOLOGY", "STATUS"]]
-    for index, student in enumerate(students):
-        data.append([
-            str(index + 1),
-            student['admission_no'] or '',
-            student['name'] or '',
-            student['father_name'] or '',
-            student['phone'] or '',
-            student['technology'] or '',
-            student['status'] or ''
-        ])
-
-    # Calculate column widths for landscape A4 (more horizontal space)
-    col_widths = [
-        0.5 * inch,   # S.NO
-        1.0 * inch,   # Admission No
-        1.45 * inch,  # Name
-        1.45 * inch,  # Father Name
-        1.5 * inch,   # Phone #
-        1.5 * inch,   # Technology
-        1.39 * inch   # Status
-    ]
-    
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        # Header row - green background matching on-screen
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00721c')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('LEFTPADDING', (0, 0), (-1, 0), 8),
-        ('RIGHTPADDING', (0, 0), (-1, 0), 8),
-        # Data rows - alternate row shading
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('LEFTPADDING', (0, 1), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 1), (-1, -1), 8),
-        # Borders - soft borders matching on-screen
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#005a15')),
-    ]))
-    elements.append(table)
-
-    # Add footer with record count
-    elements.append(Spacer(1, 0.2*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#999999'),
-        alignment=2  # Right alignment
-    )
-    elements.append(Paragraph(f"Total Records: {len(students)}", footer_style))
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        download_name='report2_students.pdf',
-        as_attachment=False
-    )
-
-@app.route("/api/report3")
-def report3():
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, campus, board, semester, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-    else: # Default for 'All Students' report: exclude 'Left' and include 'Active'
-        conditions.append("status = 'Active'")
-        conditions.append("status != 'Left'")
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in students])
-
-@app.route("/api/report3/export_excel", methods=['GET'])
-def export_report3_excel():
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, campus, board, semester, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-    else: # Default for 'All Students' report: exclude 'Left' and include 'Active'
-        conditions.append("status = 'Active'")
-        conditions.append("status != 'Left'")
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "All Students"
-    ws.append(["S.NO", "Admission No", "Name", "Father Name", "Phone #", "Campus", "Board", "Semester", "Technology", "Status"])
-    for index, student in enumerate(students):
-        ws.append([
-            index + 1,
-            student['admission_no'],
-            student['name'],
-            student['father_name'],
-            student['phone'],
-            student['campus'],
-            student['board'],
-            student['semester'],
-            student['technology'],
-            student['status']
-        ])
-
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
-
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='all_students.xlsx'
-    )
-
-@app.route("/api/report3/export_pdf", methods=['GET'])
-def export_report3_pdf():
-    status = request.args.get('status')
-
-    conn = db.get_connection()
-    query = 'SELECT admission_no, name, father_name, phone, campus, board, semester, technology, status FROM students'
-    params = []
-    conditions = []
-
-    if status == 'Free':
-        conditions.append("student_type = 'Free'")
-    elif status in ['Left', 'Course Completed', 'Active', 'Demoted']:
-        conditions.append("status = ?")
-        params.append(status)
-    else: # Default for 'All Students' report: exclude 'Left' and include 'Active'
-        conditions.append("status = 'Active'")
-        conditions.append("status != 'Left'")
-
-    if conditions:
-        query += " WHERE " + " AND ".join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-    conn.close()
-
-    buffer = io.BytesIO()
-    # Use landscape orientation for better table layout
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-
-    # Create custom styles matching on-screen design
-    institute_title_style = ParagraphStyle(
-        'InstituteTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        textColor=colors.HexColor('#00721c'),  # Green color matching on-screen
-        spaceAfter=10,
-        alignment=1,  # Center alignment
-        fontName='Helvetica-Bold',
-        leading=24
-    )
-
-    report_title_style = ParagraphStyle(
-        'ReportTitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=15,
-        alignment=1,  # Center alignment
-        fontName='Helvetica',
-        leading=18
-    )
-
-    elements = []
-
-    # Add institute title - matching on-screen design
-    report_title_text = "All Students List"
-    if status:
-        report_title_text += f" ({status})"
-    
-    elements.append(Paragraph("GHAZALI INSTITUTE OF MEDICAL SCIENCES", institute_title_style))
-    elements.append(Paragraph(report_title_text, report_title_style))
-    elements.append(Spacer(1, 0.15*inch))
-
-    # Add table data - headers in uppercase
-    data = [["S.NO", "ADMISSION NO", "NAME", "FATHER NAME", "PHONE #", "CAMPUS", "BOARD", "SEMESTER", "TECHNOLOGY", "STATUS"]]
-    for index, student in enumerate(students):
-        data.append([
-            str(index + 1),
-            student['admission_no'] or '',
-            student['name'] or '',
-            student['father_name'] or '',
-            student['phone'] or '',
-            student['campus'] or '',
-            student['board'] or '',
-            student['semester'] or '',
-            student['technology'] or '',
-            student['status'] or ''
-        ])
-
-    # Calculate column widths for landscape A4 - adjust for 10 columns (more horizontal space)
-    col_widths = [
-        0.5 * inch,   # S.NO
-        0.9 * inch,   # Admission No
-        1.2 * inch,   # Name
-        1.2 * inch,   # Father Name
-        1.3 * inch,   # Phone #
-        0.85 * inch,  # Campus
-        0.85 * inch,  # Board
-        0.9 * inch,   # Semester
-        1.05 * inch,  # Technology
-        0.95 * inch   # Status
-    ]
-    
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        # Header row - green background matching on-screen
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00721c')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('LEFTPADDING', (0, 0), (-1, 0), 6),
-        ('RIGHTPADDING', (0, 0), (-1, 0), 6),
-        # Data rows - alternate row shading
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ('LEFTPADDING', (0, 1), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 1), (-1, -1), 6),
-        # Borders - soft borders matching on-screen
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#005a15')),
-    ]))
-    elements.append(table)
-
-    # Add footer with record count
-    elements.append(Spacer(1, 0.2*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#999999'),
-        alignment=2  # Right alignment
-    )
-    elements.append(Paragraph(f"Total Records: {len(students)}", footer_style))
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        download_name='all_students.pdf',
-        as_attachment=False
-    )
-
-@app.route("/api/promote", methods=['POST'])
-def promote_students():
-    data = request.get_json()
-    campus = data['campus']
-    board = data['board']
-    semester = data['semester']
-    next_semester = data['next_semester']
-
-    conn = db.get_connection()
-    query = 'UPDATE students SET semester = ? WHERE campus = ? AND board = ? AND semester = ?'
-    conn.execute(query, (next_semester, campus, board, semester))
-    conn.commit()
-    conn.close()
-    return jsonify({'status': 'success'})
-
-@app.route("/api/send_sms", methods=['POST'])
-def send_sms():
-    data = request.get_json()
-    numbers = data.get('numbers')  # Phone numbers from frontend
-    student_ids = data.get('student_ids')  # Student IDs (alternative)
-    message = data.get('message')
-
-    if not message:
-        return jsonify({'status': 'error', 'message': 'Message is required.'}), 400
-
-    if not numbers and not student_ids:
-        return jsonify({'status': 'error', 'message': 'No phone numbers or student IDs provided.'}), 400
-
-    sent_count = 0
-    
-    # If phone numbers are directly provided (from SMS tab)
-    if numbers:
-        for phone in numbers:
-            if phone:
-                print(f"Sending SMS to {phone}: {message}")
-                # In a real application, you would integrate with an SMS API here
-                sent_count += 1
-    # If student IDs are provided (fetch phone numbers from database)
-    elif student_ids:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        for student_id in student_ids:
-            # Fetch the student's phone or sms_phone
-            student = cursor.execute('SELECT phone, sms_phone FROM students WHERE id = ?', (student_id,)).fetchone()
-            if student:
-                phone_to_use = student['sms_phone'] if student['sms_phone'] else student['phone']
-                if phone_to_use:
-                    print(f"Sending SMS to {phone_to_use}: {message}")
-                    # In a real application, you would integrate with an SMS API here
-                    sent_count += 1
-                else:
-                    print(f"No phone number found for student ID {student_id}")
-            else:
-                print(f"Student with ID {student_id} not found.")
-        
-        conn.close()
-    
-    return jsonify({'status': 'success', 'message': f'{sent_count} SMS messages queued for sending.'})
-
-@app.route("/api/student_count")
-def get_student_count():
-    conn = db.get_connection()
-    count = conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
-    conn.close()
-    return jsonify({'count': count})
-
-@app.route("/api/active_student_count")
-def get_active_student_count():
-    """Get count of active students"""
-    try:
-        conn = db.get_connection()
-        count = conn.execute("SELECT COUNT(*) FROM students WHERE status = 'Active'").fetchone()[0]
-        conn.close()
-        return jsonify({'count': count})
-    except Exception as e:
-        return jsonify({'count': 0, 'error': str(e)}), 500
-
-@app.route("/api/students_by_board")
-def get_students_by_board():
-    """Get student counts grouped by board"""
-    try:
-        conn = db.get_connection()
-        cur = conn.cursor()
-        
-        # Get counts for each board
-        boards = ['KPK Medical Faculty', 'KMU', 'PNC Board', 'Pharmacy Council']
-        board_counts = {}
-        
-        for board in boards:
-            # Use 'PNC Board' in database but display as 'PNC'
-            board_name = board
-            if board == 'PNC Board':
-                query = "SELECT COUNT(*) FROM students WHERE board = 'PNC Board' AND status = 'Active'"
-            else:
-                query = f"SELECT COUNT(*) FROM students WHERE board = ? AND status = 'Active'"
-            
-            if board == 'PNC Board':
-                count = cur.execute(query).fetchone()[0]
-            else:
-                count = cur.execute(query, (board,)).fetchone()[0]
-            
-            # Map board name for display
-            display_name = 'PNC' if board == 'PNC Board' else board
-            board_counts[display_name] = count
-        
-        conn.close()
-        return jsonify({'status': 'success', 'data': board_counts})
-    except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e), 'data': {}}), 500
-
-# New API endpoint for semester-wise student counts
-@app.route("/api/students_by_semester", methods=['GET'])
-def get_students_by_semester():
-    conn = None
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        # Adjust table and column names based on actual schema
-        # Assuming 'semester' column stores semester names like '1st', '2nd', etc.
-        cursor.execute("SELECT semester, COUNT(*) FROM students GROUP BY semester ORDER BY semester;")
-        results = cursor.fetchall()
-        
-        semester_counts = {}
-        for row in results:
-            semester_name = row[0]
-            count = row[1]
-            semester_counts[semester_name] = count
-        
-        return jsonify(semester_counts)
-    except Exception as e:
-        print(f"Error fetching students by semester: {e}")
-        return jsonify({"error": "Could not retrieve semester counts"}), 500
-    finally:
-        if conn:
-            conn.close()
-
-# New API endpoint for program-wise student counts
-# New API endpoint for organization (board) and semester-wise student counts for dashboard cards
-@app.route("/api/students_by_organization_semester", methods=['GET'])
-def get_students_by_organization_semester():
-    conn = None
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Fetch total students per board and their latest semester
-        # This query gets the total count for each board and the max semester (assuming '1st Semester', '2nd Semester' etc. can be ordered lexicographically for 'latest')
-        # For a more robust "latest semester" if semesters are not strictly lexicographical, a custom sorting logic might be needed.
-        cursor.execute("""
-            SELECT board, COUNT(*) as total_students, MAX(semester) as latest_semester
-            FROM students
-            WHERE board IN ('KPK Medical Faculty', 'PNC Board', 'KMU', 'Pharmacy Council')
-            GROUP BY board
-            ORDER BY board;
-        """)
-        results = cursor.fetchall()
-        
-        org_semester_data = {}
-        for row in results:
-            board_name = row['board']
-            org_semester_data[board_name] = {
-                'total_students': row['total_students'],
-                'latest_semester': row['latest_semester']
-            }
-        
-        return jsonify(org_semester_data)
-    except Exception as e:
-        print(f"Error fetching students by organization and semester: {e}")
-        return jsonify({"error": "Could not retrieve organization and semester counts"}), 500
-    finally:
-        if conn:
-            conn.close()
-
-# New API endpoint to get detailed student counts by semester for a specific board
-@app.route("/api/students_by_board_semester_detail/<board_name>", methods=['GET'])
-def get_students_by_board_semester_detail(board_name):
-    conn = None
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Fetch semester-wise counts for the given board
-        cursor.execute("""
-            SELECT semester, COUNT(*) as student_count
-            FROM students
-            WHERE board = ?
-            GROUP BY semester
-            ORDER BY semester;
-        """, (board_name,))
-        results = cursor.fetchall()
-        
-        semester_details = []
-        for row in results:
-            semester_details.append({
-                'semester': row['semester'],
-                'count': row['student_count']
-            })
-        
-        return jsonify(semester_details)
-    except Exception as e:
-        print(f"Error fetching semester details for board {board_name}: {e}")
-        return jsonify({"error": f"Could not retrieve semester details for {board_name}"}), 500
-    finally:
-        if conn:
-            conn.close()
+# New API endpoint to get detailed student counts by semester for a specific board
+@app.route("/api/students_by_board_semester_detail/<board_name>", methods=['GET'])
+@versioned('students')
+def get_students_by_board_semester_detail(board_name):
+    try:
+        return jsonify(dashboard_counts.board_semester_detail(dashboard_counts.student_cube.get(), board_name))
+    except Exception as e:
+        print(f"Error fetching semester details for board {board_name}: {e}")
+        return jsonify({"error": f"Could not retrieve semester details for {board_name}"}), 500
 
 # Existing API endpoint for program-wise student counts (renamed to avoid confusion with board)
 @app.route("/api/students_by_technology_semester", methods=['GET'])
+@versioned('students')
 def get_students_by_technology_semester():
-    conn = None
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        # Fetch counts grouped by technology and semester
-        cursor.execute("SELECT technology, semester, COUNT(*) FROM students GROUP BY technology, semester ORDER BY technology, semester;")
-        results = cursor.fetchall()
-        
-        program_semester_counts = {}
-        for row in results:
-            technology = row[0]
-            semester = row[1]
-            count = row[2]
-            
-            if technology not in program_semester_counts:
-                program_semester_counts[technology] = {'total': 0, 'semesters': {}}
-            
-            program_semester_counts[technology]['total'] += count
-            program_semester_counts[technology]['semesters'][semester] = count
-        
-        return jsonify(program_semester_counts)
+        return jsonify(dashboard_counts.by_technology_semester(dashboard_counts.student_cube.get()))
     except Exception as e:
         print(f"Error fetching students by technology and semester: {e}")
         return jsonify({"error": "Could not retrieve technology and semester counts"}), 500
-    finally:
-        if conn:
-            conn.close()
 
 @app.route("/api/students_by_technology_semester_detail", methods=['GET'])
+@versioned('students')
 def get_students_by_technology_semester_detail():
     technology = request.args.get('technology')
     semester = request.args.get('semester')
@@ -4703,12 +3920,15 @@ def promote_selected_students():
     if not student_ids or not next_semester:
         return jsonify({'status': 'error', 'message': 'Missing student IDs or next semester.'}), 400
 
+    actor_id, actor_realm = current_actor()
     conn = db.get_connection()
-    cursor = conn.cursor()
     try:
-        for student_id in student_ids:
-            cursor.execute('UPDATE students SET semester = ? WHERE id = ?', (next_semester, student_id))
-        conn.commit()
+        with conn:
+            promotions.apply_move(
+                conn, promotions.ids_selection(student_ids),
+                promotions.Move(promotions.PROMOTE, semester=next_semester),
+                changed_by=actor_id, changed_by_realm=actor_realm
+            )
         return jsonify({'status': 'success', 'message': f'{len(student_ids)} students promoted successfully.'})
     except Exception as e:
         conn.rollback()
@@ -4752,12 +3972,15 @@ def demote_selected_students():
     if not student_ids or not previous_semester:
         return jsonify({'status': 'error', 'message': 'Missing student IDs or previous semester.'}), 400
 
+    actor_id, actor_realm = current_actor()
     conn = db.get_connection()
-    cursor = conn.cursor()
     try:
-        for student_id in student_ids:
-            cursor.execute('UPDATE students SET semester = ?, status = ? WHERE id = ?', (previous_semester, 'Demoted', student_id))
-        conn.commit()
+        with conn:
+            promotions.apply_move(
+                conn, promotions.ids_selection(student_ids),
+                promotions.Move(promotions.DEMOTE, semester=previous_semester, status=promotions.DEMOTED_STATUS),
+                changed_by=actor_id, changed_by_realm=actor_realm
+            )
         return jsonify({'status': 'success', 'message': f'{len(student_ids)} students demoted successfully and marked as Demoted.'})
     except Exception as e:
         conn.rollback()
@@ -4786,22 +4009,22 @@ def promote_students_api():
     except (TypeError, ValueError):
         return jsonify({'status': 'error', 'message': 'Invalid student IDs provided.'}), 400
 
+    if status_only:
+        move = promotions.Move(promotions.STATUS_CHANGE, status=student_status)
+    else:
+        move = promotions.Move(promotions.PROMOTE, semester=new_semester, status=student_status)
+
+    actor_id, actor_realm = current_actor()
     conn = db.get_connection()
-    cursor = conn.cursor()
     try:
+        with conn:
+            promotions.apply_move(
+                conn, promotions.ids_selection(student_ids), move,
+                changed_by=actor_id, changed_by_realm=actor_realm
+            )
         if status_only:
-            for student_id in student_ids:
-                cursor.execute('UPDATE students SET status = ? WHERE id = ?', (student_status, student_id))
-            conn.commit()
             return jsonify({'status': 'success', 'message': f'{len(student_ids)} student(s) marked as {student_status}.'})
-        else:
-            for student_id in student_ids:
-                if student_status:
-                    cursor.execute('UPDATE students SET semester = ?, status = ? WHERE id = ?', (new_semester, student_status, student_id))
-                else:
-                    cursor.execute('UPDATE students SET semester = ? WHERE id = ?', (new_semester, student_id))
-            conn.commit()
-            return jsonify({'status': 'success', 'message': f'{len(student_ids)} student(s) promoted successfully.'})
+        return jsonify({'status': 'success', 'message': f'{len(student_ids)} student(s) promoted successfully.'})
     except Exception as e:
         conn.rollback()
         print(f"Error promoting students: {e}")
@@ -4819,12 +4042,15 @@ def demote_students_api():
     if not student_ids or not new_semester:
         return jsonify({'status': 'error', 'message': 'Missing student IDs or new semester.'}), 400
 
+    actor_id, actor_realm = current_actor()
     conn = db.get_connection()
-    cursor = conn.cursor()
     try:
-        for student_id in student_ids:
-            cursor.execute('UPDATE students SET semester = ?, status = ? WHERE id = ?', (new_semester, 'Demoted', student_id))
-        conn.commit()
+        with conn:
+            promotions.apply_move(
+                conn, promotions.ids_selection(student_ids),
+                promotions.Move(promotions.DEMOTE, semester=new_semester, status=promotions.DEMOTED_STATUS),
+                changed_by=actor_id, changed_by_realm=actor_realm
+            )
         return jsonify({'status': 'success', 'message': f'{len(student_ids)} students demoted successfully and marked as Demoted.'})
     except Exception as e:
         conn.rollback()
@@ -4833,6 +4059,53 @@ def demote_students_api():
     finally:
         conn.close()
 
+@app.route("/api/promote/rollover", methods=['POST'])
+@login_required
+@admin_required
+def rollover_semesters():
+    """Move every active student (optionally one campus/board) to the next semester per SEMESTER_ROLLOVER.
+
+    ``dry_run`` returns the per-semester counts without changing anything.
+    """
+    data = request.get_json(silent=True) or {}
+    term = (data.get('term') or '').strip() or None
+    actor_id, actor_realm = current_actor()
+    conn = db.get_connection()
+    try:
+        if data.get('dry_run'):
+            preview = promotions.rollover_preview(conn, data)
+            return jsonify({'status': 'success', 'dry_run': True, 'term': term, 'moves': preview})
+        with conn:
+            # Take the write lock before counting so the reported moves are exactly the rows moved
+            conn.execute('BEGIN IMMEDIATE')
+            preview = promotions.rollover_preview(conn, data)
+            moved = promotions.apply_move(
+                conn, promotions.rollover_selection(data),
+                promotions.Move(promotions.ROLLOVER, rollover=promotions.SEMESTER_ROLLOVER),
+                term=term, changed_by=actor_id, changed_by_realm=actor_realm
+            )
+        return jsonify({
+            'status': 'success',
+            'message': f'{moved} student(s) moved to their next semester.',
+            'term': term,
+            'moves': preview
+        })
+    except Exception as e:
+        print(f"Error rolling over semesters: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        conn.close()
+
+@app.route("/api/promote/history", methods=['GET'])
+@login_required
+def promotion_history():
+    """Semester/status moves, filterable by student, from/to semester, action, term and date range"""
+    conn = db.get_connection()
+    try:
+        return jsonify(promotions.load_history(conn, request.args))
+    finally:
+        conn.close()
+
 # ==================== ATTENDANCE MODULE ====================
 
 @app.route("/attendance")
@@ -4911,6 +4184,51 @@ def get_attendance_students():
 
     return jsonify([dict(row) for row in students])
 
+def attendance_edit_error(conn, attendance_date_str, start_lock=False):
+    """Why the current user may not edit attendance for the date, or None.
+
+    Teachers cannot edit past dates, nor a day more than 30 minutes after its
+    first save_all; ``start_lock`` starts that window if it is not running yet.
+    """
+    if session.get('role') == 'admin':
+        return None
+    attendance_date = datetime.strptime(attendance_date_str, '%Y-%m-%d').date()
+    if attendance_date < datetime.now().date():
+        return 'Teachers cannot edit past attendance data.'
+    lock_window = student_attendance_locks.get(conn, attendance_date_str)
+    if lock_window is None:
+        if start_lock:
+            # This is the first save_all for this date, create a lock record
+            start_attendance_lock(conn, attendance_date_str)
+            conn.commit() # Commit the lock record immediately
+        return None
+    if lock_window.is_closed():
+        return 'Attendance is locked for changes after 30 minutes from initial save.'
+    return None
+
+
+def start_attendance_lock(conn, attendance_date_str):
+    """Start a teacher's edit window for the date unless one is running (caller commits)."""
+    if session.get('role') == 'admin':
+        return
+    if student_attendance_locks.get(conn, attendance_date_str) is None:
+        student_attendance_locks.lock(conn, attendance_date_str, session.get('teacher_id'))
+
+
+def teacher_semester_scope(filters):
+    """Semesters a teacher may see given the request ``filters``, or None when unrestricted.
+
+    A teacher asking for a semester outside their assignment gets ``[]``.
+    """
+    if session.get('role') != 'teacher' or not session.get('assigned_semesters'):
+        return None
+    semesters = session['assigned_semesters']
+    requested = filters.get('semester')
+    if requested and requested not in semesters:
+        return []
+    return semesters
+
+
 @app.route("/api/attendance/save", methods=['POST'])
 @login_required
 def save_attendance():
@@ -4922,45 +4240,17 @@ def save_attendance():
         status = data.get('status', 'Present')
         notes = data.get('notes', '')
 
-        attendance_date = datetime.strptime(attendance_date_str, '%Y-%m-%d').date()
-        today = datetime.now().date()
         teacher_role = session.get('role')
-        teacher_id = session.get('teacher_id')
 
         conn = db.get_connection()
         cursor = conn.cursor()
 
-        # 1. Past Data Editing Restriction
-        if attendance_date < today and teacher_role != 'admin':
+        # 1-2. Past data and 30-minute editing window restrictions (for non-admins);
+        # before the day's first save_all there is no lock and editing is open
+        edit_error = attendance_edit_error(conn, attendance_date_str)
+        if edit_error:
             conn.close()
-            return jsonify({'status': 'error', 'message': 'Teachers cannot edit past attendance data.'}), 403
-        
-        # 2. 30-minute editing window restriction (for non-admins)
-        if teacher_role != 'admin':
-            lock_record = conn.execute(
-                'SELECT locked_at FROM attendance_lock WHERE attendance_date = ?',
-                (attendance_date_str,)
-            ).fetchone()
-
-            if lock_record:
-                locked_at_time = datetime.fromisoformat(lock_record['locked_at'])
-                # Allow editing until 30 minutes past 9:00 AM, or 30 minutes after first save if later
-                # Assuming attendance starts at 9:00 AM
-                attendance_start_time = datetime.strptime(f"{attendance_date_str} 09:00:00", '%Y-%m-%d %H:%M:%S')
-                
-                # Determine the effective lock time: 9:00 AM + 30 min, or locked_at_time + 30 min, whichever is later
-                # This logic needs refinement based on exact requirement: "9:00 Am ko har din attendance start hogi"
-                # and "jab teacher ne save all attendance par click kar deya to 30 minut ke bad koye bhe teacher apne apne panel main attendance main changes na kar pa saky"
-                # Let's interpret this as: editing is allowed until 9:30 AM, OR 30 minutes after the first save, whichever is later.
-                # For simplicity, let's enforce 30 minutes from the *first save* for that day.
-                
-                lock_expiry_time = locked_at_time + timedelta(minutes=30)
-                
-                if datetime.now() > lock_expiry_time:
-                    conn.close()
-                    return jsonify({'status': 'error', 'message': 'Attendance is locked for changes after 30 minutes from initial save.'}), 403
-            # If no lock_record, it means this is the first save for the day, or no save_all has happened yet.
-            # The lock will be created by save_all_attendance.
+            return jsonify({'status': 'error', 'message': edit_error}), 403
 
         # 3. Teacher-specific semester restriction (already handled by get_attendance_students, but double-check here)
         student_semester = conn.execute('SELECT semester FROM students WHERE id = ?', (student_id,)).fetchone()
@@ -4992,6 +4282,8 @@ def save_attendance():
 
         conn.commit()
         conn.close()
+        if student_semester:
+            teacher_dashboards.invalidate_semesters([student_semester['semester']])
 
         return jsonify({'status': 'success', 'message': 'Attendance saved successfully'})
     except Exception as e:
@@ -5010,40 +4302,16 @@ def save_all_attendance():
             return jsonify({'status': 'success', 'message': 'No records to save.'})
 
         attendance_date_str = attendance_records[0].get('date', datetime.now().strftime('%Y-%m-%d'))
-        attendance_date = datetime.strptime(attendance_date_str, '%Y-%m-%d').date()
-        today = datetime.now().date()
         teacher_role = session.get('role')
-        teacher_id = session.get('teacher_id')
 
         conn = db.get_connection()
         cursor = conn.cursor()
 
-        # 1. Past Data Editing Restriction
-        if attendance_date < today and teacher_role != 'admin':
+        # 1-2. Past data and 30-minute editing window restrictions (for non-admins)
+        edit_error = attendance_edit_error(conn, attendance_date_str, start_lock=True)
+        if edit_error:
             conn.close()
-            return jsonify({'status': 'error', 'message': 'Teachers cannot edit past attendance data.'}), 403
-        
-        # 2. 30-minute editing window restriction (for non-admins)
-        if teacher_role != 'admin':
-            lock_record = conn.execute(
-                'SELECT locked_at FROM attendance_lock WHERE attendance_date = ?',
-                (attendance_date_str,)
-            ).fetchone()
-
-            if lock_record:
-                locked_at_time = datetime.fromisoformat(lock_record['locked_at'])
-                lock_expiry_time = locked_at_time + timedelta(minutes=30)
-                
-                if datetime.now() > lock_expiry_time:
-                    conn.close()
-                    return jsonify({'status': 'error', 'message': 'Attendance is locked for changes after 30 minutes from initial save.'}), 403
-            else:
-                # This is the first save_all for this date, create a lock record
-                cursor.execute(
-                    'INSERT INTO attendance_lock (attendance_date, locked_at, locked_by_teacher_id) VALUES (?, ?, ?)',
-                    (attendance_date_str, datetime.now().isoformat(), teacher_id)
-                )
-                conn.commit() # Commit the lock record immediately
+            return jsonify({'status': 'error', 'message': edit_error}), 403
 
         # 3. Teacher-specific semester restriction (double-check here for all records)
         if teacher_role == 'teacher':
@@ -5079,6 +4347,9 @@ def save_all_attendance():
                 )
 
         conn.commit()
+        teacher_dashboards.invalidate_semesters(
+            semesters_of_students(conn, [record.get('student_id') for record in attendance_records])
+        )
         conn.close()
 
         return jsonify({'status': 'success', 'message': f'{len(attendance_records)} attendance records saved'})
@@ -5087,6 +4358,75 @@ def save_all_attendance():
         print(f"Error saving attendance: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route("/api/attendance/sheet", methods=['GET'])
+@login_required
+def get_attendance_sheet():
+    """Marking sheet with a version token; pass ``since=<version>`` to get only rows changed after it"""
+    attendance_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    conn = db.get_connection()
+    try:
+        datetime.strptime(attendance_date, '%Y-%m-%d')
+        sheet = load_attendance_sheet(conn, attendance_date, request.args, teacher_semester_scope(request.args),
+                                      since=request.args.get('since') or None)
+        sheet['locked'] = attendance_edit_error(conn, attendance_date) is not None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid date or version'}), 400
+    finally:
+        conn.close()
+    return jsonify(sheet)
+
+
+@app.route("/api/attendance/sheet", methods=['POST'])
+@login_required
+def sync_attendance_sheet():
+    """Save only the edited rows of a sheet.
+
+    Body: ``date``, ``version`` (the sheet version the edits were made on),
+    ``changes`` (``[{student_id, status, notes}]``) and the sheet filters.
+    The response carries the new version and every row changed since
+    ``version``, including other users' edits, so the page stays in step.
+    """
+    data = request.get_json(silent=True) or {}
+    attendance_date = data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    changes = data.get('changes') or []
+    since = data.get('version') or None
+    semesters = teacher_semester_scope(data)
+
+    conn = db.get_connection()
+    try:
+        datetime.strptime(attendance_date, '%Y-%m-%d')
+        if since is not None:
+            parse_sheet_version(since)
+        edit_error = attendance_edit_error(conn, attendance_date)
+        if edit_error:
+            return jsonify({'status': 'error', 'message': edit_error}), 403
+        # Validate before anything is written, so a rejected payload does not
+        # start the day's edit window
+        prepared = prepare_sheet_changes(conn, changes, semesters)
+        try:
+            with conn:
+                if prepared:
+                    start_attendance_lock(conn, attendance_date)
+                saved = apply_sheet_changes(conn, attendance_date, prepared)
+        except Exception:
+            # A lock row written above was rolled back with the changes
+            student_attendance_locks.invalidate(attendance_date)
+            raise
+        teacher_dashboards.invalidate_semesters(semesters_of_students(conn, [change[0] for change in prepared]))
+        sheet = load_attendance_sheet(conn, attendance_date, data, semesters, since=since)
+    except PermissionError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 403
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Error syncing attendance sheet: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        conn.close()
+    sheet.update({'status': 'success', 'saved': saved})
+    return jsonify(sheet)
+
+
 @app.route("/api/attendance/bulk_upload", methods=['POST'])
 @login_required
 @admin_required
@@ -5101,58 +4441,16 @@ def bulk_upload_attendance():
             return jsonify({'status': 'error', 'message': 'Invalid file format. Please upload Excel file'}), 400
 
         df = pd.read_excel(file)
-        df.columns = [col.strip().lower() for col in df.columns]
 
         conn = db.get_connection()
-        cursor = conn.cursor()
-
-        success_count = 0
-        error_count = 0
-        errors = []
-
-        for idx, row in df.iterrows():
-            try:
-                admission_no = str(row.get('admission_no', '')).strip()
-                attendance_date_str = str(row.get('date', datetime.now().strftime('%Y-%m-%d'))).strip()
-                status = str(row.get('status', 'Present')).strip()
-                notes = str(row.get('notes', '')).strip()
-
-                # Get student ID from admission number
-                cursor.execute('SELECT id FROM students WHERE admission_no = ?', (admission_no,))
-                student = cursor.fetchone()
-
-                if not student:
-                    error_count += 1
-                    errors.append(f"Row {idx + 2}: Student with admission no {admission_no} not found")
-                    continue
-
-                student_id = student[0]
-
-                # Check if record exists
-                cursor.execute(
-                    'SELECT id FROM attendance WHERE student_id = ? AND attendance_date = ?',
-                    (student_id, attendance_date_str)
-                )
-                existing = cursor.fetchone()
-
-                if existing:
-                    cursor.execute(
-                        'UPDATE attendance SET status = ?, notes = ? WHERE student_id = ? AND attendance_date = ?',
-                        (status, notes, student_id, attendance_date_str)
-                    )
-                else:
-                    cursor.execute(
-                        'INSERT INTO attendance (student_id, attendance_date, status, notes, created_at) VALUES (?, ?, ?, ?, ?)',
-                        (student_id, attendance_date_str, status, notes, datetime.now().isoformat())
-                    )
-
-                success_count += 1
-            except Exception as e:
-                error_count += 1
-                errors.append(f"Row {idx + 2}: {str(e)}")
-
-        conn.commit()
-        conn.close()
+        try:
+            records, errors = prepare_attendance_upload(df, conn)
+            with conn:
+                success_count = upsert_attendance(conn, records)
+            teacher_dashboards.invalidate_semesters(semesters_of_students(conn, records['student_id'].unique().tolist()))
+        finally:
+            conn.close()
+        error_count = len(errors)
 
         message = f"Uploaded: {success_count} records"
         if error_count > 0:
@@ -5251,6 +4549,60 @@ def daily_attendance_report():
 
     return jsonify([dict(row) for row in students])
 
+# Active students with their status counts for one month (params: year_month, status)
+MONTHLY_ATTENDANCE_COUNTS_QUERY = '''
+    SELECT s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.board, s.campus,
+           COALESCE(a.present, 0) AS present, COALESCE(a.absent, 0) AS absent,
+           COALESCE(a.late, 0) AS late, COALESCE(a.leave, 0) AS leave,
+           COALESCE(a.total, 0) AS total_days
+    FROM students s
+    LEFT JOIN (
+        SELECT student_id,
+               SUM(status = 'Present') AS present,
+               SUM(status = 'Absent') AS absent,
+               SUM(status = 'Late') AS late,
+               SUM(status = 'Leave') AS leave,
+               COUNT(*) AS total
+        FROM attendance
+        WHERE strftime('%Y-%m', attendance_date) = ?
+        GROUP BY student_id
+    ) a ON a.student_id = s.id
+    WHERE s.status = ?
+'''
+
+
+def monthly_attendance_entry(row):
+    """Shape a MONTHLY_ATTENDANCE_COUNTS_QUERY row for the monthly report."""
+    total_days = row['total_days']
+    if total_days > 0:
+        present_percentage = (row['present'] / total_days) * 100
+        absent_percentage = (row['absent'] / total_days) * 100
+        late_percentage = (row['late'] / total_days) * 100
+    else:
+        present_percentage = absent_percentage = late_percentage = 0
+
+    return {
+        'id': row['id'],
+        'admission_no': row['admission_no'],
+        'name': row['name'],
+        'father_name': row['father_name'],
+        'technology': row['technology'],
+        'semester': row['semester'],
+        'board': row['board'],
+        'campus': row['campus'],
+        'present': row['present'],
+        'absent': row['absent'],
+        'late': row['late'],
+        'leave': row['leave'],
+        'total_days': total_days,
+        'present_percentage': round(present_percentage, 2),
+        'absent_percentage': round(absent_percentage, 2),
+        'late_percentage': round(late_percentage, 2),
+        # Flag if attendance is below the threshold (70%)
+        'is_low_attendance': present_percentage < LOW_ATTENDANCE_THRESHOLD
+    }
+
+
 @app.route("/api/attendance/monthly_report", methods=['GET'])
 @login_required
 def monthly_attendance_report():
@@ -5261,115 +4613,52 @@ def monthly_attendance_report():
     semester = request.args.get('semester', '')
     technology = request.args.get('technology', '')
     admission_no = request.args.get('admission_no', '') # New: Get admission number filter
+    stream_format = requested_stream_format()
 
     teacher_role = session.get('role')
     assigned_semesters = session.get('assigned_semesters', [])
 
-    conn = db.get_connection()
-
-    # Get all students
-    query = 'SELECT id, admission_no, name, father_name, technology, semester, board, campus FROM students WHERE status = ?'
-    params = ['Active']
+    query = MONTHLY_ATTENDANCE_COUNTS_QUERY
+    params = [year_month, 'Active']
     conditions = []
 
     if campus:
-        conditions.append('campus = ?')
+        conditions.append('s.campus = ?')
         params.append(campus)
 
     if board:
-        conditions.append('board = ?')
+        conditions.append('s.board = ?')
         params.append(board)
 
     if semester:
-        conditions.append('semester = ?')
+        conditions.append('s.semester = ?')
         params.append(semester)
 
     if technology:
-        conditions.append('technology = ?')
+        conditions.append('s.technology = ?')
         params.append(technology)
 
     if admission_no: # New: Add admission number condition
-        conditions.append('admission_no LIKE ?') # Use LIKE for partial matching
+        conditions.append('s.admission_no LIKE ?') # Use LIKE for partial matching
         params.append(f'%{admission_no}%') # Add wildcards for partial matching
     
     # Apply teacher-specific semester restriction
     if teacher_role == 'teacher' and assigned_semesters:
         semester_placeholders = ','.join(['?' for _ in assigned_semesters])
-        conditions.append(f'semester IN ({semester_placeholders})')
+        conditions.append(f's.semester IN ({semester_placeholders})')
         params.extend(assigned_semesters)
         if semester and semester not in assigned_semesters:
-            conn.close()
+            if stream_format:
+                return stream_rows(iter(()), stream_format, f'monthly_attendance_{year_month}')
             return jsonify([])
 
     if conditions:
         query += ' AND ' + ' AND '.join(conditions)
 
-    students = conn.execute(query, params).fetchall()
-
-    # Get attendance records for the month
-    attendance_query = '''
-        SELECT student_id, status, COUNT(*) as count
-        FROM attendance
-        WHERE strftime('%Y-%m', attendance_date) = ?
-GROUP BY student_id, status
-    '''
-    attendance_records = conn.execute(attendance_query, (year_month,)).fetchall()
-
-    # Build attendance map
-    attendance_map = {}
-    for record in attendance_records:
-        student_id = record['student_id']
-        if student_id not in attendance_map:
-            attendance_map[student_id] = {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0}
-        attendance_map[student_id][record['status']] = record['count']
-
-    # Calculate percentages and build report
-    report = []
-    low_attendance_students = []
-
-    for student in students:
-        student_id = student['id']
-        attendance = attendance_map.get(student_id, {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0})
-
-        total_days = sum(attendance.values())
-        present_count = attendance['Present']
-        absent_count = attendance['Absent']
-        late_count = attendance['Late']
-        leave_count = attendance['Leave']
-
-        if total_days > 0:
-            present_percentage = (present_count / total_days) * 100
-            absent_percentage = (absent_count / total_days) * 100
-            late_percentage = (late_count / total_days) * 100
-        else:
-            present_percentage = absent_percentage = late_percentage = 0
-
-        # Flag if attendance is below 70%
-        is_low_attendance = present_percentage < 70
-
-        report.append({
-            'id': student_id,
-            'admission_no': student['admission_no'],
-            'name': student['name'],
-            'father_name': student['father_name'],
-            'technology': student['technology'],
-            'semester': student['semester'],
-            'board': student['board'],
-            'campus': student['campus'],
-            'present': present_count,
-            'absent': absent_count,
-            'late': late_count,
-            'leave': leave_count,
-            'total_days': total_days,
-            'present_percentage': round(present_percentage, 2),
-            'absent_percentage': round(absent_percentage, 2),
-            'late_percentage': round(late_percentage, 2),
-            'is_low_attendance': is_low_attendance
-        })
-
-    conn.close()
-
-    return jsonify(report)
+    entries = (monthly_attendance_entry(row) for row in iter_query(query, params))
+    if stream_format:
+        return stream_rows(entries, stream_format, f'monthly_attendance_{year_month}')
+    return jsonify(list(entries))
 
 @app.route("/api/attendance/monthly_detail_report", methods=['GET'])
 def monthly_student_detail_report():
@@ -5488,19 +4777,42 @@ def yearly_attendance_summary():
     semester = request.args.get('semester', '')
     technology = request.args.get('technology', '')
     semester_window = request.args.get('semester_window', '').lower()
+    stream_format = requested_stream_format()
     
     teacher_role = session.get('role')
     assigned_semesters = session.get('assigned_semesters', [])
     
-    conn = db.get_connection()
-    
-    # Build query for students
-    query = '''
-        SELECT s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.board, s.campus
+    # Attendance counts for the year (optionally one half) joined onto the students
+    month_filters = ()
+    if semester_window == 'spring':
+        month_filters = ('01', '02', '03', '04', '05', '06')
+    elif semester_window == 'fall':
+        month_filters = ('07', '08', '09', '10', '11', '12')
+
+    attendance_filter = "strftime('%Y', attendance_date) = ?"
+    params = [year]
+    if month_filters:
+        placeholders = ','.join(['?'] * len(month_filters))
+        attendance_filter += f" AND strftime('%m', attendance_date) IN ({placeholders})"
+        params.extend(month_filters)
+
+    query = f'''
+        SELECT s.id, s.admission_no, s.name, s.father_name, s.technology, s.semester, s.board, s.campus,
+               COALESCE(a.present, 0) AS present, COALESCE(a.absent, 0) AS absent,
+               COALESCE(a.late, 0) AS late, COALESCE(a.leave, 0) AS leave
         FROM students s
+        LEFT JOIN (
+            SELECT student_id,
+                   SUM(status = 'Present') AS present,
+                   SUM(status = 'Absent') AS absent,
+                   SUM(status = 'Late') AS late,
+                   SUM(status = 'Leave') AS leave
+            FROM attendance
+            WHERE {attendance_filter}
+            GROUP BY student_id
+        ) a ON a.student_id = s.id
         WHERE s.status = 'Active'
     '''
-    params = []
     conditions = []
     
     if technology:
@@ -5530,81 +4842,40 @@ def yearly_attendance_summary():
     
     query += ' ORDER BY s.name'
     
-    students = conn.execute(query, params).fetchall()
-    
-    # Get attendance records for the year
-    month_filters = ()
-    if semester_window == 'spring':
-        month_filters = ('01', '02', '03', '04', '05', '06')
-    elif semester_window == 'fall':
-        month_filters = ('07', '08', '09', '10', '11', '12')
+    def summary_entries():
+        for row in iter_query(query, params):
+            # Present + Late + Leave count as attendance
+            attended_days = row['present'] + row['late'] + row['leave']
+            total_days = attended_days + row['absent']
+            attendance_percentage = 0
+            if total_days > 0:
+                attendance_percentage = round((attended_days / total_days) * 100, 2)
+            yield {
+                'id': row['id'],
+                'admission_no': row['admission_no'],
+                'name': row['name'],
+                'father_name': row['father_name'],
+                'campus': row['campus'],
+                'board': row['board'],
+                'semester': row['semester'],
+                'technology': row['technology'],
+                'total_days': total_days,
+                'present_days': attended_days,
+                'attendance_percentage': attendance_percentage
+            }
 
-    attendance_query = '''
-        SELECT student_id, status, COUNT(*) as count
-        FROM attendance
-        WHERE strftime('%Y', attendance_date) = ?
-    '''
-    attendance_params = [year]
-    if month_filters:
-        placeholders = ','.join(['?'] * len(month_filters))
-        attendance_query += f' AND strftime(\'%m\', attendance_date) IN ({placeholders})'
-        attendance_params.extend(month_filters)
+    if stream_format:
+        return stream_rows(summary_entries(), stream_format, f'yearly_attendance_{year}')
 
-    attendance_query += ' GROUP BY student_id, status'
-    attendance_records = conn.execute(attendance_query, attendance_params).fetchall()
-    
-    # Build attendance map
-    attendance_map = {}
-    for record in attendance_records:
-        student_id = record['student_id']
-        if student_id not in attendance_map:
-            attendance_map[student_id] = {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0}
-        attendance_map[student_id][record['status']] = record['count']
-    
-    # Calculate summary statistics
-    report = []
-    total_present_days = 0
-    total_days_all = 0
-    
-    for student in students:
-        student_id = student['id']
-        attendance = attendance_map.get(student_id, {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0})
-        
-        present_days = attendance['Present']
-        absent_days = attendance['Absent']
-        late_days = attendance['Late']
-        leave_days = attendance['Leave']
-        total_days = present_days + absent_days + late_days + leave_days
-        
-        # Calculate attendance percentage (Present + Late + Leave count as attendance)
-        attendance_percentage = 0
-        if total_days > 0:
-            attendance_percentage = round(((present_days + late_days + leave_days) / total_days) * 100, 2)
-        
-        total_present_days += present_days + late_days + leave_days
-        total_days_all += total_days
-        
-        report.append({
-            'id': student_id,
-            'admission_no': student['admission_no'],
-            'name': student['name'],
-            'father_name': student['father_name'],
-            'campus': student['campus'],
-            'board': student['board'],
-            'semester': student['semester'],
-            'technology': student['technology'],
-            'total_days': total_days,
-            'present_days': present_days + late_days + leave_days,
-            'attendance_percentage': attendance_percentage
-        })
+    report = list(summary_entries())
+    total_present_days = sum(entry['present_days'] for entry in report)
+    total_days_all = sum(entry['total_days'] for entry in report)
     
     # Calculate average attendance
     average_attendance = 0
     if total_days_all > 0:
         average_attendance = round((total_present_days / total_days_all) * 100, 2)
     
-    conn.close()
-    
     return jsonify({
         'total_students': len(report),
         'average_attendance': average_attendance,
@@ -5662,33 +4933,15 @@ def export_daily_attendance_pdf():
     conn.close()
 
     buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#1f4788'),
-        spaceAfter=6,
-        alignment=1
-    )
-
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=12,
-        alignment=1
+    doc = report_document(buffer)
+    elements = institute_header(
+        "Daily Attendance Report",
+        ATTENDANCE_TITLE,
+        ATTENDANCE_SUBTITLE,
+        institute_name="Ghazali Institute of Medical Sciences",
+        space_after=0.2*inch
     )
 
-    elements = []
-
-    elements.append(Paragraph("Ghazali Institute of Medical Sciences", title_style))
-    elements.append(Paragraph("Daily Attendance Report", subtitle_style))
-    elements.append(Spacer(1, 0.2*inch))
-
     filter_text = f"Date: {attendance_date}"
     if technology:
         filter_text += f" | Technology: {technology}"
@@ -5699,20 +4952,11 @@ def export_daily_attendance_pdf():
     if campus: # New: Add campus to filter text
         filter_text += f" | Campus: {campus}"
 
-    filter_style = ParagraphStyle(
-        'FilterInfo',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=12,
-        alignment=0
-    )
-    elements.append(Paragraph(filter_text, filter_style))
+    elements.append(Paragraph(filter_text, FILTER_INFO))
     elements.append(Spacer(1, 0.1*inch))
 
     data = [["S.NO", "Admission No", "Name", "Father Name", "Campus", "Technology", "Status", "Reason"]]
     for index, student in enumerate(students):
-        status_color = '#28a745' if student['attendance_status'] == 'Present' else '#dc3545' if student['attendance_status'] == 'Absent' else '#ffc107'
         reason = student['notes'] if student['attendance_status'] == 'Leave' else ''
         data.append([
             str(index + 1),
@@ -5725,35 +4969,9 @@ def export_daily_attendance_pdf():
             reason
         ])
 
-    table = Table(data, colWidths=[0.4*inch, 0.8*inch, 1*inch, 1*inch, 0.8*inch, 0.8*inch, 0.7*inch, 1*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4788')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('TOPPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-    ]))
-    elements.append(table)
-
-    elements.append(Spacer(1, 0.2*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#999999'),
-        alignment=2
-    )
-    elements.append(Paragraph(f"Total Students: {len(students)}", footer_style))
+    col_widths = [0.4*inch, 0.8*inch, 1*inch, 1*inch, 0.8*inch, 0.8*inch, 0.7*inch, 1*inch]
+    elements += chunked_table(data, col_widths, DAILY_ATTENDANCE_TABLE, doc=doc, preceding=elements)
+    elements += total_records_footer(len(students), label="Total Students")
 
     doc.build(elements)
     buffer.seek(0)
@@ -5765,138 +4983,44 @@ def export_daily_attendance_pdf():
         download_name=f'daily_attendance_{attendance_date}.pdf'
     )
 
-@app.route("/api/attendance/monthly_report/export_pdf", methods=['GET'])
-def export_monthly_attendance_pdf():
-    """Export monthly attendance report to PDF"""
-    year_month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    campus = request.args.get('campus', '') # New: Get campus filter
-    board = request.args.get('board', '')
-    semester = request.args.get('semester', '')
-    technology = request.args.get('technology', '')
-    admission_no = request.args.get('admission_no', '') # New: Get admission number filter
-
-    conn = db.get_connection()
-
-    # Get all students
-    query = 'SELECT id, admission_no, name, father_name, technology, semester, board, campus FROM students WHERE status = ?'
-    params = ['Active']
+def monthly_attendance_query(args):
+    """Build the MONTHLY_ATTENDANCE_COUNTS_QUERY variant for the export filters."""
+    year_month = args.get('month') or datetime.now().strftime('%Y-%m')
+    query = MONTHLY_ATTENDANCE_COUNTS_QUERY
+    params = [year_month, 'Active']
     conditions = []
 
-    if campus: # New: Add campus condition
-        conditions.append('campus = ?')
-        params.append(campus)
-
-    if board:
-        conditions.append('board = ?')
-        params.append(board)
-
-    if semester:
-        conditions.append('semester = ?')
-        params.append(semester)
-
-    if technology:
-        conditions.append('technology = ?')
-        params.append(technology)
-
-    if admission_no: # New: Add admission number condition
-        conditions.append('admission_no = ?')
-        params.append(admission_no)
+    for arg in ('campus', 'board', 'semester', 'technology', 'admission_no'):
+        value = args.get(arg)
+        if value:
+            conditions.append(f's.{arg} = ?')
+            params.append(value)
 
     if conditions:
         query += ' AND ' + ' AND '.join(conditions)
-
-    students = conn.execute(query, params).fetchall()
-
-# Get attendance records for the month
-    attendance_query = '''
-        SELECT student_id, status, COUNT(*) as count
-        FROM attendance
-        WHERE strftime('%Y-%m', attendance_date) = ?
-GROUP BY student_id, status
-    '''
-    attendance_records = conn.execute(attendance_query, (year_month,)).fetchall()
-
-    # Build attendance map
-    attendance_map = {}
-    for record in attendance_records:
-        student_id = record['student_id']
-        if student_id not in attendance_map:
-            attendance_map[student_id] = {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0}
-        attendance_map[student_id][record['status']] = record['count']
-
-    # Calculate percentages and build report
-    report = []
-    low_attendance_students = []
-
-    for student in students:
-        student_id = student['id']
-        attendance = attendance_map.get(student_id, {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0})
-
-        total_days = sum(attendance.values())
-        present_count = attendance['Present']
-        absent_count = attendance['Absent']
-        late_count = attendance['Late']
-        leave_count = attendance['Leave']
-
-        if total_days > 0:
-            present_percentage = (present_count / total_days) * 100
-        else:
-            present_percentage = 0
-
-        is_low_attendance = present_percentage < 70
-
-        student_data = {
-            'id': student_id,
-            'admission_no': student['admission_no'],
-            'name': student['name'],
-            'father_name': student['father_name'],
-            'technology': student['technology'],
-            'semester': student['semester'],
-            'board': student['board'],
-            'campus': student['campus'], # New: Include campus in report
-            'present': present_count,
-            'absent': absent_count,
-            'late': late_count,
-            'leave': leave_count,
-            'total_days': total_days,
-            'present_percentage': round(present_percentage, 2),
-            'is_low_attendance': is_low_attendance
-        }
-
-        report.append(student_data)
-        if is_low_attendance:
-            low_attendance_students.append(student_data)
-
-    conn.close()
-
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#1f4788'),
-        spaceAfter=6,
-        alignment=1
+    return year_month, query, params
+
+
+def build_monthly_attendance_pdf(args, target, progress=None):
+    """Write the monthly attendance PDF to ``target`` and return its download name."""
+    year_month, query, params = monthly_attendance_query(args)
+    campus = args.get('campus', '')
+    board = args.get('board', '')
+    semester = args.get('semester', '')
+    technology = args.get('technology', '')
+
+    report = [monthly_attendance_entry(row) for row in iter_query(query, params)]
+    low_attendance_students = [student for student in report if student['is_low_attendance']]
+
+    doc = report_document(target)
+    elements = institute_header(
+        "Monthly Attendance Report",
+        ATTENDANCE_TITLE,
+        ATTENDANCE_SUBTITLE,
+        institute_name="Ghazali Institute of Medical Sciences",
+        space_after=0.2*inch
     )
 
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#333333'),
-        spaceAfter=12,
-        alignment=1
-    )
-
-    elements = []
-
-    elements.append(Paragraph("Ghazali Institute of Medical Sciences", title_style))
-    elements.append(Paragraph("Monthly Attendance Report", subtitle_style))
-    elements.append(Spacer(1, 0.2*inch))
-
     filter_text = f"Month: {year_month}"
     if campus: # New: Add campus to filter text
         filter_text += f" | Campus: {campus}"
@@ -5907,19 +5031,11 @@ GROUP BY student_id, status
     if technology:
         filter_text += f" | Technology: {technology}"
 
-    filter_style = ParagraphStyle(
-        'FilterInfo',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#666666'),
-        spaceAfter=12,
-        alignment=0
-    )
-    elements.append(Paragraph(filter_text, filter_style))
+    elements.append(Paragraph(filter_text, FILTER_INFO))
     elements.append(Spacer(1, 0.1*inch))
 
     # All students table
-    elements.append(Paragraph("All Students Attendance", ParagraphStyle('SectionTitle', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#1f4788'), spaceAfter=10)))
+    elements.append(Paragraph("All Students Attendance", SECTION_TITLE))
 
     data = [["S.NO", "Admission No", "Name", "Campus", "Board", "Semester", "Technology", "Present", "Absent", "Late", "Leave", "Total", "Percentage"]]
     for index, student in enumerate(report):
@@ -5939,30 +5055,13 @@ GROUP BY student_id, status
             f"{student['present_percentage']}%"
         ])
 
-    table = Table(data, colWidths=[0.3*inch, 0.7*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.8*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.7*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4788')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('TOPPADDING', (0, 1), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-    ]))
-    elements.append(table)
+    col_widths = [0.3*inch, 0.7*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.8*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.7*inch]
+    elements += chunked_table(data, col_widths, MONTHLY_ATTENDANCE_TABLE, doc=doc, preceding=elements)
 
     # Low attendance students section
     if low_attendance_students:
         elements.append(Spacer(1, 0.3*inch))
-        elements.append(Paragraph("⚠️ Students with Attendance Below 70%", ParagraphStyle('WarningTitle', parent=styles['Heading2'], fontSize=12, textColor=colors.HexColor('#dc3545'), spaceAfter=10)))
+        elements.append(Paragraph("⚠️ Students with Attendance Below 70%", WARNING_TITLE))
 
         low_data = [["S.NO", "Admission No", "Name", "Present", "Total Days", "Percentage"]]
         for index, student in enumerate(low_attendance_students):
@@ -5975,144 +5074,192 @@ GROUP BY student_id, status
                 f"{student['present_percentage']}%"
             ])
 
-        low_table = Table(low_data, colWidths=[0.4*inch, 0.8*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch])
-        low_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#dc3545')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('TOPPADDING', (0, 0), (-1, 0), 8),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ffe6e6')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#fff0f0')]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dc3545')),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-        ]))
-        elements.append(low_table)
+        elements += chunked_table(low_data, [0.4*inch, 0.8*inch, 1.2*inch, 0.8*inch, 1*inch, 1*inch], LOW_ATTENDANCE_TABLE)
 
+    attach_progress(doc, progress)
     doc.build(elements)
+    return f'monthly_attendance_{year_month}.pdf'
+
+
+@app.route("/api/attendance/monthly_report/export_pdf", methods=['GET'])
+def export_monthly_attendance_pdf():
+    """Export monthly attendance report to PDF"""
+    buffer = io.BytesIO()
+    download_name = build_monthly_attendance_pdf(request.args, buffer)
     buffer.seek(0)
 
     return send_file(
         buffer,
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=f'monthly_attendance_{year_month}.pdf'
+        download_name=download_name
     )
 
 @app.route("/api/attendance/monthly_report/export_excel", methods=['GET'])
 def export_monthly_attendance_excel():
     """Export monthly attendance report to Excel"""
-    year_month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    campus = request.args.get('campus', '') # New: Get campus filter
-    board = request.args.get('board', '')
-    semester = request.args.get('semester', '')
-    technology = request.args.get('technology', '')
-    admission_no = request.args.get('admission_no', '') # New: Get admission number filter
-
-    conn = db.get_connection()
-
-    # Get all students
-    query = 'SELECT id, admission_no, name, father_name, technology, semester, board, campus FROM students WHERE status = ?'
-    params = ['Active']
-    conditions = []
-
-    if campus: # New: Add campus condition
-        conditions.append('campus = ?')
-        params.append(campus)
-
-    if board:
-        conditions.append('board = ?')
-        params.append(board)
-
-    if semester:
-        conditions.append('semester = ?')
-        params.append(semester)
-
-    if technology:
-        conditions.append('technology = ?')
-        params.append(technology)
+    year_month, query, params = monthly_attendance_query(request.args)
+
+    def sheet_rows():
+        for index, row in enumerate(iter_query(query, params), 1):
+            total_days = row['total_days']
+            present_percentage = (row['present'] / total_days) * 100 if total_days > 0 else 0
+            yield [
+                index,
+                row['admission_no'],
+                row['name'],
+                row['father_name'],
+                row['campus'], # New: Include campus in Excel
+                row['board'],
+                row['semester'],
+                row['technology'],
+                row['present'],
+                row['absent'],
+                row['late'],
+                row['leave'],
+                total_days,
+                f"{round(present_percentage, 2)}%"
+            ]
 
-    if admission_no: # New: Add admission number condition
-        conditions.append('admission_no = ?')
-        params.append(admission_no)
+    return stream_xlsx(
+        sheet_rows(),
+        ["S.NO", "Admission No", "Name", "Father Name", "Campus", "Board", "Semester", "Technology", "Present", "Absent", "Late", "Leave", "Total Days", "Attendance %"],
+        "Monthly Attendance",
+        f'monthly_attendance_{year_month}.xlsx'
+    )
 
-    if conditions:
-        query += ' AND ' + ' AND '.join(conditions)
+# Monthly register: one row per student, one column per day of the month
+def monthly_register_for_request(conn):
+    """Load the register for the request filters, limited to a teacher's assigned semesters."""
+    year_month = meeting_reports.parse_month(request.args.get('month') or datetime.now().strftime('%Y-%m'))
+    return load_monthly_register(conn, year_month, request.args, teacher_semester_scope(request.args))
 
-    students = conn.execute(query, params).fetchall()
 
-    # Get attendance records for the month
-    attendance_query = '''
-        SELECT student_id, status, COUNT(*) as count
-        FROM attendance
-        WHERE strftime('%Y-%m', attendance_date) = ?
-        GROUP BY student_id, status
-    '''
-    attendance_records = conn.execute(attendance_query, (year_month,)).fetchall()
+def monthly_register_filter_text(register):
+    parts = [f"Month: {register.month_label}"]
+    for name in REGISTER_FILTERS:
+        value = request.args.get(name)
+        if value:
+            parts.append(f"{name.title()}: {value}")
+    return ' | '.join(parts)
 
-    # Build attendance map
-    attendance_map = {}
-    for record in attendance_records:
-        student_id = record['student_id']
-        if student_id not in attendance_map:
-            attendance_map[student_id] = {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0}
-        attendance_map[student_id][record['status']] = record['count']
 
-    conn.close()
+@app.route("/api/attendance/monthly_register", methods=['GET'])
+@login_required
+def monthly_attendance_register():
+    """Student x day attendance register for a month, with per-student and per-day totals"""
+    conn = db.get_connection()
+    try:
+        register = monthly_register_for_request(conn)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid month format. Use YYYY-MM.'}), 400
+    finally:
+        conn.close()
+    return jsonify(register_payload(register))
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Monthly Attendance"
+@app.route("/api/attendance/monthly_register/export_excel", methods=['GET'])
+@login_required
+def export_monthly_register_excel():
+    """Export the monthly attendance register to Excel"""
+    conn = db.get_connection()
+    try:
+        register = monthly_register_for_request(conn)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid month format. Use YYYY-MM.'}), 400
+    finally:
+        conn.close()
+    return stream_xlsx(
+        register_rows(register),
+        register_headers(register),
+        "Attendance Register",
+        f'attendance_register_{register.year_month}.xlsx'
+    )
 
-    # Add headers
-    ws.append(["S.NO", "Admission No", "Name", "Father Name", "Campus", "Board", "Semester", "Technology", "Present", "Absent", "Late", "Leave", "Total Days", "Attendance %"])
+@app.route("/api/attendance/monthly_register/export_pdf", methods=['GET'])
+@login_required
+def export_monthly_register_pdf():
+    """Export the monthly attendance register to PDF"""
+    conn = db.get_connection()
+    try:
+        register = monthly_register_for_request(conn)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid month format. Use YYYY-MM.'}), 400
+    finally:
+        conn.close()
 
-    # Add data
-    for index, student in enumerate(students):
-        student_id = student['id']
-        attendance = attendance_map.get(student_id, {'Present': 0, 'Absent': 0, 'Late': 0, 'Leave': 0})
+    # Day cells fit "31" and "LV" inside draw_grid_pdf's 4pt cell padding
+    day_width = 16
+    col_widths = [22, 44, 80] + [day_width] * register.days + [20, 20, 20, 20, 34]
+    buffer = io.BytesIO()
+    draw_grid_pdf(
+        buffer,
+        [("Ghazali Institute of Medical Sciences", 'Helvetica-Bold', 16, ATTENDANCE_BLUE),
+         ("Monthly Attendance Register", 'Helvetica-Bold', 12, colors.HexColor('#333333')),
+         (monthly_register_filter_text(register), 'Helvetica', 8, colors.HexColor('#666666'))],
+        register_headers(register),
+        list(register_rows(register)),
+        col_widths,
+        pagesize=landscape(A4),
+        margins=(0.4*inch, 0.4*inch, 0.5*inch, 0.5*inch),
+        header_fill=ATTENDANCE_BLUE,
+        header_size=7,
+        body_size=6.5,
+        footer_text=f"Total Students: {len(register.students)}"
+    )
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'attendance_register_{register.year_month}.pdf'
+    )
 
-        total_days = sum(attendance.values())
-        present_count = attendance['Present']
+@app.route("/api/attendance/low_attendance_roster", methods=['GET'])
+@login_required
+def get_low_attendance_roster():
+    """Precomputed month-to-date low-attendance list, worst first"""
+    try:
+        year_month = meeting_reports.parse_month(request.args.get('month') or datetime.now().strftime('%Y-%m'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid month format. Use YYYY-MM.'}), 400
+    conn = db.get_connection()
+    try:
+        students = low_attendance.load_roster(conn, year_month, request.args, teacher_semester_scope(request.args))
+    finally:
+        conn.close()
+    return jsonify({
+        'status': 'success',
+        'month': year_month,
+        'threshold': LOW_ATTENDANCE_THRESHOLD,
+        'as_of': students[0]['as_of'] if students else None,
+        'computed_at': students[0]['computed_at'] if students else None,
+        'students': students
+    })
 
-        if total_days > 0:
-            present_percentage = (present_count / total_days) * 100
-        else:
-            present_percentage = 0
-
-        ws.append([
-            index + 1,
-            student['admission_no'],
-            student['name'],
-            student['father_name'],
-            student['campus'], # New: Include campus in Excel
-            student['board'],
-            student['semester'],
-            student['technology'],
-            attendance['Present'],
-            attendance['Absent'],
-            attendance['Late'],
-            attendance['Leave'],
-            total_days,
-            f"{round(present_percentage, 2)}%"
-        ])
 
-    excel_file = io.BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
+@app.route("/api/attendance/low_attendance_roster/refresh", methods=['POST'])
+@login_required
+@admin_required
+def refresh_low_attendance_roster():
+    """Recompute a month's roster now (normally done nightly); ``send_sms`` overrides LOW_ATTENDANCE_SMS_ENABLED"""
+    data = request.get_json(silent=True) or {}
+    try:
+        as_of = datetime.strptime(data['as_of'], '%Y-%m-%d').date() if data.get('as_of') else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid as_of date. Use YYYY-MM-DD.'}), 400
+    # Only a JSON true/false counts: bool("false") would queue SMS to parents
+    send_sms = data.get('send_sms', LOW_ATTENDANCE_SMS_ENABLED)
+    if not isinstance(send_sms, bool):
+        return jsonify({'status': 'error', 'message': 'send_sms must be true or false.'}), 400
+    try:
+        summary = low_attendance.run_nightly_refresh(as_of, send_sms=send_sms)
+    except Exception as e:
+        print(f"Error refreshing low-attendance roster: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    if summary['sms_queued']:
+        sms_dispatcher.wake()
+    return jsonify({'status': 'success', **summary})
 
-    return send_file(
-        excel_file,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'monthly_attendance_{year_month}.xlsx'
-    )
 
 @app.route("/api/search_students_for_certificates", methods=['GET'])
 def search_students_for_certificates():
@@ -6190,99 +5337,12 @@ def certificates():
 
 # ==================== END CERTIFICATES API ENDPOINTS ====================
 
-# ==================== BONAFIDE AND COURSE COMPLETION CERTIFICATES ====================
-def generate_bonafide_pdf(student, reference_number=''):
-    buffer = io.BytesIO()
-    # Use Portrait orientation (A4 is portrait by default)
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.75*inch, leftMargin=0.75*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-    
-    elements = []
-    
-    # Title style
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#000000'),
-        spaceAfter=20,
-        alignment=1  # Center alignment
-    )
-    
-    elements.append(Paragraph("BONAFIDE CERTIFICATE", title_style))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Date and Reference
-    date_text = f"Date: {datetime.now().strftime('%d-%m-%Y')}"
-    if reference_number:
-        date_text += f"<br/>Ref: {reference_number}"
-    elements.append(Paragraph(date_text, styles['Normal']))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Certificate text
-    technology = student.get('technology', 'N/A') or 'N/A'
-    semester = student.get('semester', 'N/A') or 'N/A'
-    
-    text = f"""
-    This is to certify that <b>{student['name']}</b>, son/daughter of <b>{student['father_name']}</b>,
-    is a bonafide student of our institution.
-    <br/><br/>
-    His/Her admission number is <b>{student['admission_no']}</b> and he/she is currently studying in
-    <b>{technology}</b>, semester <b>{semester}</b>.
-    <br/><br/>
-    We wish him/her all the best for his/her future endeavors.
-    """
-    
-    elements.append(Paragraph(text, styles['Normal']))
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
+# ==================== BONAFIDE AND COURSE COMPLETION CERTIFICATES ====================
+def generate_bonafide_pdf(student, reference_number=''):
+    return render_certificate('bonafide', student, reference_number)
+
 def generate_course_completion_pdf(student, reference_number=''):
-    buffer = io.BytesIO()
-    # Use Portrait orientation (A4 is portrait by default)
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.75*inch, leftMargin=0.75*inch, topMargin=0.75*inch, bottomMargin=0.75*inch)
-    styles = getSampleStyleSheet()
-    
-    elements = []
-    
-    # Title style
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#000000'),
-        spaceAfter=20,
-        alignment=1  # Center alignment
-    )
-    
-    elements.append(Paragraph("COURSE COMPLETION CERTIFICATE", title_style))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Date and Reference
-    date_text = f"Date: {datetime.now().strftime('%d-%m-%Y')}"
-    if reference_number:
-        date_text += f"<br/>Ref: {reference_number}"
-    elements.append(Paragraph(date_text, styles['Normal']))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Certificate text
-    technology = student.get('technology', 'N/A') or 'N/A'
-    
-    text = f"""
-    This is to certify that <b>{student['name']}</b>, son/daughter of <b>{student['father_name']}</b>,
-    with admission number <b>{student['admission_no']}</b>, has successfully completed the
-    <b>{technology}</b> program.
-    <br/><br/>
-    We congratulate him/her on this achievement and wish him/her success in all future endeavors.
-    """
-    
-    elements.append(Paragraph(text, styles['Normal']))
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return render_certificate('course_completion', student, reference_number)
 
 @app.route("/generate_certificate", methods=['POST'])
 def generate_certificate():
@@ -6405,88 +5465,73 @@ def monthly_meeting_report():
     """
     Generates a monthly report of student strength, broken down by board and semester,
     including paid, free, and total students, with overall summaries.
+    Past months are served from their month-end snapshot when one exists.
     """
-    year_month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    
+    try:
+        year_month = meeting_reports.parse_month(request.args.get('month') or meeting_reports.current_month())
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'month must be in YYYY-MM format'}), 400
+
     conn = db.get_connection()
-    cursor = conn.cursor()
+    try:
+        rows, source, captured_at = meeting_reports.strength_counts(conn, year_month)
+    finally:
+        conn.close()
 
-    # Define the boards to report on
-    target_boards = ['KPK Medical Faculty', 'PNC Board', 'KMU', 'Pharmacy Council']
-    
-    report_data = {}
-    overall_paid = 0
-    overall_free = 0
-    overall_total = 0
+    final_report = meeting_reports.build_report(rows, year_month)
+    final_report['source'] = source
+    final_report['captured_at'] = captured_at
+    return jsonify(final_report)
 
-    for board in target_boards:
-        board_data = {}
-        
-        # Get all semesters for the current board with student counts
-        cursor.execute(f"""
-            SELECT semester, student_type, COUNT(*) as count
-            FROM students
-            WHERE board = ? AND status = 'Active'
-            AND strftime('%Y-%m', created_at) <= ? -- Consider students enrolled up to or in the report month
-            GROUP BY semester, student_type
-            ORDER BY semester, student_type
-        """, (board, year_month))
-        
-        semester_results = cursor.fetchall()
-        
-        semesters_summary = {}
-        board_paid = 0
-        board_free = 0
-        board_total = 0
-
-        for row in semester_results:
-            semester_name = row['semester']
-            student_type = row['student_type']
-            count = row['count']
-
-            if semester_name not in semesters_summary:
-                semesters_summary[semester_name] = {'Paid': 0, 'Free': 0, 'Total': 0}
-            
-            semesters_summary[semester_name][student_type] = count
-            semesters_summary[semester_name]['Total'] += count
-            
-            if student_type == 'Paid':
-                board_paid += count
-            else:
-                board_free += count
-            board_total += count
-        
-        board_data['semesters'] = semesters_summary
-        board_data['board_summary'] = {
-            'Paid': board_paid,
-            'Free': board_free,
-            'Total': board_total
-        }
-        report_data[board] = board_data
+@app.route("/api/meeting_reports/monthly/snapshot", methods=['POST'])
+@login_required
+@admin_required
+def capture_monthly_meeting_snapshot():
+    """(Re)capture the strength snapshot for a month, e.g. from a month-end job."""
+    data = request.get_json(silent=True) or {}
+    try:
+        year_month = meeting_reports.parse_month(data.get('month') or meeting_reports.current_month())
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'month must be in YYYY-MM format'}), 400
 
-        overall_paid += board_paid
-        overall_free += board_free
-        overall_total += board_total
+    conn = db.get_connection()
+    try:
+        captured_at = meeting_reports.capture_snapshot(conn, year_month)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        conn.close()
+    return jsonify({'status': 'success', 'month': year_month, 'captured_at': captured_at})
 
-    conn.close()
+@app.route("/api/meeting_reports/monthly/compare", methods=['GET'])
+@login_required
+@admin_required
+def compare_monthly_meeting_reports():
+    """Compare student strength between two months (?base=YYYY-MM&target=YYYY-MM)."""
+    try:
+        base_month = meeting_reports.parse_month(request.args.get('base'))
+        target_month = meeting_reports.parse_month(request.args.get('target') or meeting_reports.current_month())
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'base and target must be in YYYY-MM format'}), 400
 
-    # Calculate overall percentages
-    overall_paid_percent = round((overall_paid / overall_total) * 100, 2) if overall_total > 0 else 0
-    overall_free_percent = round((overall_free / overall_total) * 100, 2) if overall_total > 0 else 0
-
-    final_report = {
-        'report_month': year_month,
-        'boards_data': report_data,
-        'overall_summary': {
-            'Total Paid Students': overall_paid,
-            'Total Free Students': overall_free,
-            'Grand Total Students': overall_total,
-            'Paid Percentage': overall_paid_percent,
-            'Free Percentage': overall_free_percent
-        }
-    }
+    conn = db.get_connection()
+    try:
+        base_rows, base_source, _ = meeting_reports.strength_counts(conn, base_month)
+        target_rows, target_source, _ = meeting_reports.strength_counts(conn, target_month)
+    finally:
+        conn.close()
 
-    return jsonify(final_report)
+    base_total = sum(row['student_count'] for row in base_rows)
+    target_total = sum(row['student_count'] for row in target_rows)
+    return jsonify({
+        'status': 'success',
+        'base': {'month': base_month, 'source': base_source, 'total': base_total},
+        'target': {'month': target_month, 'source': target_source, 'total': target_total},
+        'change': target_total - base_total,
+        'rows': meeting_reports.compare_months(base_rows, target_rows)
+    })
 
 # ==================== EMPLOYEE MANAGEMENT ENDPOINTS ====================
 
@@ -6671,45 +5716,39 @@ def get_employees_for_attendance():
         department_id = request.args.get('department_id', '')
         
         conn = get_connection()
-        cur = conn.cursor()
-        
-        # Build query
-        query = '''
-            SELECT e.id, e.name, e.campus, d.name as department_name, des.name as designation_name
-            FROM employees e
-            LEFT JOIN departments d ON e.department_id = d.id
-            LEFT JOIN designations des ON e.designation_id = des.id
-            WHERE e.status = 'Active'
-        '''
-        params = []
-        
-        if campus:
-            query += ' AND e.campus = ?'
-            params.append(campus)
-        if department_id:
-            query += ' AND e.department_id = ?'
-            params.append(department_id)
-        
-        query += ' ORDER BY e.name'
-        
-        employees = cur.execute(query, params).fetchall()
-        
-        # Get existing attendance for the date
-        existing_attendance = []
-        if date:
-            attendance_query = '''
-                SELECT employee_id, status
-                FROM employee_attendance
-                WHERE attendance_date = ?
-            '''
-            existing_attendance = cur.execute(attendance_query, (date,)).fetchall()
-        
+        # One joined read; split back into the two lists this endpoint has always returned
+        sheet = load_employee_attendance_sheet(conn, date, campus, department_id)
         conn.close()
         
+        employee_keys = ('id', 'name', 'campus', 'department_name', 'designation_name')
+        return jsonify({
+            'status': 'success',
+            'employees': [{key: row[key] for key in employee_keys} for row in sheet],
+            'existing_attendance': [
+                {'employee_id': row['id'], 'status': row['status']} for row in sheet if row['status'] is not None
+            ]
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/employee_attendance/sheet', methods=['GET'])
+@login_required
+@module_required('attendance')
+def get_employee_attendance_sheet():
+    """Employees for a date/campus/department joined with their attendance status for the day"""
+    try:
+        date = request.args.get('date') or datetime.now().strftime('%Y-%m-%d')
+        conn = get_connection()
+        sheet = load_employee_attendance_sheet(
+            conn, date, request.args.get('campus', ''), request.args.get('department_id', '')
+        )
+        lock_window = employee_attendance_locks.get(conn, date)
+        conn.close()
         return jsonify({
             'status': 'success',
-            'employees': [dict(row) for row in employees],
-            'existing_attendance': [dict(row) for row in existing_attendance]
+            'date': date,
+            'locked': bool(lock_window and lock_window.is_closed()),
+            'employees': sheet
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -6723,22 +5762,11 @@ def check_attendance_lock():
             return jsonify({'locked': False})
         
         conn = get_connection()
-        cur = conn.cursor()
-        
-        # Check if there's a lock record
-        lock_record = cur.execute(
-            'SELECT locked_at FROM employee_attendance_lock WHERE attendance_date = ?',
-            (date,)
-        ).fetchone()
-        
+        lock_window = employee_attendance_locks.get(conn, date)
         conn.close()
         
-        if lock_record:
-            locked_at = datetime.fromisoformat(lock_record['locked_at'])
-            # Check if 30 minutes have passed
-            time_diff = datetime.now() - locked_at
-            if time_diff.total_seconds() >= 1800:  # 30 minutes
-                return jsonify({'locked': True, 'locked_at': lock_record['locked_at']})
+        if lock_window and lock_window.is_closed():
+            return jsonify({'locked': True, 'locked_at': lock_window.locked_at})
         
         return jsonify({'locked': False})
     except Exception as e:
@@ -6749,7 +5777,6 @@ def create_employee_attendance():
     try:
         data = request.json
         conn = get_connection()
-        cur = conn.cursor()
         
         records = data.get('attendance_records', [])
         if not records:
@@ -6758,44 +5785,16 @@ def create_employee_attendance():
         attendance_date = records[0].get('attendance_date') if records else None
         
         # Check if already locked
-        if attendance_date:
-            lock_check = cur.execute(
-                'SELECT locked_at FROM employee_attendance_lock WHERE attendance_date = ?',
-                (attendance_date,)
-            ).fetchone()
-            
-            if lock_check:
-                locked_at = datetime.fromisoformat(lock_check['locked_at'])
-                time_diff = datetime.now() - locked_at
-                if time_diff.total_seconds() >= 1800:  # 30 minutes
-                    conn.close()
-                    return jsonify({'status': 'error', 'message': 'Attendance is locked for this date'}), 403
+        if attendance_date and employee_attendance_locks.is_closed(conn, attendance_date):
+            conn.close()
+            return jsonify({'status': 'error', 'message': 'Attendance is locked for this date'}), 403
         
-        # Insert/update attendance records
-        for record in records:
-            cur.execute('''
-                INSERT OR REPLACE INTO employee_attendance 
-                (employee_id, attendance_date, status, marked_at, marked_by)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                record.get('employee_id'),
-                record.get('attendance_date'),
-                record.get('status'),
-                datetime.now().isoformat(),
-                session.get('teacher_id', 1)
-            ))
+        # Insert/update attendance records in place (check-in/out times are kept)
+        upsert_employee_attendance(conn, records, session.get('teacher_id', 1))
         
         # Create or update lock record (lock starts from submission time)
         if attendance_date:
-            cur.execute('''
-                INSERT OR REPLACE INTO employee_attendance_lock
-                (attendance_date, locked_at, locked_by_teacher_id)
-                VALUES (?, ?, ?)
-            ''', (
-                attendance_date,
-                datetime.now().isoformat(),
-                session.get('teacher_id', 1)
-            ))
+            employee_attendance_locks.lock(conn, attendance_date, session.get('teacher_id', 1), replace=True)
         
         conn.commit()
         conn.close()
@@ -6896,9 +5895,6 @@ def get_salary_slips():
         month = request.args.get('month')
         year = request.args.get('year')
         
-        conn = get_connection()
-        cur = conn.cursor()
-        
         query = '''
             SELECT p.*, e.name as employee_name, e.father_name, e.cnic
             FROM payroll p
@@ -6929,6 +5925,12 @@ def get_salary_slips():
         
         query += ' ORDER BY e.name, p.year DESC, p.month DESC'
         
+        stream_format = requested_stream_format()
+        if stream_format:
+            return stream_rows(iter_query(query, params), stream_format, 'salary_slips')
+        
+        conn = get_connection()
+        cur = conn.cursor()
         cur.execute(query, params)
         salary_slips = [dict(row) for row in cur.fetchall()]
         conn.close()
@@ -7331,157 +6333,116 @@ def export_deductions_excel():
         year = request.args.get('year')
         campus = request.args.get('campus', '')
 
-        deductions = fetch_deductions_data(employee_id, employee_name, father_name, month, year, campus)
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Deductions Report"
-        
         headers = [
             'Employee ID', 'Employee Name', 'Father Name', 'Designation',
             'Department', 'Campus', 'Month', 'Year', 'Deduction Type',
             'Days Deducted', 'Deduction Amount', 'Salary Before Deduction',
             'Salary After Deduction', 'Remarks', 'Date of Entry'
         ]
-        ws.append(headers)
         
         month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June',
                        'July', 'August', 'September', 'October', 'November', 'December']
-        for ded in deductions:
-            month_name = month_names[ded['month']] if ded['month'] else ''
-            ws.append([
-                ded['employee_id'],
-                ded['employee_name'] or '',
-                ded['father_name'] or '',
-                ded['designation_name'] or '',
-                ded['department_name'] or '',
-                ded['campus'] or '',
-                month_name,
-                ded['year'] or '',
-                ded.get('deduction_type', 'Other'),
-                ded.get('days_deducted', 0),
-                ded['amount'] or 0,
-                ded.get('salary_before', 0),
-                ded.get('salary_after', 0),
-                ded.get('reason', '') or '',
-                ded.get('entry_date') or ''
-            ])
-        
-        # Save to buffer
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return send_file(buffer, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        as_attachment=True, download_name=f'deductions_report_{datetime.now().strftime("%Y%m%d")}.xlsx')
+
+        def sheet_rows():
+            for ded in iter_deductions_data(employee_id, employee_name, father_name, month, year, campus):
+                month_name = month_names[ded['month']] if ded['month'] else ''
+                yield [
+                    ded['employee_id'],
+                    ded['employee_name'] or '',
+                    ded['father_name'] or '',
+                    ded['designation_name'] or '',
+                    ded['department_name'] or '',
+                    ded['campus'] or '',
+                    month_name,
+                    ded['year'] or '',
+                    ded.get('deduction_type', 'Other'),
+                    ded.get('days_deducted', 0),
+                    ded['amount'] or 0,
+                    ded.get('salary_before', 0),
+                    ded.get('salary_after', 0),
+                    ded.get('reason', '') or '',
+                    ded.get('entry_date') or ''
+                ]
+        
+        return stream_xlsx(
+            sheet_rows(),
+            headers,
+            "Deductions Report",
+            f'deductions_report_{datetime.now().strftime("%Y%m%d")}.xlsx'
+        )
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def build_deductions_pdf(args, target, progress=None):
+    """Write the deductions register PDF to ``target`` and return its download name."""
+    deductions = fetch_deductions_data(
+        args.get('employee_id'),
+        args.get('employee_name'),
+        args.get('father_name'),
+        args.get('month'),
+        args.get('year'),
+        args.get('campus', '')
+    )
+
+    doc = report_document(target)
+    elements = [
+        Paragraph(INSTITUTE_NAME, PAYROLL_TITLE),
+        Spacer(1, 0.2*inch),
+        Paragraph('Deductions Report', SAMPLE_STYLES['Heading2']),
+        Spacer(1, 0.3*inch),
+    ]
+
+    # Table data
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June',
+                  'July', 'August', 'September', 'October', 'November', 'December']
+    
+    table_data = [['Emp ID', 'Employee Name', 'Department', 'Designation',
+                   'Campus', 'Month/Year', 'Type', 'Days', 'Amount',
+                   'Salary Before', 'Salary After', 'Remarks', 'Entry Date']]
+    
+    for ded in deductions:
+        month_name = month_names[ded['month']] if ded['month'] else ''
+        month_year = f"{month_name}/{ded['year']}" if month_name and ded['year'] else ''
+        table_data.append([
+            str(ded['employee_id'] or ''),
+            ded['employee_name'] or '',
+            ded['department_name'] or '',
+            ded['designation_name'] or '',
+            ded['campus'] or '',
+            month_year,
+            ded.get('deduction_type', 'Other') or 'Other',
+            str(ded.get('days_deducted', 0)),
+            f"{float(ded['amount'] or 0):.2f}",
+            f"{float(ded.get('salary_before', 0) or 0):.2f}",
+            f"{float(ded.get('salary_after', 0) or 0):.2f}",
+            ded.get('reason', '') or '',
+            ded.get('entry_date') or ''
+        ])
+    
+    # Create table
+    col_widths = [0.5*inch, 1.1*inch, 0.9*inch, 0.9*inch,
+                  0.8*inch, 0.8*inch, 0.7*inch, 0.4*inch,
+                  0.7*inch, 0.8*inch, 0.8*inch, 0.9*inch, 0.9*inch]
+    elements += chunked_table(table_data, col_widths, DEDUCTIONS_TABLE, doc=doc, preceding=elements)
+    elements += total_records_footer(len(deductions))
+
+    attach_progress(doc, progress)
+    doc.build(elements)
+    return f'deductions_report_{datetime.now().strftime("%Y%m%d")}.pdf'
+
+
 @app.route('/api/deductions/export_pdf', methods=['GET'])
 @admin_required
 def export_deductions_pdf():
     """Export deductions to PDF"""
     try:
-        employee_id = request.args.get('employee_id')
-        employee_name = request.args.get('employee_name')
-        father_name = request.args.get('father_name')
-        month = request.args.get('month')
-        year = request.args.get('year')
-        campus = request.args.get('campus', '')
-        
-        deductions = fetch_deductions_data(employee_id, employee_name, father_name, month, year, campus)
-        
-        # Generate PDF
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4,
-                                rightMargin=0.5*inch, leftMargin=0.5*inch,
-                                topMargin=0.75*inch, bottomMargin=0.75*inch)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Institute Title
-        title_style = ParagraphStyle(
-            'InstituteTitle',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=colors.HexColor('#00721c'),
-            alignment=1,  # Center
-            fontName='Helvetica-Bold',
-            spaceAfter=20
-        )
-        elements.append(Paragraph('GHAZALI INSTITUTE OF MEDICAL SCIENCES', title_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Report Title
-        report_title = Paragraph('Deductions Report', styles['Heading2'])
-        elements.append(report_title)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Table data
-        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June',
-                      'July', 'August', 'September', 'October', 'November', 'December']
-        
-        table_data = [['Emp ID', 'Employee Name', 'Department', 'Designation',
-                       'Campus', 'Month/Year', 'Type', 'Days', 'Amount',
-                       'Salary Before', 'Salary After', 'Remarks', 'Entry Date']]
-        
-        for ded in deductions:
-            month_name = month_names[ded['month']] if ded['month'] else ''
-            month_year = f"{month_name}/{ded['year']}" if month_name and ded['year'] else ''
-            table_data.append([
-                str(ded['employee_id'] or ''),
-                ded['employee_name'] or '',
-                ded['department_name'] or '',
-                ded['designation_name'] or '',
-                ded['campus'] or '',
-                month_year,
-                ded.get('deduction_type', 'Other') or 'Other',
-                str(ded.get('days_deducted', 0)),
-                f"{float(ded['amount'] or 0):.2f}",
-                f"{float(ded.get('salary_before', 0) or 0):.2f}",
-                f"{float(ded.get('salary_after', 0) or 0):.2f}",
-                ded.get('reason', '') or '',
-                ded.get('entry_date') or ''
-            ])
-        
-        # Create table
-        table = Table(table_data, colWidths=[0.5*inch, 1.1*inch, 0.9*inch, 0.9*inch,
-                                            0.8*inch, 0.8*inch, 0.7*inch, 0.4*inch,
-                                            0.7*inch, 0.8*inch, 0.8*inch, 0.9*inch, 0.9*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#00721c')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Footer
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#999999'),
-            alignment=2
-        )
-        elements.append(Paragraph(f"Total Records: {len(deductions)}", footer_style))
-        
-        doc.build(elements)
+        download_name = build_deductions_pdf(request.args, buffer)
         buffer.seek(0)
-        
+
         return send_file(buffer, mimetype='application/pdf',
                         as_attachment=True,
-                        download_name=f'deductions_report_{datetime.now().strftime("%Y%m%d")}.pdf')
+                        download_name=download_name)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -8218,7 +7179,7 @@ def get_students_for_cards():
         conn = get_connection()
         cur = conn.cursor()
 
-        query = 'SELECT id, admission_no, name, father_name, address, dob, cnic, phone, technology, semester, campus, board, status, photo_path FROM students WHERE 1=1'
+        query = 'SELECT id, admission_no, name, father_name, address, dob, phone, technology, semester, campus, board, status, photo_path FROM students WHERE 1=1'
         params = []
 
         if campus:
@@ -8242,6 +7203,8 @@ def get_students_for_cards():
         cur.execute(query, params)
         students = [dict(row) for row in cur.fetchall()]
         conn.close()
+        for student in students:
+            student['thumbnail_url'] = url_for('get_card_photo', card_type='students', record_id=student['id']) if student['photo_path'] else None
 
         return jsonify({'status': 'success', 'data': students})
     except Exception as e:
@@ -8289,11 +7252,29 @@ def get_employees_for_cards():
         cur.execute(query, params)
         employees = [dict(row) for row in cur.fetchall()]
         conn.close()
+        for employee in employees:
+            employee['thumbnail_url'] = url_for('get_card_photo', card_type='employees', record_id=employee['id']) if employee['photo_path'] else None
 
         return jsonify({'status': 'success', 'data': employees})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+card_thumbnails = ThumbnailCache(app.root_path, os.path.join(app.root_path, ID_CARD_THUMBNAIL_DIR))
+
+@app.route('/api/card_generator/photo/<card_type>/<int:record_id>', methods=['GET'])
+@admin_required
+def get_card_photo(card_type, record_id):
+    """Serve the cached card-sized thumbnail of a student or employee photo"""
+    if card_type not in CARD_TITLES:
+        return jsonify({'status': 'error', 'message': 'Invalid card type'}), 400
+    conn = get_connection()
+    row = conn.execute(f'SELECT photo_path FROM {card_type} WHERE id = ?', (record_id,)).fetchone()
+    conn.close()
+    thumbnail = card_thumbnails.thumbnail(row['photo_path']) if row else None
+    if not thumbnail:
+        return jsonify({'status': 'error', 'message': 'Photo not found'}), 404
+    return send_file(thumbnail, mimetype='image/jpeg', max_age=3600)
+
 @app.route('/api/card_generator/export_pdf', methods=['POST'])
 @admin_required
 def export_cards_to_pdf():
@@ -8306,6 +7287,9 @@ def export_cards_to_pdf():
         if not ids:
             return jsonify({'status': 'error', 'message': 'No cards selected'}), 400
 
+        if card_type not in CARD_TITLES:
+            return jsonify({'status': 'error', 'message': 'Invalid card type'}), 400
+
         conn = get_connection()
         cur = conn.cursor()
 
@@ -8326,28 +7310,12 @@ def export_cards_to_pdf():
 
         conn.close()
 
-        # Generate PDF using ReportLab
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, 
-                                rightMargin=0.5*inch, leftMargin=0.5*inch,
-                                topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Create cards (5 per page)
-        cards_per_page = 5
-        for i in range(0, len(records), cards_per_page):
-            page_records = records[i:i+cards_per_page]
-            # TODO: Create card layout using ReportLab Table/Paragraph
-            # For now, return a simple PDF
-            for record in page_records:
-                name = record.get('name', 'N/A')
-                p = Paragraph(f"<b>{name}</b>", styles['Normal'])
-                elements.append(p)
-                elements.append(Spacer(1, 0.2*inch))
+        # Keep the order the cards were selected in
+        position = {str(record_id): index for index, record_id in enumerate(ids)}
+        records.sort(key=lambda record: position.get(str(record['id']), len(ids)))
 
-        doc.build(elements)
+        buffer = io.BytesIO()
+        render_cards_pdf(records, card_type, buffer, card_thumbnails)
         buffer.seek(0)
 
         return send_file(buffer, mimetype='application/pdf', 
@@ -8461,11 +7429,16 @@ def student_login():
         if not username or not password:
             return jsonify({'status': 'error', 'message': 'Username and password required'}), 400
         
+        account_key, throttle_error = throttle_credential_attempt('student', username)
+        if throttle_error:
+            return jsonify({'status': 'error', 'message': throttle_error}), 429
+        
         conn = get_connection()
-        student = conn.execute('SELECT * FROM students WHERE username = ?', (username,)).fetchone()
+        student = lookup_account(conn, 'student', username)
         
         if not student:
             conn.close()
+            credential_rate_limiter.record_failure(account_key)
             return jsonify({'status': 'error', 'message': 'Invalid credentials'}), 401
         
         student_dict = dict(student)
@@ -8476,9 +7449,13 @@ def student_login():
             return jsonify({'status': 'error', 'message': 'Account is deactivated. Please contact administrator.'}), 403
         
         # Check password
-        if not student_dict.get('password_hash') or not check_password_hash(student_dict['password_hash'], password):
+        password_ok, upgraded_hash = verify_and_upgrade(password, student_dict.get('password_hash'))
+        if not password_ok:
             conn.close()
+            credential_rate_limiter.record_failure(account_key)
             return jsonify({'status': 'error', 'message': 'Invalid credentials'}), 401
+        upgrade_stored_hash(conn, 'student', student_dict['id'], upgraded_hash)
+        credential_rate_limiter.record_success(account_key, ip=request.remote_addr)
         
         # Update last login
         from datetime import datetime
@@ -9602,38 +8579,35 @@ def get_exam_results(exam_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route("/api/exams/<int:exam_id>/results/export_pdf", methods=['GET'])
-@login_required
-def export_exam_results_pdf(exam_id):
-    """Generate a PDF report for an exam's results."""
-    campus = request.args.get('campus', '').strip()
-    technology = request.args.get('technology', '').strip()
-    role = session.get('role')
-    teacher_id = session.get('teacher_id')
+def check_exam_export_access(conn, exam_id):
+    """Return ``(exam, error_response)`` for exporting an exam's results."""
+    exam = conn.execute('SELECT exam_id, title, subject, created_by FROM midterm_exams WHERE exam_id = ?', (exam_id,)).fetchone()
+    if not exam:
+        return None, (jsonify({'status': 'error', 'message': 'Exam not found'}), 404)
+    if session.get('role') == 'teacher' and exam['created_by'] != session.get('teacher_id'):
+        return None, (jsonify({'status': 'error', 'message': 'Unauthorized'}), 403)
+    return exam, None
+
+def build_exam_results_pdf(args, target, progress=None):
+    """Write an exam's results PDF to ``target`` and return its download name."""
+    exam_id = int(args.get('exam_id'))
+    campus = (args.get('campus') or '').strip()
+    technology = (args.get('technology') or '').strip()
 
     conn = get_connection()
     try:
         cur = conn.cursor()
-        exam = cur.execute('SELECT exam_id, title, subject, created_by FROM midterm_exams WHERE exam_id = ?', (exam_id,)).fetchone()
+        exam = cur.execute('SELECT exam_id, title, subject FROM midterm_exams WHERE exam_id = ?', (exam_id,)).fetchone()
         if not exam:
-            return jsonify({'status': 'error', 'message': 'Exam not found'}), 404
-        if role == 'teacher' and exam['created_by'] != teacher_id:
-            return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
-
+            raise ValueError('Exam not found')
         results = fetch_exam_results_rows(cur, exam_id, campus or None, technology or None)
         generated_at = datetime.now().strftime('%Y-%m-%d %H:%M')
 
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), leftMargin=30, rightMargin=30, topMargin=25, bottomMargin=25)
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle('ExamReportTitle', parent=styles['Title'], alignment=1, fontSize=18, textColor=colors.HexColor('#0a7b35'), spaceAfter=6)
-        subtitle_style = ParagraphStyle('ExamReportSubtitle', parent=styles['Heading2'], alignment=1, fontSize=12, textColor=colors.HexColor('#111111'), spaceAfter=14)
-        meta_style = ParagraphStyle('ExamReportMeta', parent=styles['Normal'], alignment=1, fontSize=9, textColor=colors.HexColor('#555555'), spaceAfter=12)
-
+        doc = SimpleDocTemplate(target, pagesize=landscape(A4), leftMargin=30, rightMargin=30, topMargin=25, bottomMargin=25)
         elements = [
-            Paragraph('GHAZALI INSTITUTE OF MEDICAL SCIENCES', title_style),
-            Paragraph(f'Exam Report — {exam["title"] or exam["subject"] or "Exam"}', subtitle_style),
-            Paragraph(f'Generated: {generated_at}', meta_style)
+            Paragraph(INSTITUTE_NAME, EXAM_TITLE),
+            Paragraph(f'Exam Report — {exam["title"] or exam["subject"] or "Exam"}', EXAM_SUBTITLE),
+            Paragraph(f'Generated: {generated_at}', EXAM_META)
         ]
 
         filters_text = []
@@ -9642,13 +8616,7 @@ def export_exam_results_pdf(exam_id):
         if technology:
             filters_text.append(f'Technology: {technology}')
         if filters_text:
-            elements.append(Paragraph('Filters — ' + ', '.join(filters_text), ParagraphStyle(
-                'ExamReportFilters',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.HexColor('#666666'),
-                spaceAfter=10
-            )))
+            elements.append(Paragraph('Filters — ' + ', '.join(filters_text), EXAM_FILTERS))
 
         total_students = len(results)
         pass_count = sum(1 for row in results if (row.get('grade') or '').upper() != 'F')
@@ -9664,15 +8632,7 @@ def export_exam_results_pdf(exam_id):
             ['Average %', f'{avg_percentage:.2f}%']
         ]
         summary_table = Table(summary_data, colWidths=[1.2 * inch, 1.0 * inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0c2d48')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
-        ]))
+        summary_table.setStyle(EXAM_SUMMARY_TABLE)
         elements.append(summary_table)
         elements.append(Spacer(1, 0.2 * inch))
 
@@ -9693,25 +8653,35 @@ def export_exam_results_pdf(exam_id):
                 row.get('grade') or ''
             ])
 
-        results_table = Table(table_data, repeatRows=1, colWidths=[0.4*inch, 1*inch, 1.6*inch, 1*inch, 1.2*inch, 0.9*inch, 0.9*inch, 0.7*inch, 0.7*inch])
-        results_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0c2d48')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (5, 1), (8, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f6f7fb')]),
-            ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#d7dce6')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-        ]))
-        elements.append(results_table)
+        col_widths = [0.4*inch, 1*inch, 1.6*inch, 1*inch, 1.2*inch, 0.9*inch, 0.9*inch, 0.7*inch, 0.7*inch]
+        elements += chunked_table(table_data, col_widths, EXAM_RESULTS_TABLE, doc=doc, preceding=elements)
 
+        attach_progress(doc, progress)
         doc.build(elements)
-        buffer.seek(0)
+        return f'exam_report_{exam_id}.pdf'
+    finally:
+        conn.close()
+
+@app.route("/api/exams/<int:exam_id>/results/export_pdf", methods=['GET'])
+@login_required
+def export_exam_results_pdf(exam_id):
+    """Generate a PDF report for an exam's results."""
+    conn = get_connection()
+    try:
+        _, error = check_exam_export_access(conn, exam_id)
+    finally:
+        conn.close()
+    if error:
+        return error
 
-        filename = f'exam_report_{exam_id}.pdf'
+    try:
+        buffer = io.BytesIO()
+        filename = build_exam_results_pdf({
+            'exam_id': exam_id,
+            'campus': request.args.get('campus', ''),
+            'technology': request.args.get('technology', ''),
+        }, buffer)
+        buffer.seek(0)
         return send_file(
             buffer,
             mimetype='application/pdf',
@@ -9720,8 +8690,6 @@ def export_exam_results_pdf(exam_id):
         )
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-    finally:
-        conn.close()
 
 @app.route("/api/exams/<int:exam_id>/publish", methods=['POST'])
 @login_required
@@ -10457,7 +9425,7 @@ def api_generate_student_accounts():
                 username = student_dict['admission_no']
                 # Default password is technology name
                 default_password = student_dict.get('technology', 'student123')
-                password_hash = generate_password_hash(default_password)
+                password_hash = hash_password(default_password)
                 
                 cur.execute('''
                     UPDATE students 
@@ -10498,7 +9466,7 @@ def api_reset_student_password(student_id):
             conn.close()
             return jsonify({'status': 'error', 'message': 'Student not found'}), 404
         
-        password_hash = generate_password_hash(new_password)
+        password_hash = hash_password(new_password)
         conn.execute('UPDATE students SET password_hash = ? WHERE id = ?', (password_hash, student_id))
         conn.commit()
         conn.close()
@@ -10570,7 +9538,7 @@ def api_edit_student_account(student_id):
         
         # Update password if provided
         if new_password:
-            password_hash = generate_password_hash(new_password)
+            password_hash = hash_password(new_password)
             conn.execute('UPDATE students SET password_hash = ? WHERE id = ?', (password_hash, student_id))
             
             # Log activity
@@ -10620,7 +9588,7 @@ def api_create_student_account(student_id):
         # Generate username (admission number) and password (technology name)
         username = student_dict['admission_no']
         default_password = student_dict.get('technology', 'student123')
-        password_hash = generate_password_hash(default_password)
+        password_hash = hash_password(default_password)
         
         conn.execute('''
             UPDATE students 
@@ -10702,6 +9670,10 @@ def api_student_change_password():
             return jsonify({'status': 'error', 'message': 'Current and new password required'}), 400
         
         student_id = session.get('student_id')
+        account_key, throttle_error = throttle_credential_attempt('student_id', student_id)
+        if throttle_error:
+            return jsonify({'status': 'error', 'message': throttle_error}), 429
+        
         conn = get_connection()
         student = conn.execute('SELECT password_hash FROM students WHERE id = ?', (student_id,)).fetchone()
         
@@ -10710,12 +9682,13 @@ def api_student_change_password():
             return jsonify({'status': 'error', 'message': 'Student not found'}), 404
         
         # Verify current password
-        if not check_password_hash(student['password_hash'], current_password):
+        if not verify_password(current_password, student['password_hash']):
             conn.close()
+            credential_rate_limiter.record_failure(account_key)
             return jsonify({'status': 'error', 'message': 'Current password is incorrect'}), 401
         
         # Update password
-        new_password_hash = generate_password_hash(new_password)
+        new_password_hash = hash_password(new_password)
         conn.execute('UPDATE students SET password_hash = ? WHERE id = ?', (new_password_hash, student_id))
         
         # Log activity
@@ -10735,7 +9708,224 @@ def api_student_change_password():
 
 # ==================== END MIDTERM & TESTS MODULE API ROUTES ====================
 
+# ==================== SCHEDULED JOBS ====================
+
+# Never started on import: the debug reloader's parent process, spawned
+# certificate workers (which re-import this module) and scripts importing
+# main would each run their own copy.
+sms_dispatcher = sms.SmsDispatcher(sms.build_gateway(app.root_path))
+_background_jobs_started = False
+_background_jobs_lock = threading.Lock()
+
+
+def start_background_jobs():
+    """Start the nightly schedulers and SMS dispatcher once in this process (no-op when disabled)."""
+    global _background_jobs_started
+    with _background_jobs_lock:
+        if _background_jobs_started or not BACKGROUND_JOBS_ENABLED:
+            return
+        _background_jobs_started = True
+    low_attendance.nightly_refresh.start()
+    meeting_reports.month_end_snapshot.start()
+    sms_dispatcher.start()
+
+
+@app.before_request
+def ensure_background_jobs():
+    # `flask run` and WSGI servers never call main(); the first request
+    # starts the jobs in whichever process actually serves
+    if not _background_jobs_started:
+        start_background_jobs()
+
+# ==================== BACKGROUND EXPORT JOBS ====================
+
+export_jobs = ExportJobQueue(
+    os.path.join(app.root_path, EXPORT_JOB_DIR),
+    max_workers=EXPORT_JOB_WORKERS,
+    ttl_seconds=EXPORT_JOB_TTL_SECONDS
+)
+export_jobs.register(
+    'export_report1_pdf',
+    lambda params, target, progress: build_report_pdf(REPORT1, params, target, progress),
+    tables=('students',)
+)
+export_jobs.register(
+    'export_report2_pdf',
+    lambda params, target, progress: build_report_pdf(REPORT2, params, target, progress),
+    tables=('students',)
+)
+export_jobs.register(
+    'export_report3_pdf',
+    lambda params, target, progress: build_report_pdf(REPORT3, params, target, progress),
+    tables=('students',)
+)
+export_jobs.register('export_monthly_attendance_pdf', build_monthly_attendance_pdf, tables=('students', 'attendance'))
+export_jobs.register(
+    'export_deductions_pdf',
+    build_deductions_pdf,
+    tables=('employee_deductions', 'employees', 'departments', 'designations', 'payroll')
+)
+export_jobs.register('export_exam_results_pdf', build_exam_results_pdf, tables=('midterm_exams', 'midterm_results', 'students'))
+export_jobs.register('certificates_pdf', build_certificate_batch_pdf, tables=('students',))
+export_jobs.register(
+    'certificates_zip',
+    build_certificate_batch_zip,
+    tables=('students',),
+    mimetype=ZIP_MIMETYPE,
+    extension='zip'
+)
+
+# Module guards matching the ROUTE_PERMISSION_RULES of the synchronous export routes
+EXPORT_JOB_MODULES = {
+    'export_report1_pdf': 'reports',
+    'export_report2_pdf': 'reports',
+    'export_report3_pdf': 'reports',
+    'export_monthly_attendance_pdf': 'attendance',
+    'export_deductions_pdf': 'payroll',
+    'certificates_pdf': 'documents',
+    'certificates_zip': 'documents',
+}
+
+
+def export_job_access_error(kind, params):
+    """Apply the same access checks as the synchronous export route for ``kind``."""
+    module_key = EXPORT_JOB_MODULES.get(kind)
+    if module_key and not user_has_module(module_key):
+        return forbidden_response(module_key)
+    if kind == 'export_deductions_pdf' and not user_is_admin():
+        return jsonify({'status': 'error', 'message': 'Unauthorized. Admin privileges required.'}), 403
+    if kind in ('certificates_pdf', 'certificates_zip') and params.get('certificate_type') not in CERTIFICATE_TYPES:
+        return jsonify({'status': 'error', 'message': 'Invalid certificate type'}), 400
+    if kind == 'export_exam_results_pdf':
+        try:
+            exam_id = int(params.get('exam_id'))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'exam_id is required'}), 400
+        conn = get_connection()
+        try:
+            _, error = check_exam_export_access(conn, exam_id)
+        finally:
+            conn.close()
+        return error
+    return None
+
+
+def export_job_payload(job, cached=False):
+    payload = job.as_dict()
+    payload['cached'] = cached
+    payload['status_url'] = url_for('get_export_job', job_id=job.id)
+    payload['download_url'] = url_for('download_export_job', job_id=job.id) if job.status == EXPORT_JOB_DONE else None
+    return payload
+
+
+@app.route('/api/export_jobs', methods=['POST'])
+@login_required
+def submit_export_job():
+    """Queue a PDF export; identical requests on unchanged data reuse the finished file."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get('export') or ''
+    if export_jobs.kind(kind) is None:
+        return jsonify({'status': 'error', 'message': f'Unknown export: {kind}'}), 400
+
+    raw_params = data.get('params') or {}
+    if not isinstance(raw_params, dict):
+        return jsonify({'status': 'error', 'message': 'params must be an object'}), 400
+    # Empty filters behave like missing ones, so drop them to keep cache keys canonical
+    params = {key: str(value).strip() for key, value in raw_params.items() if value not in (None, '')}
+    if kind == 'export_monthly_attendance_pdf':
+        params.setdefault('month', datetime.now().strftime('%Y-%m'))
+
+    error = export_job_access_error(kind, params)
+    if error:
+        return error
+
+    try:
+        job, cached = export_jobs.submit(kind, params)
+    except Exception as e:
+        print(f"Error submitting export job: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    export_meta = EXPORT_ENDPOINT_LOGS.get(kind)
+    if export_meta and session.get('auth_system') == 'rbac' and session.get('user_id'):
+        log_user_action('export', module_key=export_meta[0], description=export_meta[1])
+
+    return jsonify({'status': 'success', 'job': export_job_payload(job, cached)}), 200 if cached else 202
+
+
+@app.route('/api/export_jobs/<job_id>', methods=['GET'])
+@login_required
+def get_export_job(job_id):
+    """Report an export job's status and progress."""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Export job not found'}), 404
+    error = export_job_access_error(job.kind, job.params)
+    if error:
+        return error
+    return jsonify({'status': 'success', 'job': export_job_payload(job)})
+
+
+@app.route('/api/export_jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_export_job(job_id):
+    """Send the rendered file of a finished export job."""
+    job = export_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Export job not found'}), 404
+    error = export_job_access_error(job.kind, job.params)
+    if error:
+        return error
+    if job.status != EXPORT_JOB_DONE:
+        return jsonify({'status': 'error', 'message': f'Export job is {job.status}', 'job': export_job_payload(job)}), 409
+    return send_file(
+        export_jobs.file_path(job),
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.filename
+    )
+
+
+@app.route('/api/certificates/batch', methods=['POST'])
+@login_required
+def submit_certificate_batch():
+    """Queue certificates for every student matching campus/board/technology/semester/status.
+
+    ``output`` is 'pdf' (one merged document) or 'zip' (one PDF per student);
+    progress and the download are served by the export job endpoints.
+    """
+    data = request.get_json(silent=True) or {}
+    output = (data.get('output') or 'pdf').lower()
+    if output not in ('pdf', 'zip'):
+        return jsonify({'status': 'error', 'message': "output must be 'pdf' or 'zip'"}), 400
+    kind = f'certificates_{output}'
+    params = {
+        key: str(data[key]).strip()
+        for key in ('certificate_type', 'campus', 'board', 'technology', 'semester', 'status', 'reference_prefix')
+        if data.get(key) not in (None, '')
+    }
+
+    error = export_job_access_error(kind, params)
+    if error:
+        return error
+
+    try:
+        job, cached = export_jobs.submit(kind, params)
+    except Exception as e:
+        print(f"Error submitting certificate batch: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    export_meta = EXPORT_ENDPOINT_LOGS.get(kind)
+    if session.get('auth_system') == 'rbac' and session.get('user_id'):
+        log_user_action('export', module_key=export_meta[0], description=export_meta[1])
+
+    return jsonify({'status': 'success', 'job': export_job_payload(job, cached)}), 200 if cached else 202
+
+
 def main():
+    # Under the debug reloader only the child process (WERKZEUG_RUN_MAIN)
+    # serves requests; the watching parent must not start the jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_jobs()
     app.run(port=int(os.environ.get('PORT', 8080)), debug=True)
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+# meeting_reports.py
+"""Monthly meeting report of student strength.
+
+Strength is the number of active students per board, semester and student
+type (Paid/Free), counting students created up to the end of the report
+month. It is computed with one grouped query using a plain range predicate
+on ``created_at`` (so the index on ``students`` can be used). Reading a
+report never writes:
+
+* the current month is always computed live;
+* past months are read back from their snapshot in
+  ``student_strength_snapshots``, which keeps historical reports instant and
+  stable even after students change status;
+* past months without a snapshot fall back to a live computation, which is
+  only an approximation because it uses today's statuses.
+
+Snapshots are taken by ``month_end_snapshot``, whose first run in a new month
+captures the month that just closed. ``capture_snapshot`` can also be called
+explicitly through ``POST /api/meeting_reports/monthly/snapshot``.
+"""
+
+from datetime import date, datetime, timedelta
+
+from config import MEETING_REPORT_SNAPSHOT_HOUR
+from db import get_connection
+from scheduler import NightlyScheduler
+
+MEETING_REPORT_BOARDS = ('KPK Medical Faculty', 'PNC Board', 'KMU', 'Pharmacy Council')
+
+SOURCE_LIVE = 'live'
+SOURCE_SNAPSHOT = 'snapshot'
+
+
+def parse_month(value):
+    """Return the normalized 'YYYY-MM' for ``value`` or raise ValueError."""
+    return datetime.strptime((value or '').strip(), '%Y-%m').strftime('%Y-%m')
+
+
+def current_month():
+    return datetime.now().strftime('%Y-%m')
+
+
+def _next_month_start(year_month):
+    year, month = map(int, year_month.split('-'))
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return date(year, month, 1).isoformat()
+
+
+_STRENGTH_SELECT = f"""
+    SELECT board, semester, student_type, COUNT(*) AS student_count
+    FROM students
+    WHERE status = 'Active'
+      AND created_at < ?
+      AND board IN ({', '.join('?' for _ in MEETING_REPORT_BOARDS)})
+    GROUP BY board, semester, student_type
+"""
+
+
+def _strength_params(year_month):
+    # created_at holds ISO dates, so "before the first day of next month"
+    # matches strftime('%Y-%m', created_at) <= year_month
+    return (_next_month_start(year_month), *MEETING_REPORT_BOARDS)
+
+
+def live_counts(conn, year_month):
+    """Current strength as of ``year_month`` from one grouped query."""
+    return conn.execute(
+        _STRENGTH_SELECT + " ORDER BY board, semester, student_type",
+        _strength_params(year_month)
+    ).fetchall()
+
+
+def snapshot_counts(conn, year_month):
+    rows = conn.execute('''
+        SELECT board, semester, student_type, student_count, captured_at
+        FROM student_strength_snapshots
+        WHERE month = ?
+        ORDER BY board, semester, student_type
+    ''', (year_month,)).fetchall()
+    return rows or None
+
+
+def capture_snapshot(conn, year_month):
+    """Replace the stored strength for ``year_month`` with a fresh capture (caller commits)."""
+    captured_at = datetime.now().isoformat(timespec='seconds')
+    conn.execute('DELETE FROM student_strength_snapshots WHERE month = ?', (year_month,))
+    conn.execute(
+        f"""
+        INSERT INTO student_strength_snapshots (month, board, semester, student_type, student_count, captured_at)
+        SELECT ?, board, semester, student_type, student_count, ? FROM ({_STRENGTH_SELECT})
+        """,
+        (year_month, captured_at, *_strength_params(year_month))
+    )
+    return captured_at
+
+
+def capture_closing_month(conn, today=None):
+    """Snapshot the month before ``today``'s unless it was already captured after it ended (caller commits).
+
+    Returns the captured month, or None when there was nothing to do.
+    """
+    month_start = (today or date.today()).replace(day=1)
+    closing_month = (month_start - timedelta(days=1)).strftime('%Y-%m')
+    last_capture = conn.execute(
+        'SELECT MAX(captured_at) FROM student_strength_snapshots WHERE month = ?', (closing_month,)
+    ).fetchone()[0]
+    if last_capture and last_capture >= month_start.isoformat():
+        return None
+    capture_snapshot(conn, closing_month)
+    return closing_month
+
+
+def strength_counts(conn, year_month):
+    """Return ``(rows, source, captured_at)`` for the report month (read-only)."""
+    if year_month < current_month():
+        rows = snapshot_counts(conn, year_month)
+        if rows:
+            return rows, SOURCE_SNAPSHOT, rows[0]['captured_at']
+    return live_counts(conn, year_month), SOURCE_LIVE, None
+
+
+def _percent(part, total):
+    return round((part / total) * 100, 2) if total > 0 else 0
+
+
+def build_report(rows, year_month):
+    """Shape grouped rows into the meeting report payload."""
+    report_data = {
+        board: {'semesters': {}, 'board_summary': {'Paid': 0, 'Free': 0, 'Total': 0}}
+        for board in MEETING_REPORT_BOARDS
+    }
+    for row in rows:
+        board_data = report_data[row['board']]
+        semester = board_data['semesters'].setdefault(row['semester'], {'Paid': 0, 'Free': 0, 'Total': 0})
+        count = row['student_count']
+        semester[row['student_type']] = count
+        semester['Total'] += count
+        summary = board_data['board_summary']
+        summary['Paid' if row['student_type'] == 'Paid' else 'Free'] += count
+        summary['Total'] += count
+
+    overall_paid = sum(data['board_summary']['Paid'] for data in report_data.values())
+    overall_free = sum(data['board_summary']['Free'] for data in report_data.values())
+    overall_total = overall_paid + overall_free
+    return {
+        'report_month': year_month,
+        'boards_data': report_data,
+        'overall_summary': {
+            'Total Paid Students': overall_paid,
+            'Total Free Students': overall_free,
+            'Grand Total Students': overall_total,
+            'Paid Percentage': _percent(overall_paid, overall_total),
+            'Free Percentage': _percent(overall_free, overall_total)
+        }
+    }
+
+
+def compare_months(base_rows, target_rows):
+    """Per board/semester/type counts for two months and the change between them."""
+    keyed = {}
+    for position, rows in enumerate((base_rows, target_rows)):
+        for row in rows:
+            key = (row['board'], row['semester'], row['student_type'])
+            keyed.setdefault(key, [0, 0])[position] += row['student_count']
+    changes = []
+    for (board, semester, student_type), (base, target) in sorted(
+        keyed.items(), key=lambda item: tuple((value is not None, value) for value in item[0])
+    ):
+        changes.append({
+            'board': board,
+            'semester': semester,
+            'student_type': student_type,
+            'base': base,
+            'target': target,
+            'change': target - base
+        })
+    return changes
+
+
+def _nightly_task():
+    conn = get_connection()
+    try:
+        with conn:
+            closing_month = capture_closing_month(conn)
+    finally:
+        conn.close()
+    if closing_month:
+        print(f"Captured month-end student strength for {closing_month}")
+
+
+month_end_snapshot = NightlyScheduler('meeting-strength-snapshot', MEETING_REPORT_SNAPSHOT_HOUR, _nightly_task)
@@ -0,0 +1,295 @@
+# metrics.py
+"""Per-endpoint request metrics.
+
+When ``METRICS_ENABLED`` is set, every request records its latency into a
+fixed-bucket histogram, together with the number of SQLite statements it ran,
+the time spent executing them and the response size. Streamed responses are
+recorded when the server closes their body, so the work done while streaming
+is included. Statement accounting is fed by the connection hooks installed in
+``db.get_connection``. When metrics
+are disabled no hooks are registered and connections are left untouched.
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from config import METRICS_ENABLED
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_request_state = threading.local()
+
+
+class LatencyHistogram:
+    """Per-bucket latency counts with percentile estimation."""
+
+    __slots__ = ('counts', 'count', 'total_ms', 'max_ms')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def percentile(self, fraction):
+        """Estimate a percentile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= target and bucket_count:
+                lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0.0
+                upper = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+                upper = min(upper, self.max_ms)
+                position = (target - seen) / bucket_count
+                return round(lower + (upper - lower) * position, 3)
+            seen += bucket_count
+        return round(self.max_ms, 3)
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'errors', 'latency', 'sql_statements', 'sql_seconds',
+                 'response_bytes', 'max_response_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+
+    def as_dict(self):
+        count = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency_ms': {
+                'p50': self.latency.percentile(0.50),
+                'p95': self.latency.percentile(0.95),
+                'p99': self.latency.percentile(0.99),
+                'mean': round(self.latency.total_ms / count, 3),
+                'max': round(self.latency.max_ms, 3),
+            },
+            'sql_statements': self.sql_statements,
+            'sql_statements_per_request': round(self.sql_statements / count, 2),
+            'sql_seconds': round(self.sql_seconds, 6),
+            'response_bytes': self.response_bytes,
+            'mean_response_bytes': round(self.response_bytes / count, 1),
+            'max_response_bytes': self.max_response_bytes,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.started_at = time.time()
+
+    def record(self, endpoint, status_code, elapsed_ms, sql_statements, sql_seconds, response_bytes):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.requests += 1
+            if status_code >= 500:
+                stats.errors += 1
+            stats.latency.observe(elapsed_ms)
+            stats.sql_statements += sql_statements
+            stats.sql_seconds += sql_seconds
+            stats.response_bytes += response_bytes
+            if response_bytes > stats.max_response_bytes:
+                stats.max_response_bytes = response_bytes
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started_at = time.time()
+
+    def snapshot(self, sort_by='p95'):
+        with self._lock:
+            endpoints = {name: stats.as_dict() for name, stats in self._endpoints.items()}
+        if sort_by in ('p50', 'p95', 'p99', 'mean', 'max'):
+            key = lambda item: item[1]['latency_ms'][sort_by]
+        else:
+            key = lambda item: item[1].get(sort_by) or 0
+        ordered = sorted(endpoints.items(), key=key, reverse=True)
+        return {
+            'since': self.started_at,
+            'endpoints': [dict(endpoint=name, **data) for name, data in ordered],
+        }
+
+    def render_prometheus(self):
+        """Render the registry in the Prometheus text exposition format."""
+        with self._lock:
+            items = [(name, stats) for name, stats in sorted(self._endpoints.items())]
+            lines = [
+                '# HELP gims_request_duration_ms Request latency per endpoint.',
+                '# TYPE gims_request_duration_ms histogram',
+            ]
+            for name, stats in items:
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS_MS, stats.latency.counts):
+                    cumulative += bucket_count
+                    lines.append(f'gims_request_duration_ms_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'gims_request_duration_ms_bucket{{endpoint="{name}",le="+Inf"}} {stats.latency.count}')
+                lines.append(f'gims_request_duration_ms_sum{{endpoint="{name}"}} {stats.latency.total_ms:.3f}')
+                lines.append(f'gims_request_duration_ms_count{{endpoint="{name}"}} {stats.latency.count}')
+            counters = (
+                ('gims_request_errors_total', 'Requests answered with a 5xx status.', 'errors'),
+                ('gims_sql_statements_total', 'SQLite statements executed.', 'sql_statements'),
+                ('gims_sql_seconds_total', 'Time spent executing SQLite statements.', 'sql_seconds'),
+                ('gims_response_bytes_total', 'Response body bytes sent.', 'response_bytes'),
+            )
+            for metric, help_text, attr in counters:
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} counter')
+                for name, stats in items:
+                    lines.append(f'{metric}{{endpoint="{name}"}} {getattr(stats, attr)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# ==================== SQLITE HOOKS ====================
+
+def _count_statement(_statement):
+    state = _request_state
+    if getattr(state, 'active', False):
+        state.sql_statements += 1
+
+
+def _add_statement_time(seconds):
+    state = _request_state
+    if getattr(state, 'active', False):
+        state.sql_seconds += seconds
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that adds execute time to the current request's totals."""
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            _add_statement_time(time.perf_counter() - started)
+
+    def executemany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            _add_statement_time(time.perf_counter() - started)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose shortcut ``execute`` helpers use InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+
+
+def instrument_connection(conn):
+    """Attach the statement counter to a connection made with InstrumentedConnection."""
+    conn.set_trace_callback(_count_statement)
+    return conn
+
+
+# ==================== FLASK HOOKS ====================
+
+def _begin_request():
+    state = _request_state
+    state.active = True
+    state.started = time.perf_counter()
+    state.sql_statements = 0
+    state.sql_seconds = 0.0
+
+
+class _CountingBody:
+    """Streamed response body that counts its bytes and calls ``on_close`` once closed."""
+
+    def __init__(self, chunks, source, on_close):
+        self.bytes = 0
+        self._chunks = chunks
+        self._source = source
+        self._on_close = on_close
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self.bytes += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self._source, 'close'):
+                self._source.close()
+        finally:
+            if self._on_close is not None:
+                on_close, self._on_close = self._on_close, None
+                on_close(self.bytes)
+
+
+def _record(endpoint, status_code, response_bytes):
+    state = _request_state
+    elapsed_ms = (time.perf_counter() - state.started) * 1000.0
+    state.active = False
+    registry.record(
+        endpoint,
+        status_code,
+        elapsed_ms,
+        state.sql_statements,
+        state.sql_seconds,
+        response_bytes,
+    )
+
+
+def _finish_request(response):
+    state = _request_state
+    if not getattr(state, 'active', False):
+        return response
+    from flask import request
+
+    endpoint = request.endpoint or 'unmatched'
+    if response.content_length is not None or not response.is_streamed:
+        _record(endpoint, response.status_code, response.content_length or 0)
+        return response
+
+    # A generator body (CSV/NDJSON exports) runs its queries while the server
+    # iterates it, after this hook; keep counting SQL and record the request
+    # when the server closes the body.
+    status_code = response.status_code
+    response.response = _CountingBody(
+        response.iter_encoded(), response.response,
+        lambda sent: _record(endpoint, status_code, sent)
+    )
+    return response
+
+
+def init_app(app):
+    """Register request hooks when metrics are enabled; no-op otherwise."""
+    if not METRICS_ENABLED:
+        return
+    # Run first/last so the measured latency covers the other request hooks
+    # (Flask calls after_request functions in reverse registration order).
+    app.before_request_funcs.setdefault(None, []).insert(0, _begin_request)
+    app.after_request_funcs.setdefault(None, []).insert(0, _finish_request)
@@ -0,0 +1,538 @@
+# pdf_toolkit.py
+"""Shared ReportLab building blocks for the PDF exports.
+
+The sample stylesheet, paragraph styles and table styles are created once at
+import instead of on every request. Large tables are emitted as page-sized
+``LongTable`` chunks: ReportLab re-measures every remaining row each time it
+splits a table across a page, so one giant ``Table`` costs roughly
+rows × pages, while page-sized chunks are laid out once. For plain grids
+with many thousands of rows ``draw_grid_pdf`` skips platypus entirely and
+draws the pages straight onto a canvas.
+
+Run ``python pdf_toolkit.py benchmark --rows 5000`` to compare the three
+strategies on a synthetic monthly attendance register.
+"""
+
+import argparse
+import io
+import time
+from functools import lru_cache
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+INSTITUTE_NAME = "GHAZALI INSTITUTE OF MEDICAL SCIENCES"
+
+BRAND_GREEN = colors.HexColor('#00721c')
+BRAND_GREEN_DARK = colors.HexColor('#005a15')
+ATTENDANCE_BLUE = colors.HexColor('#1f4788')
+ALERT_RED = colors.HexColor('#dc3545')
+EXAM_NAVY = colors.HexColor('#0c2d48')
+
+# Frame() pads its content by 6pt on every side
+FRAME_PADDING = 6
+
+# Embed images as binary streams: without ReportLab's C accelerator the
+# ASCII85 encoding is pure Python and dominates photo-heavy documents
+rl_config.useA85 = 0
+
+SAMPLE_STYLES = getSampleStyleSheet()
+
+
+# ==================== PARAGRAPH STYLES ====================
+
+INSTITUTE_TITLE = ParagraphStyle(
+    'InstituteTitle',
+    parent=SAMPLE_STYLES['Heading1'],
+    fontSize=20,
+    textColor=BRAND_GREEN,
+    spaceAfter=10,
+    alignment=1,
+    fontName='Helvetica-Bold',
+    leading=24
+)
+
+REPORT_TITLE = ParagraphStyle(
+    'ReportTitle',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=14,
+    textColor=colors.HexColor('#333333'),
+    spaceAfter=15,
+    alignment=1,
+    fontName='Helvetica',
+    leading=18
+)
+
+FOOTER = ParagraphStyle(
+    'Footer',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=9,
+    textColor=colors.HexColor('#999999'),
+    alignment=2
+)
+
+# Payroll registers use a roomier institute heading
+PAYROLL_TITLE = ParagraphStyle(
+    'PayrollInstituteTitle',
+    parent=SAMPLE_STYLES['Heading1'],
+    fontSize=20,
+    textColor=BRAND_GREEN,
+    alignment=1,
+    fontName='Helvetica-Bold',
+    spaceAfter=20
+)
+
+ATTENDANCE_TITLE = ParagraphStyle(
+    'AttendanceTitle',
+    parent=SAMPLE_STYLES['Heading1'],
+    fontSize=16,
+    textColor=ATTENDANCE_BLUE,
+    spaceAfter=6,
+    alignment=1
+)
+
+ATTENDANCE_SUBTITLE = ParagraphStyle(
+    'AttendanceSubtitle',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=11,
+    textColor=colors.HexColor('#333333'),
+    spaceAfter=12,
+    alignment=1
+)
+
+FILTER_INFO = ParagraphStyle(
+    'FilterInfo',
+    parent=SAMPLE_STYLES['Normal'],
+    fontSize=9,
+    textColor=colors.HexColor('#666666'),
+    spaceAfter=12,
+    alignment=0
+)
+
+SECTION_TITLE = ParagraphStyle(
+    'SectionTitle',
+    parent=SAMPLE_STYLES['Heading2'],
+    fontSize=12,
+    textColor=ATTENDANCE_BLUE,
+    spaceAfter=10
+)
+
+WARNING_TITLE = ParagraphStyle(
+    'WarningTitle',
+    parent=SAMPLE_STYLES['Heading2'],
+    fontSize=12,
+    textColor=ALERT_RED,
+    spaceAfter=10
+)
+
+EXAM_TITLE = ParagraphStyle('ExamReportTitle', parent=SAMPLE_STYLES['Title'], alignment=1, fontSize=18, textColor=colors.HexColor('#0a7b35'), spaceAfter=6)
+EXAM_SUBTITLE = ParagraphStyle('ExamReportSubtitle', parent=SAMPLE_STYLES['Heading2'], alignment=1, fontSize=12, textColor=colors.HexColor('#111111'), spaceAfter=14)
+EXAM_META = ParagraphStyle('ExamReportMeta', parent=SAMPLE_STYLES['Normal'], alignment=1, fontSize=9, textColor=colors.HexColor('#555555'), spaceAfter=12)
+EXAM_FILTERS = ParagraphStyle('ExamReportFilters', parent=SAMPLE_STYLES['Normal'], fontSize=9, textColor=colors.HexColor('#666666'), spaceAfter=10)
+
+CERTIFICATE_TITLE = ParagraphStyle(
+    'CertificateTitle',
+    parent=SAMPLE_STYLES['Heading1'],
+    fontSize=18,
+    textColor=colors.HexColor('#000000'),
+    spaceAfter=20,
+    alignment=1
+)
+
+
+# ==================== TABLE STYLES ====================
+
+def student_list_table_style(header_size=10, body_size=9, padding=8):
+    """Green header, zebra rows and soft borders used by the student lists."""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), BRAND_GREEN),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        ('LEFTPADDING', (0, 0), (-1, 0), padding),
+        ('RIGHTPADDING', (0, 0), (-1, 0), padding),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+        ('FONTSIZE', (0, 1), (-1, -1), body_size),
+        ('TOPPADDING', (0, 1), (-1, -1), padding),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), padding),
+        ('LEFTPADDING', (0, 1), (-1, -1), padding),
+        ('RIGHTPADDING', (0, 1), (-1, -1), padding),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')),
+        ('LINEBELOW', (0, 0), (-1, 0), 2, BRAND_GREEN_DARK),
+    ])
+
+
+STUDENT_LIST_TABLE = student_list_table_style()
+STUDENT_LIST_TABLE_COMPACT = student_list_table_style(header_size=9, body_size=8, padding=6)
+
+DAILY_ATTENDANCE_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), ATTENDANCE_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('TOPPADDING', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('TOPPADDING', (0, 1), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+])
+
+MONTHLY_ATTENDANCE_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), ATTENDANCE_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('TOPPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f5f5f5')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('TOPPADDING', (0, 1), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+])
+
+LOW_ATTENDANCE_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), ALERT_RED),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('TOPPADDING', (0, 0), (-1, 0), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ffe6e6')),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#fff0f0')]),
+    ('GRID', (0, 0), (-1, -1), 0.5, ALERT_RED),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+])
+
+DEDUCTIONS_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), BRAND_GREEN),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+EXAM_SUMMARY_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), EXAM_NAVY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
+])
+
+EXAM_RESULTS_TABLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), EXAM_NAVY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+    ('ALIGN', (5, 1), (8, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f6f7fb')]),
+    ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#d7dce6')),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+])
+
+
+# ==================== FLOWABLES ====================
+
+def report_document(target, pagesize=A4, **margins):
+    """SimpleDocTemplate with the margins most exports use."""
+    options = {
+        'rightMargin': 0.5*inch,
+        'leftMargin': 0.5*inch,
+        'topMargin': 0.75*inch,
+        'bottomMargin': 0.75*inch,
+    }
+    options.update(margins)
+    return SimpleDocTemplate(target, pagesize=pagesize, **options)
+
+
+def institute_header(report_title, title_style=INSTITUTE_TITLE, subtitle_style=REPORT_TITLE,
+                     institute_name=INSTITUTE_NAME, space_after=0.15*inch):
+    """Institute name, report title and a spacer, as a list of flowables."""
+    return [
+        Paragraph(institute_name, title_style),
+        Paragraph(report_title, subtitle_style),
+        Spacer(1, space_after),
+    ]
+
+
+def total_records_footer(count, label="Total Records"):
+    return [Spacer(1, 0.2*inch), Paragraph(f"{label}: {count}", FOOTER)]
+
+
+def _frame_height(doc):
+    return doc.height - 2 * FRAME_PADDING
+
+
+def _flowables_height(flowables, width):
+    height = 0
+    for flowable in flowables:
+        _, flowable_height = flowable.wrap(width, 1e6)
+        height += flowable_height + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+    return height
+
+
+def measure_rows(data, col_widths, style, repeat_rows=1):
+    """Return ``(header_height, row_height)`` as platypus lays out ``data``."""
+    probe = Table(data[:repeat_rows + 1], colWidths=col_widths)
+    probe.setStyle(style)
+    probe.wrap(0, 0)
+    header_height = sum(probe._rowHeights[:repeat_rows])
+    row_height = probe._rowHeights[-1] if len(data) > repeat_rows else header_height
+    return header_height, row_height or 1
+
+
+def chunked_table(data, col_widths, style, doc=None, preceding=(), repeat_rows=1):
+    """Split ``data`` into page-sized ``LongTable`` chunks that repeat the header.
+
+    Row heights are measured from a header+first-row probe, so chunks line up
+    with page breaks when rows are single-line. ``preceding`` are the
+    flowables placed above the table on the first page; without ``doc`` the
+    whole table is returned as a single ``LongTable``.
+    """
+    header, body = data[:repeat_rows], data[repeat_rows:]
+    if doc is None or len(body) < 2:
+        table = LongTable(data, colWidths=col_widths, repeatRows=repeat_rows)
+        table.setStyle(style)
+        return [table]
+
+    header_height, row_height = measure_rows(data, col_widths, style, repeat_rows)
+    frame_height = _frame_height(doc)
+    per_page = max(1, int((frame_height - header_height) // row_height))
+    first_space = frame_height - (_flowables_height(preceding, doc.width) % frame_height)
+    first_page = int((first_space - header_height) // row_height)
+    if first_page < 1:
+        first_page = per_page
+
+    tables = []
+    start = 0
+    size = first_page
+    while start < len(body):
+        table = LongTable(header + body[start:start + size], colWidths=col_widths, repeatRows=repeat_rows)
+        table.setStyle(style)
+        tables.append(table)
+        start += size
+        size = per_page
+    return tables
+
+
+# ==================== CANVAS FAST PATH ====================
+
+@lru_cache(maxsize=8192)
+def fit_text(text, font_name, font_size, width):
+    # No Helvetica glyph is wider than 1em, so short strings skip measuring
+    if len(text) * font_size <= width or stringWidth(text, font_name, font_size) <= width:
+        return text
+    while text and stringWidth(text + '…', font_name, font_size) > width:
+        text = text[:-1]
+    return text + '…' if text else ''
+
+
+def draw_grid_pdf(target, title_lines, headers, rows, col_widths, pagesize=A4,
+                  margins=(0.5*inch, 0.5*inch, 0.75*inch, 0.75*inch),
+                  header_fill=BRAND_GREEN, header_text=colors.white,
+                  zebra=(colors.white, colors.HexColor('#f8f9fa')), grid_color=colors.HexColor('#dee2e6'),
+                  header_size=9, body_size=8, row_height=None, footer_text=None, progress=None):
+    """Draw a plain grid report straight onto a canvas; return the page count.
+
+    ``title_lines`` are ``(text, font_name, font_size, color)`` tuples drawn
+    centred on the first page. Cell text is clipped to its column, so this
+    path suits single-line registers rather than free-text tables.
+    """
+    left, right, top, bottom = margins
+    page_width, page_height = pagesize
+    row_height = row_height or body_size + 8
+    header_height = header_size + 12
+    table_width = sum(col_widths)
+    rows = rows if isinstance(rows, list) else list(rows)
+
+    c = pdf_canvas.Canvas(target, pagesize=pagesize)
+    page = 0
+    index = 0
+
+    def draw_header(y):
+        c.setFillColor(header_fill)
+        c.rect(left, y - header_height, table_width, header_height, stroke=0, fill=1)
+        c.setFillColor(header_text)
+        c.setFont('Helvetica-Bold', header_size)
+        x = left
+        for text, width in zip(headers, col_widths):
+            c.drawString(x + 4, y - header_height + 6, fit_text(str(text), 'Helvetica-Bold', header_size, width - 8))
+            x += width
+        return y - header_height
+
+    while True:
+        page += 1
+        y = page_height - top
+        if page == 1:
+            for text, font_name, font_size, color in title_lines:
+                c.setFont(font_name, font_size)
+                c.setFillColor(color)
+                y -= font_size * 1.2
+                c.drawCentredString(page_width / 2, y, text)
+                y -= font_size * 0.6
+            y -= 8
+        table_top = y
+        y = draw_header(y)
+        available = int((y - bottom) // row_height)
+        chunk = rows[index:index + available]
+
+        # Zebra stripes first, then all cell text through one text object
+        c.setFillColor(zebra[1])
+        for offset in range(1, len(chunk), 2):
+            c.rect(left, y - row_height * (offset + 1), table_width, row_height, stroke=0, fill=1)
+        text_object = c.beginText()
+        text_object.setFont('Helvetica', body_size)
+        text_object.setFillColor(colors.black)
+        for row in chunk:
+            x = left
+            for value, width in zip(row, col_widths):
+                text = '' if value is None else str(value)
+                if text:
+                    text_object.setTextOrigin(x + 4, y - row_height + 4)
+                    text_object.textOut(fit_text(text, 'Helvetica', body_size, width - 8))
+                x += width
+            y -= row_height
+        c.drawText(text_object)
+
+        # Grid lines for the whole block in one pass
+        c.setStrokeColor(grid_color)
+        c.setLineWidth(0.5)
+        x_positions = [left]
+        for width in col_widths:
+            x_positions.append(x_positions[-1] + width)
+        y_positions = [table_top, table_top - header_height]
+        y_positions += [table_top - header_height - row_height * (n + 1) for n in range(len(chunk))]
+        c.grid(x_positions, y_positions)
+
+        index += len(chunk)
+        if progress is not None:
+            progress(fraction=index / len(rows) if rows else 1.0, pages=page)
+        if index >= len(rows):
+            if footer_text:
+                c.setFont('Helvetica', 9)
+                c.setFillColor(colors.HexColor('#999999'))
+                c.drawRightString(left + table_width, max(y - 18, bottom / 2), footer_text)
+            break
+        c.showPage()
+
+    c.save()
+    return page
+
+
+# ==================== BENCHMARK ====================
+
+_BENCH_HEADERS = ["S.NO", "Admission No", "Name", "Campus", "Board", "Semester", "Technology",
+                  "Present", "Absent", "Late", "Leave", "Total", "Percentage"]
+_BENCH_WIDTHS = [0.3*inch, 0.7*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.8*inch,
+                 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.5*inch, 0.7*inch]
+
+
+def _bench_rows(count):
+    return [
+        [str(i), f'GIMS-{i:05d}', f'Student {i}', 'Main Campus', 'KPK Medical Faculty', '2nd Semester',
+         'Dip-Pharmacy', '20', '3', '1', '1', '25', '80.0%']
+        for i in range(1, count + 1)
+    ]
+
+
+def benchmark(rows=5000):
+    """Time a monthly-register PDF with each strategy; return a list of results."""
+    body = _bench_rows(rows)
+    data = [_BENCH_HEADERS] + body
+    results = []
+
+    def run(name, build):
+        buffer = io.BytesIO()
+        started = time.perf_counter()
+        pages = build(buffer)
+        elapsed = time.perf_counter() - started
+        results.append({
+            'strategy': name,
+            'rows': rows,
+            'pages': pages,
+            'seconds': round(elapsed, 3),
+            'pages_per_second': round(pages / elapsed, 1) if elapsed else None,
+            'rows_per_second': round(rows / elapsed) if elapsed else None,
+            'bytes': buffer.tell(),
+        })
+
+    def single_table(buffer):
+        doc = report_document(buffer)
+        table = Table(data, colWidths=_BENCH_WIDTHS, repeatRows=1)
+        table.setStyle(MONTHLY_ATTENDANCE_TABLE)
+        doc.build(institute_header("Monthly Attendance Report", ATTENDANCE_TITLE, ATTENDANCE_SUBTITLE) + [table])
+        return doc.page
+
+    def long_table_chunks(buffer):
+        doc = report_document(buffer)
+        header = institute_header("Monthly Attendance Report", ATTENDANCE_TITLE, ATTENDANCE_SUBTITLE)
+        doc.build(header + chunked_table(data, _BENCH_WIDTHS, MONTHLY_ATTENDANCE_TABLE, doc=doc, preceding=header))
+        return doc.page
+
+    # Draw canvas rows at the height platypus gives them so page counts compare
+    _, row_height = measure_rows(data, _BENCH_WIDTHS, MONTHLY_ATTENDANCE_TABLE)
+
+    def canvas_grid(buffer):
+        return draw_grid_pdf(
+            buffer,
+            [(INSTITUTE_NAME, 'Helvetica-Bold', 16, ATTENDANCE_BLUE),
+             ("Monthly Attendance Report", 'Helvetica', 11, colors.HexColor('#333333'))],
+            _BENCH_HEADERS, body, _BENCH_WIDTHS,
+            header_fill=ATTENDANCE_BLUE, header_size=8, body_size=7, row_height=row_height,
+            footer_text=f"Total Records: {rows}"
+        )
+
+    run('table', single_table)
+    run('longtable_chunks', long_table_chunks)
+    run('canvas_grid', canvas_grid)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PDF toolkit utilities.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    bench_parser = subparsers.add_parser('benchmark', help='Report pages/second for a large attendance register.')
+    bench_parser.add_argument('--rows', type=int, default=5000, help='Number of register rows to render.')
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        for result in benchmark(args.rows):
+            print(f"{result['strategy']:<18} {result['pages']:>4} pages in {result['seconds']:>7}s"
+                  f"  {result['pages_per_second']:>7} pages/s  {result['rows_per_second']:>6} rows/s"
+                  f"  {result['bytes']} bytes")
@@ -0,0 +1,149 @@
+# promotions.py
+"""Promotion, demotion and semester rollover.
+
+Every move is set-based: the affected students are selected by one WHERE
+clause (explicit ids are passed as a JSON array and read with
+``json_each``), ``student_semester_history`` gets one row per student from
+an ``INSERT ... SELECT`` that captures the old and new semester/status, and
+``students`` is changed with a single ``UPDATE`` in the same transaction.
+
+A rollover moves every active student of a campus/board (or the whole
+institution) along ``SEMESTER_ROLLOVER`` at once; the history's ``term``
+label then answers "who was in 3rd semester last term" with one indexed
+read.
+"""
+
+import json
+from datetime import datetime
+
+from config import SEMESTER_ROLLOVER
+
+PROMOTE = 'promote'
+DEMOTE = 'demote'
+STATUS_CHANGE = 'status'
+ROLLOVER = 'rollover'
+DEMOTED_STATUS = 'Demoted'
+
+# Which id space ``changed_by`` belongs to: ``users.id`` (RBAC login) or ``teachers.id`` (legacy login)
+USER_REALM = 'user'
+TEACHER_REALM = 'teacher'
+
+SCOPE_FILTERS = ('campus', 'board')
+_ROLLOVER_SEMESTER = '(SELECT value FROM json_each(?) WHERE key = s.semester)'
+
+
+class Move:
+    """Where the selected students go: a new semester and/or status, or the rollover map."""
+
+    def __init__(self, action, semester=None, status=None, rollover=None):
+        self.action = action
+        self.status = status or None
+        if rollover is not None:
+            self.semester_sql, self.semester_params = _ROLLOVER_SEMESTER, [json.dumps(rollover)]
+        elif semester:
+            self.semester_sql, self.semester_params = '?', [semester]
+        else:
+            self.semester_sql, self.semester_params = 's.semester', []
+
+
+def ids_selection(student_ids):
+    """Selection for explicit student ids; raises ValueError for non-numeric ids."""
+    ids = [int(student_id) for student_id in student_ids]
+    return 's.id IN (SELECT value FROM json_each(?))', [json.dumps(ids)]
+
+
+def section_selection(campus, board, semester):
+    return 's.campus = ? AND s.board = ? AND s.semester = ?', [campus, board, semester]
+
+
+def rollover_selection(scope, rollover=SEMESTER_ROLLOVER):
+    """Active students in ``scope`` (campus/board) whose semester has a rollover target."""
+    clauses = ["s.status = 'Active'", 's.semester IN (SELECT key FROM json_each(?))']
+    params = [json.dumps(rollover)]
+    for name in SCOPE_FILTERS:
+        value = scope.get(name)
+        if value and value != 'All':
+            clauses.append(f's.{name} = ?')
+            params.append(value)
+    return ' AND '.join(clauses), params
+
+
+def apply_move(conn, selection, move, term=None, changed_by=None, changed_by_realm=None, changed_at=None):
+    """Record history for and update every selected student; returns how many moved (caller commits).
+
+    ``changed_by``/``changed_by_realm`` name the actor, e.g. ``(7, USER_REALM)``.
+    """
+    where, where_params = selection
+    changed_at = changed_at or datetime.now().isoformat(timespec='seconds')
+    conn.execute(
+        f'''
+        INSERT INTO student_semester_history
+            (student_id, from_semester, to_semester, from_status, to_status, action, term,
+             changed_by, changed_by_realm, changed_at)
+        SELECT s.id, s.semester, {move.semester_sql}, s.status, COALESCE(?, s.status), ?, ?, ?, ?, ?
+        FROM students s
+        WHERE {where}
+        ''',
+        [*move.semester_params, move.status, move.action, term, changed_by, changed_by_realm, changed_at,
+         *where_params]
+    )
+    cursor = conn.execute(
+        f'''
+        UPDATE students AS s
+        SET semester = {move.semester_sql}, status = COALESCE(?, s.status)
+        WHERE {where}
+        ''',
+        [*move.semester_params, move.status, *where_params]
+    )
+    return cursor.rowcount
+
+
+def rollover_preview(conn, scope, rollover=SEMESTER_ROLLOVER):
+    """How many students a rollover would move, per (from, to) semester pair."""
+    where, params = rollover_selection(scope, rollover)
+    return [dict(row) for row in conn.execute(
+        f'''
+        SELECT s.semester AS from_semester, {_ROLLOVER_SEMESTER} AS to_semester, COUNT(*) AS students
+        FROM students s
+        WHERE {where}
+        GROUP BY s.semester
+        ORDER BY s.semester
+        ''',
+        [json.dumps(rollover), *params]
+    )]
+
+
+HISTORY_FILTERS = (
+    ('student_id', 'h.student_id = ?'),
+    ('from_semester', 'h.from_semester = ?'),
+    ('to_semester', 'h.to_semester = ?'),
+    ('action', 'h.action = ?'),
+    ('term', 'h.term = ?'),
+    ('since', 'h.changed_at >= ?'),
+    ('until', 'h.changed_at < ?'),
+)
+
+
+def load_history(conn, filters, limit=1000):
+    """History rows joined with the student, newest first."""
+    clauses = []
+    params = []
+    for name, clause in HISTORY_FILTERS:
+        value = filters.get(name)
+        if value:
+            clauses.append(clause)
+            params.append(value)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return [dict(row) for row in conn.execute(
+        f'''
+        SELECT h.id, h.student_id, s.admission_no, s.name, s.father_name, s.campus, s.board, s.technology,
+               h.from_semester, h.to_semester, h.from_status, h.to_status, h.action, h.term,
+               h.changed_by, h.changed_by_realm, h.changed_at
+        FROM student_semester_history h
+        JOIN students s ON s.id = h.student_id
+        {where}
+        ORDER BY h.changed_at DESC, h.id DESC
+        LIMIT ?
+        ''',
+        [*params, limit]
+    )]
@@ -0,0 +1,211 @@
+# rate_limit.py
+"""In-process token-bucket throttling for credential endpoints.
+
+Every password check costs a full hash, so attempts are charged against a
+bucket per client IP and a bucket per account key *before* any hashing
+happens. Consecutive failures lock an account key out in memory; the
+``users.login_attempts``/``suspended_until`` columns are brought up to date
+in batches instead of with one UPDATE per failed attempt (at most
+``flush_seconds`` after the first unwritten failure).
+"""
+
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class TokenBucket:
+    """Classic token bucket: ``capacity`` burst, ``refill_rate`` tokens/second."""
+
+    __slots__ = ('capacity', 'refill_rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, refill_rate, now):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def consume(self, now, amount=1.0):
+        """Take ``amount`` tokens; return 0 on success or seconds until available."""
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        if self.refill_rate <= 0:
+            return float('inf')
+        return (amount - self.tokens) / self.refill_rate
+
+    def is_idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class CredentialRateLimiter:
+    """Token buckets keyed by IP and by account, plus in-memory lockouts."""
+
+    max_tracked_keys = 10000
+
+    def __init__(self, ip_capacity, ip_refill_per_minute, account_capacity,
+                 account_refill_per_minute, lockout_threshold, lockout_minutes,
+                 flush_seconds=30, connection_factory=None):
+        self.ip_capacity = ip_capacity
+        self.ip_refill = ip_refill_per_minute / 60.0
+        self.account_capacity = account_capacity
+        self.account_refill = account_refill_per_minute / 60.0
+        self.lockout_threshold = lockout_threshold
+        self.lockout_seconds = lockout_minutes * 60
+        self.flush_seconds = flush_seconds
+        self.connection_factory = connection_factory
+
+        self._lock = threading.Lock()
+        self._ip_buckets = {}
+        self._account_buckets = {}
+        self._failures = {}
+        self._locked_until = {}
+        self._pending_user_updates = {}
+        self._flush_timer = None
+        self._last_flush = time.monotonic()
+        if connection_factory:
+            atexit.register(self.flush)
+
+    @staticmethod
+    def account_key(realm, identifier):
+        return f"{realm}:{str(identifier or '').strip().lower()}"
+
+    def _prune(self, now):
+        for buckets in (self._ip_buckets, self._account_buckets):
+            if len(buckets) > self.max_tracked_keys:
+                for key in [k for k, bucket in buckets.items() if bucket.is_idle(now)]:
+                    del buckets[key]
+        # Failure counters follow their account bucket, so keys that were
+        # tried once (e.g. made-up usernames) do not pile up
+        if len(self._failures) > self.max_tracked_keys:
+            for key in list(self._failures):
+                bucket = self._account_buckets.get(key)
+                if bucket is None or bucket.is_idle(now):
+                    del self._failures[key]
+        if len(self._locked_until) > self.max_tracked_keys:
+            wall_now = time.time()
+            for key in [k for k, until in self._locked_until.items() if until <= wall_now]:
+                del self._locked_until[key]
+
+    def check(self, ip, account_key):
+        """Charge one attempt; return None if allowed, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            locked_until = self._locked_until.get(account_key)
+            if locked_until:
+                remaining = locked_until - time.time()
+                if remaining > 0:
+                    return remaining
+                del self._locked_until[account_key]
+
+            ip_bucket = self._ip_buckets.get(ip)
+            if ip_bucket is None:
+                ip_bucket = self._ip_buckets[ip] = TokenBucket(self.ip_capacity, self.ip_refill, now)
+            wait = ip_bucket.consume(now)
+            if wait:
+                return wait
+
+            account_bucket = self._account_buckets.get(account_key)
+            if account_bucket is None:
+                account_bucket = self._account_buckets[account_key] = TokenBucket(
+                    self.account_capacity, self.account_refill, now
+                )
+            wait = account_bucket.consume(now)
+            if wait:
+                return wait
+
+            self._prune(now)
+        self.maybe_flush()
+        return None
+
+    def record_failure(self, account_key, user_id=None):
+        """Count a failed attempt; lock the key out after too many in a row."""
+        wall_now = time.time()
+        suspended_until = None
+        with self._lock:
+            failures = self._failures.get(account_key, 0) + 1
+            if failures >= self.lockout_threshold:
+                self._locked_until[account_key] = wall_now + self.lockout_seconds
+                suspended_until = (datetime.utcnow() + timedelta(seconds=self.lockout_seconds)).isoformat()
+                failures = 0
+            self._failures[account_key] = failures
+            if user_id is not None:
+                pending = self._pending_user_updates.setdefault(
+                    user_id, {'attempts': 0, 'failed_at': None, 'suspended_until': None}
+                )
+                pending['attempts'] += 1
+                pending['failed_at'] = datetime.utcnow().isoformat()
+                if suspended_until:
+                    pending['suspended_until'] = suspended_until
+                if self._flush_timer is None and self.connection_factory:
+                    # Written even if no further attempt ever comes in
+                    self._flush_timer = threading.Timer(self.flush_seconds, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        self.maybe_flush()
+
+    def record_success(self, account_key, user_id=None, ip=None):
+        """Reset failure tracking; the caller's login UPDATE clears the columns.
+
+        The attempt's IP token is handed back, so many correct logins from one
+        shared address (a lab or hostel behind NAT) are never throttled.
+        """
+        with self._lock:
+            self._failures.pop(account_key, None)
+            self._locked_until.pop(account_key, None)
+            bucket = self._account_buckets.get(account_key)
+            if bucket is not None:
+                bucket.tokens = bucket.capacity
+            ip_bucket = self._ip_buckets.get(ip)
+            if ip_bucket is not None:
+                ip_bucket.tokens = min(ip_bucket.capacity, ip_bucket.tokens + 1)
+            if user_id is not None:
+                self._pending_user_updates.pop(user_id, None)
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write queued ``users`` failure counters in one executemany batch."""
+        with self._lock:
+            pending = self._pending_user_updates
+            self._pending_user_updates = {}
+            self._last_flush = time.monotonic()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        if not pending or not self.connection_factory:
+            return
+        rows = [
+            (item['attempts'], item['failed_at'], item['suspended_until'], user_id)
+            for user_id, item in pending.items()
+        ]
+        conn = None
+        try:
+            conn = self.connection_factory()
+            conn.executemany(
+                '''
+                    UPDATE users
+                    SET login_attempts = COALESCE(login_attempts, 0) + ?,
+                        last_failed_login_at = ?,
+                        suspended_until = COALESCE(?, suspended_until)
+                    WHERE id = ?
+                ''',
+                rows
+            )
+            conn.commit()
+        except Exception as exc:
+            print(f"Login attempt flush error: {exc}")
+        finally:
+            if conn:
+                conn.close()
@@ -90,6 +90,7 @@ ROUTE_PERMISSION_RULES = [
             "/api/students_by",
             "/api/students_for_sms_group",
             "/api/search_students_for_sms",
+            "/api/sms/",
         ],
     },
     {
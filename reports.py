@@ -0,0 +1,327 @@
+# reports.py
+"""Declarative student list reports.
+
+Each report is declared once as a ``ReportSpec``: the columns it selects,
+the request filters it understands, its sort order and how its PDF looks.
+A spec compiles the current request arguments into one parameterized
+query; the SQL text only depends on *which* filters are active, so it is
+built once per filter combination and cached. Every output format (JSON,
+CSV, NDJSON, XLSX and PDF) is rendered from the same row stream.
+"""
+
+import io
+import threading
+
+from flask import jsonify, request, send_file
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+
+from config import PDF_FAST_PATH_MIN_ROWS
+from export_jobs import attach_progress
+from exporters import iter_query, numbered, requested_stream_format, stream_rows, stream_xlsx
+from pdf_toolkit import (
+    BRAND_GREEN,
+    INSTITUTE_NAME,
+    chunked_table,
+    draw_grid_pdf,
+    institute_header,
+    measure_rows,
+    report_document,
+    student_list_table_style,
+    total_records_footer,
+)
+STUDENT_STATUSES = ('Left', 'Course Completed', 'Active', 'Demoted')
+
+
+class EqualsFilter:
+    """``column = ?`` for a request argument; empty values and 'All' are skipped."""
+
+    def __init__(self, arg, column=None, skip_all=True):
+        self.arg = arg
+        self.column = column or arg
+        self.skip_all = skip_all
+
+    def compile(self, value):
+        if not value or (self.skip_all and value == 'All'):
+            return None, ()
+        return f"{self.column} = ?", (value,)
+
+
+class StatusFilter:
+    """The shared status selector ('Free' means ``student_type = 'Free'``)."""
+
+    arg = 'status'
+
+    def __init__(self, default=None):
+        self.default = default
+
+    def compile(self, value):
+        if value == 'Free':
+            return "student_type = 'Free'", ()
+        if value in STUDENT_STATUSES:
+            return "status = ?", (value,)
+        return self.default, ()
+
+
+class ReportSpec:
+    """A report declared once and rendered to every supported format.
+
+    ``columns`` are ``(key, header)`` pairs in select/sheet order and
+    ``pdf_columns`` are ``(key, header, width_in_inches)`` in PDF order.
+    """
+
+    def __init__(self, name, table, columns, filters, order_by, download_name,
+                 sheet_title, pdf_columns, pdf_title, pdf_font_sizes=(10, 9), pdf_padding=8):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.filters = filters
+        self.order_by = order_by
+        self.download_name = download_name
+        self.sheet_title = sheet_title
+        self.pdf_columns = pdf_columns
+        self.pdf_title = pdf_title
+        self.pdf_font_sizes = pdf_font_sizes
+        self.pdf_table_style = student_list_table_style(pdf_font_sizes[0], pdf_font_sizes[1], pdf_padding)
+        self._sql_cache = {}
+        self._sql_lock = threading.Lock()
+
+    @property
+    def keys(self):
+        return [key for key, _ in self.columns]
+
+    @property
+    def headers(self):
+        return ["S.NO"] + [header for _, header in self.columns]
+
+    def _sql_for(self, clauses):
+        sql = self._sql_cache.get(clauses)
+        if sql is None:
+            sql = f"SELECT {', '.join(self.keys)} FROM {self.table}"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            if self.order_by:
+                sql += f" ORDER BY {self.order_by}"
+            with self._sql_lock:
+                self._sql_cache[clauses] = sql
+        return sql
+
+    def compile(self, args):
+        """Return ``(sql, params)`` for the given request arguments."""
+        clauses = []
+        params = []
+        for report_filter in self.filters:
+            clause, values = report_filter.compile(args.get(report_filter.arg))
+            if clause:
+                clauses.append(clause)
+                params.extend(values)
+        return self._sql_for(tuple(clauses)), params
+
+    def rows(self, args):
+        query, params = self.compile(args)
+        return iter_query(query, params)
+
+
+def _all(args, name):
+    value = args.get(name)
+    return value if value and value != 'All' else 'All'
+
+
+def _with_status(title, args):
+    status = args.get('status')
+    return f"{title} ({status})" if status else title
+
+
+REPORT1 = ReportSpec(
+    name='report1',
+    table='students',
+    columns=(
+        ('admission_no', "Admission No"),
+        ('name', "Name"),
+        ('father_name', "Father Name"),
+        ('phone', "Phone #"),
+        ('technology', "Technology"),
+        ('gender', "Gender"),
+        ('student_type', "Student Type"),
+        ('status', "Status"),
+    ),
+    filters=(
+        StatusFilter(),
+        EqualsFilter('campus'),
+        EqualsFilter('board'),
+        EqualsFilter('semester'),
+        EqualsFilter('technology'),
+        EqualsFilter('gender', skip_all=False),
+    ),
+    order_by='id',
+    download_name='report1_students',
+    sheet_title="Report 1 Students",
+    pdf_columns=(
+        ('admission_no', "ADMISSION NO", 0.9),
+        ('name', "NAME", 1.25),
+        ('father_name', "FATHER NAME", 1.25),
+        ('phone', "PHONE #", 1.3),
+        ('gender', "GENDER", 0.75),
+        ('technology', "TECHNOLOGY", 1.2),
+        ('student_type', "STUDENT TYPE", 1.1),
+        ('status', "STATUS", 1.15),
+    ),
+    pdf_title=lambda args: _with_status(
+        f"{_all(args, 'semester')} {_all(args, 'technology')} Students List", args
+    ),
+)
+
+REPORT2 = ReportSpec(
+    name='report2',
+    table='students',
+    columns=(
+        ('admission_no', "Admission No"),
+        ('name', "Name"),
+        ('father_name', "Father Name"),
+        ('phone', "Phone #"),
+        ('technology', "Technology"),
+        ('status', "Status"),
+    ),
+    filters=(
+        StatusFilter(),
+        EqualsFilter('campus'),
+        EqualsFilter('board'),
+        EqualsFilter('technology'),
+    ),
+    order_by='id',
+    download_name='report2_students',
+    sheet_title="Report 2 Students",
+    pdf_columns=(
+        ('admission_no', "ADMISSION NO", 1.0),
+        ('name', "NAME", 1.45),
+        ('father_name', "FATHER NAME", 1.45),
+        ('phone', "PHONE #", 1.5),
+        ('technology', "TECHNOLOGY", 1.5),
+        ('status', "STATUS", 1.39),
+    ),
+    pdf_title=lambda args: _with_status(
+        f"{_all(args, 'campus')} - {_all(args, 'board')} - {_all(args, 'technology')} Students List", args
+    ),
+)
+
+REPORT3 = ReportSpec(
+    name='report3',
+    table='students',
+    columns=(
+        ('admission_no', "Admission No"),
+        ('name', "Name"),
+        ('father_name', "Father Name"),
+        ('phone', "Phone #"),
+        ('campus', "Campus"),
+        ('board', "Board"),
+        ('semester', "Semester"),
+        ('technology', "Technology"),
+        ('status', "Status"),
+    ),
+    # Default for the 'All Students' report: active students only
+    filters=(StatusFilter(default="status = 'Active'"),),
+    order_by='id',
+    download_name='all_students',
+    sheet_title="All Students",
+    pdf_columns=(
+        ('admission_no', "ADMISSION NO", 0.9),
+        ('name', "NAME", 1.2),
+        ('father_name', "FATHER NAME", 1.2),
+        ('phone', "PHONE #", 1.3),
+        ('campus', "CAMPUS", 0.85),
+        ('board', "BOARD", 0.85),
+        ('semester', "SEMESTER", 0.9),
+        ('technology', "TECHNOLOGY", 1.05),
+        ('status', "STATUS", 0.95),
+    ),
+    pdf_title=lambda args: _with_status("All Students List", args),
+    pdf_font_sizes=(9, 8),
+    pdf_padding=6,
+)
+
+
+# ==================== RENDERERS ====================
+
+def render_json(spec, args):
+    return jsonify([dict(row) for row in spec.rows(args)])
+
+
+def render_xlsx(spec, args):
+    # Columns are selected in sheet order, so rows stream straight from the cursor
+    return stream_xlsx(
+        numbered(spec.rows(args)),
+        spec.headers,
+        spec.sheet_title,
+        f'{spec.download_name}.xlsx'
+    )
+
+
+def build_pdf(spec, args, target, progress=None):
+    """Write the PDF for ``spec`` to ``target`` and return its download name.
+
+    Lists of PDF_FAST_PATH_MIN_ROWS or more are drawn straight onto the
+    canvas; smaller ones go through platypus as page-sized LongTable chunks.
+    """
+    data = [["S.NO"] + [header for _, header, _ in spec.pdf_columns]]
+    for index, row in enumerate(spec.rows(args), 1):
+        data.append([str(index)] + [row[key] or '' for key, _, _ in spec.pdf_columns])
+    download_name = f'{spec.download_name}.pdf'
+    col_widths = [0.5 * inch] + [width * inch for _, _, width in spec.pdf_columns]
+    record_count = len(data) - 1
+
+    if record_count >= PDF_FAST_PATH_MIN_ROWS:
+        header_size, body_size = spec.pdf_font_sizes
+        _, row_height = measure_rows(data, col_widths, spec.pdf_table_style)
+        draw_grid_pdf(
+            target,
+            [(INSTITUTE_NAME, 'Helvetica-Bold', 20, BRAND_GREEN),
+             (spec.pdf_title(args), 'Helvetica', 14, colors.HexColor('#333333'))],
+            data[0], data[1:], col_widths,
+            pagesize=landscape(A4),
+            header_size=header_size,
+            body_size=body_size,
+            row_height=row_height,
+            footer_text=f"Total Records: {record_count}",
+            progress=progress
+        )
+        return download_name
+
+    doc = report_document(target, pagesize=landscape(A4))
+    elements = institute_header(spec.pdf_title(args))
+    elements += chunked_table(data, col_widths, spec.pdf_table_style, doc=doc, preceding=elements)
+    elements += total_records_footer(record_count)
+
+    attach_progress(doc, progress)
+    doc.build(elements)
+    return download_name
+
+
+def render_pdf(spec, args):
+    buffer = io.BytesIO()
+    download_name = build_pdf(spec, args, buffer)
+    buffer.seek(0)
+
+    return send_file(
+        buffer,
+        mimetype='application/pdf',
+        download_name=download_name,
+        as_attachment=False
+    )
+
+
+def render_report(spec, fmt=None):
+    """Render ``spec`` for the current request.
+
+    ``fmt`` is 'xlsx' or 'pdf' for the export routes; otherwise the list
+    endpoint answers with JSON, or CSV/NDJSON when ``?format=`` asks for it.
+    """
+    args = request.args
+    if fmt == 'xlsx':
+        return render_xlsx(spec, args)
+    if fmt == 'pdf':
+        return render_pdf(spec, args)
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_rows(spec.rows(args), stream_format, spec.download_name)
+    return render_json(spec, args)
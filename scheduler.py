@@ -0,0 +1,39 @@
+# scheduler.py
+"""Daily background jobs run on in-process daemon threads."""
+
+import threading
+from datetime import datetime, timedelta
+
+
+class NightlyScheduler:
+    """Calls ``task()`` every day at ``hour`` o'clock local time on a daemon thread."""
+
+    def __init__(self, name, hour, task):
+        self.name = name
+        self.hour = hour
+        self.task = task
+        self._stop = threading.Event()
+        self._thread = None
+
+    def seconds_until_next_run(self, now=None):
+        now = now or datetime.now()
+        next_run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                self.task()
+            except Exception as e:
+                print(f"Scheduled job {self.name} failed: {e}")
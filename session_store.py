@@ -0,0 +1,254 @@
+# session_store.py
+"""Server-side Flask session backends.
+
+The browser only keeps an opaque session id; the session payload lives in
+the ``web_sessions`` table (or in process memory). A session is written back
+only when it was actually modified, so read-only requests never re-serialize
+the payload or send a fresh ``Set-Cookie`` header.
+"""
+
+import atexit
+import os
+import pickle
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from db import get_connection
+
+PURGE_INTERVAL_SECONDS = 300
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Dict-backed session that remembers whether it needs to be stored."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.rotate = False
+
+    def clear(self):
+        """Clearing a session (login/logout) also retires its id."""
+        super().clear()
+        self.rotate = True
+
+
+class MemorySessionStore:
+    """Process-local session store with optional pickle persistence."""
+
+    def __init__(self, persist_path=None):
+        self._data = {}
+        self._lock = threading.Lock()
+        self.persist_path = persist_path
+        if persist_path:
+            self._load()
+            atexit.register(self.persist)
+
+    def _load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, 'rb') as handle:
+                self._data = pickle.load(handle)
+        except Exception as exc:
+            print(f"Session store load error: {exc}")
+            self._data = {}
+
+    def persist(self):
+        """Write the live sessions to disk so a restart keeps users logged in."""
+        if not self.persist_path:
+            return
+        self.purge_expired()
+        with self._lock:
+            snapshot = dict(self._data)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, 'wb') as handle:
+            pickle.dump(snapshot, handle)
+        os.replace(tmp_path, self.persist_path)
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+        if not entry:
+            return None
+        payload, expires_at = entry
+        if expires_at < time.time():
+            self.delete(sid)
+            return None
+        return payload
+
+    def save(self, sid, payload, expires_at):
+        with self._lock:
+            self._data[sid] = (payload, expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at < now]
+            for sid in expired:
+                del self._data[sid]
+
+
+class SqliteSessionStore:
+    """Session store backed by the ``web_sessions`` table."""
+
+    def load(self, sid):
+        conn = get_connection()
+        try:
+            row = conn.execute(
+                'SELECT data, expires_at FROM web_sessions WHERE sid = ?',
+                (sid,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if not row:
+            return None
+        if row['expires_at'] < time.time():
+            self.delete(sid)
+            return None
+        return row['data']
+
+    def save(self, sid, payload, expires_at):
+        conn = get_connection()
+        try:
+            conn.execute(
+                '''
+                    INSERT INTO web_sessions (sid, data, expires_at, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(sid) DO UPDATE SET
+                        data = excluded.data,
+                        expires_at = excluded.expires_at,
+                        updated_at = excluded.updated_at
+                ''',
+                (sid, payload, expires_at, datetime.utcnow().isoformat())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def delete(self, sid):
+        conn = get_connection()
+        try:
+            conn.execute('DELETE FROM web_sessions WHERE sid = ?', (sid,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def purge_expired(self):
+        conn = get_connection()
+        try:
+            conn.execute('DELETE FROM web_sessions WHERE expires_at < ?', (time.time(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that keeps only a random id in the cookie."""
+
+    serializer = TaggedJSONSerializer()
+    session_class = ServerSideSession
+
+    def __init__(self, store, idle_grace_seconds=0):
+        self.store = store
+        self.idle_grace_seconds = idle_grace_seconds
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def _new_sid(self):
+        return secrets.token_urlsafe(32)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        with self._purge_lock:
+            if now - self._last_purge < PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = now
+        try:
+            self.store.purge_expired()
+        except Exception as exc:
+            print(f"Session purge error: {exc}")
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            payload = self.store.load(sid)
+            if payload is not None:
+                try:
+                    return self.session_class(self.serializer.loads(payload), sid=sid)
+                except Exception:
+                    self.store.delete(sid)
+        return self.session_class(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+
+        if not session.modified:
+            return
+
+        if session.rotate and not session.new:
+            # Never reuse an id across a login/logout boundary (session fixation).
+            self.store.delete(session.sid)
+            session.sid = self._new_sid()
+
+        lifetime = app.permanent_session_lifetime if session.permanent else timedelta(days=1)
+        expires_at = time.time() + lifetime.total_seconds() + self.idle_grace_seconds
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+        self._maybe_purge()
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+
+
+def build_session_interface(backend, persist_path=None, idle_grace_seconds=0):
+    """Return the session interface for a configured backend name.
+
+    ``'cookie'`` keeps Flask's default signed-cookie sessions.
+    """
+    backend = (backend or 'cookie').lower()
+    if backend == 'sqlite':
+        return ServerSideSessionInterface(SqliteSessionStore(), idle_grace_seconds)
+    if backend == 'memory':
+        return ServerSideSessionInterface(MemorySessionStore(persist_path), idle_grace_seconds)
+    if backend == 'cookie':
+        return None
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,282 @@
+# sms.py
+"""Outgoing SMS.
+
+Messages are never sent from inside a request: callers add rows to
+``sms_outbox`` and return. Rows with a ``dedupe_key`` are queued at most
+once, so jobs that are re-run (such as the nightly low-attendance roster)
+do not message the same parent twice.
+
+``SmsDispatcher`` drains the outbox on a background thread. Each round it
+claims up to ``SMS_BATCH_SIZE`` due rows with one UPDATE (marking them
+``sending`` under a lease, so several processes never send the same row),
+hands them to the gateway in one call, and records per-message results.
+Throughput is capped by a token bucket; failures are retried with
+exponential backoff until ``SMS_MAX_ATTEMPTS``.
+
+Gateways implement ``send_batch(messages)`` and return ``{id: error}`` with
+``None`` for delivered messages. ``FileGateway`` writes JSON lines for local
+testing; ``HttpGateway`` POSTs the batch to a provider endpoint.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from config import (
+    SMS_GATEWAY, SMS_GATEWAY_FILE, SMS_GATEWAY_URL, SMS_GATEWAY_TOKEN, SMS_GATEWAY_TIMEOUT_SECONDS,
+    SMS_BATCH_SIZE, SMS_RATE_PER_MINUTE, SMS_DISPATCH_INTERVAL_SECONDS,
+    SMS_MAX_ATTEMPTS, SMS_RETRY_BASE_SECONDS, SMS_SEND_LEASE_SECONDS
+)
+from db import get_connection
+from rate_limit import TokenBucket
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+def student_phone_sql(alias='s'):
+    """SQL expression for the number a student's SMS goes to: sms_phone, else phone."""
+    return f"COALESCE(NULLIF(TRIM({alias}.sms_phone), ''), NULLIF(TRIM({alias}.phone), ''))"
+
+
+def enqueue_messages(conn, messages, source, created_at=None):
+    """Queue ``(recipient, message, student_id, dedupe_key)`` tuples; the caller commits.
+
+    Returns the number of rows actually queued (duplicates by key are skipped).
+    """
+    created_at = created_at or datetime.now().isoformat()
+    before = conn.total_changes
+    conn.executemany(
+        '''
+        INSERT OR IGNORE INTO sms_outbox (recipient, message, student_id, dedupe_key, source, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''',
+        ((recipient, message, student_id, dedupe_key, source, PENDING, created_at)
+         for recipient, message, student_id, dedupe_key in messages)
+    )
+    return conn.total_changes - before
+
+
+def student_recipients(conn, student_ids):
+    """``(student_id, recipient)`` for the given ids in one query; recipient is None without a number."""
+    ids = [int(student_id) for student_id in student_ids]
+    return conn.execute(
+        f'''
+        SELECT s.id, {student_phone_sql('s')} AS recipient
+        FROM students s
+        WHERE s.id IN (SELECT value FROM json_each(?))
+        ''',
+        (json.dumps(ids),)
+    ).fetchall()
+
+
+def outbox_summary(conn, status=None, limit=100):
+    """Message counts per status and the most recent messages (optionally of one status)."""
+    counts = {row['status']: row['messages'] for row in conn.execute(
+        'SELECT status, COUNT(*) AS messages FROM sms_outbox GROUP BY status'
+    )}
+    query = '''
+        SELECT id, recipient, message, student_id, source, status, attempts, last_error,
+               next_attempt_at, created_at, sent_at
+        FROM sms_outbox
+    '''
+    params = []
+    if status:
+        query += ' WHERE status = ?'
+        params.append(status)
+    query += ' ORDER BY id DESC LIMIT ?'
+    params.append(limit)
+    return {'counts': counts, 'messages': [dict(row) for row in conn.execute(query, params)]}
+
+
+# ==================== GATEWAYS ====================
+
+class FileGateway:
+    """Local stub: appends every message to a JSON-lines file and reports success."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages):
+        sent_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            for message in messages:
+                handle.write(json.dumps({'id': message['id'], 'to': message['recipient'],
+                                         'text': message['message'], 'sent_at': sent_at}) + '\n')
+        return {message['id']: None for message in messages}
+
+
+class HttpGateway:
+    """POSTs ``{"messages": [{"id", "to", "text"}]}`` to ``url``.
+
+    A 2xx reply marks the whole batch delivered unless its JSON body carries
+    ``{"results": [{"id", "ok", "error"}]}``; anything else fails the batch.
+    """
+
+    def __init__(self, url, token=None, timeout=SMS_GATEWAY_TIMEOUT_SECONDS):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        body = json.dumps({'messages': [
+            {'id': message['id'], 'to': message['recipient'], 'text': message['message']} for message in messages
+        ]}).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = response.read()
+        except (urllib.error.URLError, OSError) as e:
+            return {message['id']: f'Gateway error: {e}' for message in messages}
+
+        results = {message['id']: None for message in messages}
+        try:
+            reported = json.loads(payload or b'{}').get('results') or []
+        except (ValueError, AttributeError):
+            reported = []
+        for result in reported:
+            if result.get('id') in results and not result.get('ok', True):
+                results[result['id']] = result.get('error') or 'Rejected by gateway'
+        return results
+
+
+def build_gateway(root_dir):
+    if SMS_GATEWAY == 'http':
+        if not SMS_GATEWAY_URL:
+            raise ValueError('SMS_GATEWAY_URL must be set for the http gateway')
+        return HttpGateway(SMS_GATEWAY_URL, SMS_GATEWAY_TOKEN)
+    return FileGateway(os.path.join(root_dir, SMS_GATEWAY_FILE))
+
+
+# ==================== DISPATCH ====================
+
+_CLAIM_SQL = f'''
+    UPDATE sms_outbox
+    SET status = '{SENDING}', next_attempt_at = ?
+    WHERE id IN (
+        SELECT id FROM sms_outbox
+        WHERE status IN ('{PENDING}', '{SENDING}') AND COALESCE(next_attempt_at, '') <= ?
+        ORDER BY id
+        LIMIT ?
+    )
+    RETURNING id, recipient, message, attempts
+'''
+
+
+class SmsDispatcher:
+    """Sends queued messages in rate-limited batches on a daemon thread."""
+
+    def __init__(self, gateway, connection_factory=get_connection, batch_size=SMS_BATCH_SIZE,
+                 rate_per_minute=SMS_RATE_PER_MINUTE, interval_seconds=SMS_DISPATCH_INTERVAL_SECONDS,
+                 max_attempts=SMS_MAX_ATTEMPTS, retry_base_seconds=SMS_RETRY_BASE_SECONDS,
+                 lease_seconds=SMS_SEND_LEASE_SECONDS):
+        self.gateway = gateway
+        self.connection_factory = connection_factory
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self._bucket = TokenBucket(batch_size, rate_per_minute / 60.0, time.monotonic())
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='sms-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Look at the outbox now instead of at the next interval (call after enqueueing)."""
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.dispatch_once()
+            except Exception as e:
+                print(f"SMS dispatch failed: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.interval_seconds)
+                self._wake.clear()
+
+    def _allowance(self):
+        """Block until at least one message may be sent; return how many (0 if stopping)."""
+        while True:
+            wait = self._bucket.consume(time.monotonic())
+            if not wait:
+                extra = min(self.batch_size - 1, int(self._bucket.tokens))
+                self._bucket.tokens -= extra
+                return 1 + extra
+            if self._stop.wait(wait):
+                return 0
+
+    def _claim(self, conn, now, limit):
+        lease_until = (now + timedelta(seconds=self.lease_seconds)).isoformat()
+        with conn:
+            return [dict(row) for row in conn.execute(_CLAIM_SQL, (lease_until, now.isoformat(), limit))]
+
+    def dispatch_once(self):
+        """Send one batch of due messages; returns how many were handed to the gateway."""
+        allowance = self._allowance()
+        if not allowance:
+            return 0
+        conn = self.connection_factory()
+        try:
+            batch = self._claim(conn, datetime.now(), allowance)
+            # Hand back the allowance this batch did not use
+            self._bucket.tokens = min(self._bucket.capacity, self._bucket.tokens + allowance - len(batch))
+            if not batch:
+                return 0
+            try:
+                results = self.gateway.send_batch(batch)
+            except Exception as e:
+                results = {message['id']: f'Gateway error: {e}' for message in batch}
+            self._record(conn, batch, results, datetime.now())
+            return len(batch)
+        finally:
+            conn.close()
+
+    def _record(self, conn, batch, results, now):
+        sent = []
+        failed = []
+        for message in batch:
+            error = results.get(message['id'], 'No result from gateway')
+            attempts = message['attempts'] + 1
+            if error is None:
+                sent.append((now.isoformat(), message['id']))
+                continue
+            if attempts >= self.max_attempts:
+                status, next_attempt_at = FAILED, None
+            else:
+                status = PENDING
+                next_attempt_at = (now + timedelta(seconds=self.retry_base_seconds * 2 ** (attempts - 1))).isoformat()
+            failed.append((status, str(error)[:500], next_attempt_at, message['id']))
+        with conn:
+            conn.executemany(
+                f"UPDATE sms_outbox SET status = '{SENT}', sent_at = ?, attempts = attempts + 1, "
+                "last_error = NULL, next_attempt_at = NULL WHERE id = ?",
+                sent
+            )
+            conn.executemany(
+                'UPDATE sms_outbox SET status = ?, attempts = attempts + 1, last_error = ?, next_attempt_at = ? '
+                'WHERE id = ?',
+                failed
+            )
@@ -0,0 +1,116 @@
+# teacher_assignments.py
+"""Teachers' semester and technology assignments.
+
+Each assignment is a row in ``teacher_semesters`` / ``teacher_technologies``
+(``teacher_id``, value, position in the teacher's list), indexed by value,
+so "which teachers cover X" is an indexed lookup and a teacher's lists are
+read without parsing anything. The old ``teachers.assigned_semesters`` and
+``technology_assignments`` text columns are still written for anything that
+reads them directly, but nothing filters on them any more.
+"""
+
+import json
+
+# kind -> (table, value column)
+ASSIGNMENT_TABLES = {
+    'semesters': ('teacher_semesters', 'semester'),
+    'technologies': ('teacher_technologies', 'technology'),
+}
+
+
+def parse_multi_value(value):
+    """Convert stored JSON/comma string into a clean list."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return []
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return [str(item).strip() for item in parsed if str(item).strip()]
+        except json.JSONDecodeError:
+            pass
+        if ',' in value:
+            return [item.strip() for item in value.split(',') if item.strip()]
+        return [value]
+    return []
+
+
+def serialize_multi_value(values):
+    """Serialize a multi-select list to JSON."""
+    if not values:
+        return json.dumps([])
+    cleaned = [str(item).strip() for item in values if str(item).strip()]
+    return json.dumps(cleaned)
+
+
+def set_assignments(conn, teacher_id, semesters, technologies):
+    """Replace a teacher's assignment rows, keeping list order (caller commits)."""
+    for kind, values in (('semesters', semesters), ('technologies', technologies)):
+        table, column = ASSIGNMENT_TABLES[kind]
+        conn.execute(f'DELETE FROM {table} WHERE teacher_id = ?', (teacher_id,))
+        conn.executemany(
+            f'INSERT OR IGNORE INTO {table} (teacher_id, {column}, position) VALUES (?, ?, ?)',
+            [(teacher_id, value, position) for position, value in enumerate(parse_multi_value(values))]
+        )
+
+
+def delete_assignments(conn, teacher_id):
+    for table, _ in ASSIGNMENT_TABLES.values():
+        conn.execute(f'DELETE FROM {table} WHERE teacher_id = ?', (teacher_id,))
+
+
+def load_assignments(conn, teacher_ids):
+    """``{teacher_id: {'semesters': [...], 'technologies': [...]}}`` in two queries."""
+    ids = [int(teacher_id) for teacher_id in teacher_ids]
+    assignments = {teacher_id: {kind: [] for kind in ASSIGNMENT_TABLES} for teacher_id in ids}
+    if not ids:
+        return assignments
+    for kind, (table, column) in ASSIGNMENT_TABLES.items():
+        for row in conn.execute(
+            f'''
+            SELECT teacher_id, {column} AS value
+            FROM {table}
+            WHERE teacher_id IN (SELECT value FROM json_each(?))
+            ORDER BY teacher_id, position
+            ''',
+            (json.dumps(ids),)
+        ):
+            assignments[row['teacher_id']][kind].append(row['value'])
+    return assignments
+
+
+def teacher_assignments(conn, teacher_id):
+    """``(semesters, technologies)`` of one teacher."""
+    assignments = load_assignments(conn, [teacher_id])[int(teacher_id)]
+    return assignments['semesters'], assignments['technologies']
+
+
+def covers_sql(kind, alias='t'):
+    """EXISTS clause (one ``?`` param) matching teachers assigned exactly that semester/technology."""
+    table, column = ASSIGNMENT_TABLES[kind]
+    return f'EXISTS (SELECT 1 FROM {table} ta WHERE ta.teacher_id = {alias}.id AND ta.{column} = ?)'
+
+
+def backfill_assignments(conn):
+    """Copy the text columns into the tables for teachers that have no rows yet; returns how many (caller commits)."""
+    teachers = conn.execute(
+        '''
+        SELECT t.id, t.assigned_semesters, t.technology_assignments, t.technology
+        FROM teachers t
+        WHERE NOT EXISTS (SELECT 1 FROM teacher_semesters ts WHERE ts.teacher_id = t.id)
+          AND NOT EXISTS (SELECT 1 FROM teacher_technologies tt WHERE tt.teacher_id = t.id)
+        '''
+    ).fetchall()
+    copied = 0
+    for teacher_id, semesters, technology_assignments, technology in teachers:
+        semesters = parse_multi_value(semesters)
+        technologies = parse_multi_value(technology_assignments or technology)
+        if semesters or technologies:
+            set_assignments(conn, teacher_id, semesters, technologies)
+            copied += 1
+    return copied
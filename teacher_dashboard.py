@@ -0,0 +1,192 @@
+# teacher_dashboard.py
+"""Teacher dashboard statistics.
+
+A teacher's students are the active students of their assigned semesters
+(and assigned technologies, when set). Everything the dashboard shows is
+computed with three grouped queries that join ``students`` instead of
+passing id lists around: per-semester counts, upcoming exams, and the
+month's attendance aggregate over a ``attendance_date`` range.
+
+Results are cached per teacher for ``TEACHER_DASHBOARD_CACHE_SECONDS``,
+keyed on the teacher's current assignment, and dropped as soon as
+attendance is saved for one of their semesters.
+"""
+
+import json
+import threading
+import time
+from datetime import date
+
+from config import TEACHER_DASHBOARD_CACHE_SECONDS
+
+
+class TeacherScope:
+    """What a teacher covers: semesters, technologies and subject."""
+
+    __slots__ = ('semesters', 'technologies', 'subject')
+
+    def __init__(self, semesters, technologies, subject):
+        self.semesters = tuple(semesters)
+        self.technologies = tuple(technologies)
+        self.subject = subject or ''
+
+    @property
+    def key(self):
+        return (self.semesters, self.technologies, self.subject)
+
+    @property
+    def technology_label(self):
+        return ', '.join(self.technologies)
+
+    def student_filter(self, alias='s'):
+        """WHERE clause and params selecting the teacher's active students."""
+        clauses = [f"{alias}.status = 'Active'"]
+        params = []
+        if self.semesters:
+            clauses.append(f'{alias}.semester IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(self.semesters))
+        if self.technologies:
+            clauses.append(f'{alias}.technology IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(self.technologies))
+        return ' AND '.join(clauses), params
+
+
+def _month_range(today=None):
+    today = today or date.today()
+    first = today.replace(day=1)
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.isoformat(), following.isoformat()
+
+
+def load_stats(conn, scope, today=None):
+    """Dashboard statistics for ``scope`` (everything except teacher name and permissions)."""
+    where, params = scope.student_filter()
+
+    # One pass per semester: all active students, and those in the teacher's
+    # technologies (the per-semester rows ignore technology when no subject is set)
+    semester_where, semester_params = TeacherScope(scope.semesters, (), '').student_filter()
+    if scope.technologies:
+        matching_sql = 'SUM(s.technology IN (SELECT value FROM json_each(?)))'
+        semester_params = [json.dumps(scope.technologies), *semester_params]
+    else:
+        matching_sql = 'COUNT(*)'
+    semester_counts = {row['semester']: row for row in conn.execute(
+        f'''
+        SELECT s.semester, COUNT(*) AS students, {matching_sql} AS matching
+        FROM students s
+        WHERE {semester_where}
+        GROUP BY s.semester
+        ''',
+        semester_params
+    )}
+    subject_label = scope.subject or 'All Subjects'
+    count_key = 'matching' if scope.subject else 'students'
+    assigned_subjects = [{
+        'subject': subject_label,
+        'technology': scope.technology_label if scope.subject else (scope.technology_label or 'All'),
+        'semester': semester,
+        'student_count': semester_counts[semester][count_key] if semester in semester_counts else 0
+    } for semester in scope.semesters]
+    total_students = sum(row['matching'] for row in semester_counts.values())
+
+    exam_query = '''
+        SELECT exam_id, title, subject, exam_date, start_time, status
+        FROM midterm_exams
+        WHERE status IN ('Scheduled', 'Active')
+    '''
+    exam_params = []
+    if scope.subject:
+        exam_query += ' AND subject = ?'
+        exam_params.append(scope.subject)
+    if scope.technologies:
+        exam_query += ' AND technology IN (SELECT value FROM json_each(?))'
+        exam_params.append(json.dumps(scope.technologies))
+    if scope.semesters:
+        exam_query += ' AND semester IN (SELECT value FROM json_each(?))'
+        exam_params.append(json.dumps(scope.semesters))
+    exam_query += ' ORDER BY exam_date ASC LIMIT 5'
+    upcoming_exams = [{
+        'name': exam['title'] or 'N/A',
+        'subject': exam['subject'] or 'N/A',
+        'date': exam['exam_date'] or ''
+    } for exam in conn.execute(exam_query, exam_params)]
+
+    attendance_summary = {}
+    attendance_percentage = 0
+    if scope.semesters and total_students:
+        month_start, next_month = _month_range(today)
+        summary = conn.execute(
+            f'''
+            SELECT COUNT(DISTINCT a.student_id) AS total,
+                   SUM(a.status = 'Present') AS present,
+                   SUM(a.status = 'Absent') AS absent
+            FROM attendance a
+            JOIN students s ON s.id = a.student_id
+            WHERE a.attendance_date >= ? AND a.attendance_date < ? AND {where}
+            ''',
+            [month_start, next_month, *params]
+        ).fetchone()
+        totals = {key: summary[key] or 0 for key in ('total', 'present', 'absent')}
+        attendance_summary[subject_label] = totals
+        if totals['total'] > 0:
+            attendance_percentage = round((totals['present'] / totals['total']) * 100, 1)
+
+    return {
+        'assigned_subjects': assigned_subjects,
+        'total_students': total_students,
+        'upcoming_exams': upcoming_exams,
+        'attendance_summary': attendance_summary,
+        'attendance_percentage': attendance_percentage,
+    }
+
+
+def semesters_of_students(conn, student_ids):
+    """Distinct semesters of the given students, in one query (ids that are not numbers are ignored)."""
+    ids = []
+    for student_id in student_ids:
+        try:
+            ids.append(int(student_id))
+        except (TypeError, ValueError):
+            continue
+    return {row[0] for row in conn.execute(
+        'SELECT DISTINCT semester FROM students WHERE id IN (SELECT value FROM json_each(?))',
+        (json.dumps(ids),)
+    )}
+
+
+class TeacherDashboardCache:
+    """Per-teacher statistics with a TTL, dropped by attendance writes to their semesters."""
+
+    def __init__(self, ttl_seconds=TEACHER_DASHBOARD_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, conn, teacher_id, scope):
+        entry = self._entries.get(teacher_id)
+        if entry is not None and entry[0] == scope.key and entry[1] > time.monotonic():
+            return entry[2]
+        stats = load_stats(conn, scope)
+        with self._lock:
+            self._entries[teacher_id] = (scope.key, time.monotonic() + self.ttl_seconds, stats)
+        return stats
+
+    def invalidate_semesters(self, semesters):
+        """Drop teachers covering any of ``semesters`` (teachers without semesters cover all)."""
+        semesters = set(semesters)
+        if not semesters:
+            return
+        with self._lock:
+            for teacher_id, (key, _, _) in list(self._entries.items()):
+                if not key[0] or semesters.intersection(key[0]):
+                    del self._entries[teacher_id]
+
+    def invalidate(self, teacher_id=None):
+        with self._lock:
+            if teacher_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(teacher_id, None)
+
+
+teacher_dashboards = TeacherDashboardCache()
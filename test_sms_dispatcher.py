@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Checks for the SMS outbox and SmsDispatcher (sms.py)
+Tests: dedupe on enqueue, batched sends, lease reclaim, retry backoff,
+returning unused rate-limit allowance
+
+Runs against a throwaway database: python test_sms_dispatcher.py (or pytest)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import db
+import sms
+
+
+class FailingGateway:
+    """Rejects every message."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def send_batch(self, messages):
+        self.calls += 1
+        return {message['id']: 'Gateway down' for message in messages}
+
+
+@contextmanager
+def outbox_database():
+    """Yield ``(connect, work_dir)`` for a fresh database built by db.init_db."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'students.db')
+        original = db.DB_NAME
+        db.DB_NAME = path
+        try:
+            db.init_db()
+        finally:
+            db.DB_NAME = original
+
+        def connect():
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            return conn
+
+        yield connect, work_dir
+
+
+def queue(connect, count):
+    conn = connect()
+    with conn:
+        sms.enqueue_messages(conn, [
+            (f'0300000{index:04d}', f'Message {index}', None, None) for index in range(count)
+        ], 'test')
+    conn.close()
+
+
+def outbox_rows(connect):
+    conn = connect()
+    rows = [dict(row) for row in conn.execute('SELECT * FROM sms_outbox ORDER BY id')]
+    conn.close()
+    return rows
+
+
+def test_enqueue_skips_duplicate_keys():
+    with outbox_database() as (connect, _):
+        conn = connect()
+        with conn:
+            first = sms.enqueue_messages(conn, [('03001112222', 'Hello', None, 'roster:2026-10:1')], 'test')
+            again = sms.enqueue_messages(conn, [
+                ('03001112222', 'Hello', None, 'roster:2026-10:1'),
+                ('03001112222', 'No key', None, None),
+                ('03001112222', 'No key', None, None),
+            ], 'test')
+        conn.close()
+        assert first == 1
+        # Only the keyed duplicate is dropped; messages without a key always queue
+        assert again == 2
+        assert len(outbox_rows(connect)) == 3
+
+
+def test_dispatch_sends_batch_through_file_gateway():
+    with outbox_database() as (connect, work_dir):
+        queue(connect, 3)
+        sent_file = os.path.join(work_dir, 'sent.jsonl')
+        dispatcher = sms.SmsDispatcher(sms.FileGateway(sent_file), connection_factory=connect,
+                                       batch_size=10, rate_per_minute=600)
+        assert dispatcher.dispatch_once() == 3
+        assert dispatcher.dispatch_once() == 0
+
+        rows = outbox_rows(connect)
+        assert [row['status'] for row in rows] == [sms.SENT] * 3
+        assert all(row['attempts'] == 1 and row['sent_at'] and row['next_attempt_at'] is None for row in rows)
+        with open(sent_file, encoding='utf-8') as handle:
+            written = [json.loads(line) for line in handle]
+        assert [line['id'] for line in written] == [row['id'] for row in rows]
+
+
+def test_stuck_sending_row_is_reclaimed_after_lease():
+    with outbox_database() as (connect, work_dir):
+        queue(connect, 2)
+        now = datetime.now()
+        conn = connect()
+        with conn:
+            # First row: a sender died mid-batch and its lease has run out.
+            # Second row: still leased to a live sender.
+            conn.execute("UPDATE sms_outbox SET status = 'sending', next_attempt_at = ? WHERE id = 1",
+                         ((now - timedelta(minutes=1)).isoformat(),))
+            conn.execute("UPDATE sms_outbox SET status = 'sending', next_attempt_at = ? WHERE id = 2",
+                         ((now + timedelta(minutes=5)).isoformat(),))
+        conn.close()
+
+        dispatcher = sms.SmsDispatcher(sms.FileGateway(os.path.join(work_dir, 'sent.jsonl')),
+                                       connection_factory=connect, batch_size=10, rate_per_minute=600)
+        assert dispatcher.dispatch_once() == 1
+        statuses = {row['id']: row['status'] for row in outbox_rows(connect)}
+        assert statuses == {1: sms.SENT, 2: sms.SENDING}
+
+
+def test_failures_back_off_exponentially_until_max_attempts():
+    with outbox_database() as (connect, _):
+        queue(connect, 1)
+        gateway = FailingGateway()
+        dispatcher = sms.SmsDispatcher(gateway, connection_factory=connect, batch_size=10,
+                                       rate_per_minute=600, max_attempts=4, retry_base_seconds=30)
+        delays = []
+        for attempt in range(1, 5):
+            before = datetime.now()
+            assert dispatcher.dispatch_once() == 1
+            row = outbox_rows(connect)[0]
+            assert row['attempts'] == attempt
+            assert row['last_error'] == 'Gateway down'
+            if attempt < 4:
+                assert row['status'] == sms.PENDING
+                delays.append((datetime.fromisoformat(row['next_attempt_at']) - before).total_seconds())
+                # Not due yet, so nothing is claimed
+                assert dispatcher.dispatch_once() == 0
+                conn = connect()
+                with conn:
+                    conn.execute('UPDATE sms_outbox SET next_attempt_at = ?',
+                                 ((datetime.now() - timedelta(seconds=1)).isoformat(),))
+                conn.close()
+        assert [round(delay) for delay in delays] == [30, 60, 120]
+
+        row = outbox_rows(connect)[0]
+        assert row['status'] == sms.FAILED and row['next_attempt_at'] is None
+        assert dispatcher.dispatch_once() == 0
+        assert gateway.calls == 4
+
+
+def test_unused_allowance_is_returned_to_the_bucket():
+    with outbox_database() as (connect, work_dir):
+        queue(connect, 3)
+        # Refill is negligible over the test, so the bucket only moves by what is sent
+        dispatcher = sms.SmsDispatcher(sms.FileGateway(os.path.join(work_dir, 'sent.jsonl')),
+                                       connection_factory=connect, batch_size=10, rate_per_minute=0.001)
+        assert dispatcher.dispatch_once() == 3
+        assert abs(dispatcher._bucket.tokens - 7) < 0.01
+
+        # An empty outbox costs nothing
+        assert dispatcher.dispatch_once() == 0
+        assert abs(dispatcher._bucket.tokens - 7) < 0.01
+
+
+def main():
+    tests = [
+        ("Enqueue dedupe", test_enqueue_skips_duplicate_keys),
+        ("Batched send", test_dispatch_sends_batch_through_file_gateway),
+        ("Lease reclaim", test_stuck_sending_row_is_reclaimed_after_lease),
+        ("Retry backoff", test_failures_back_off_exponentially_until_max_attempts),
+        ("Allowance hand-back", test_unused_allowance_is_returned_to_the_bucket),
+    ]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {name}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ FAIL: {name}: {e!r}")
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return failed
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())